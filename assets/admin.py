@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Maquina, Atividade, ProcedimentoPreventivo, PlanoPreventivo, AcessoLog
+from .models import Maquina, Atividade, ProcedimentoPreventivo, PlanoPreventivo, AcessoLog, AcessoResumoHora, IndicadorMaquinaDia, Importacao
 
 @admin.register(PlanoPreventivo)
 class PlanoPreventivoAdmin(admin.ModelAdmin):
@@ -13,6 +13,24 @@ class AcessoLogAdmin(admin.ModelAdmin):
     list_filter = ('status_code', 'method', 'data_acesso')
     search_fields = ('ip_address', 'path', 'user_agent', 'usuario__username')
     readonly_fields = ('usuario', 'ip_address', 'path', 'method', 'status_code', 'user_agent', 'data_acesso')
+    date_hierarchy = 'data_acesso'
+    list_select_related = ('usuario',)
+    # Evita COUNT(*) sem filtro numa tabela grande a cada página
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(AcessoResumoHora)
+class AcessoResumoHoraAdmin(admin.ModelAdmin):
+    list_display = ('hora', 'path', 'usuario', 'status_code', 'total')
+    list_filter = ('status_code',)
+    search_fields = ('path', 'usuario__username')
+    date_hierarchy = 'hora'
+    list_select_related = ('usuario',)
 
     def has_add_permission(self, request):
         return False
@@ -33,6 +51,7 @@ class ProcedimentoPreventivoAdmin(admin.ModelAdmin):
 class AtividadeAdmin(admin.ModelAdmin):
     # 1. Configurações de Interface
     filter_horizontal = ('colaboradores',) 
+    raw_id_fields = ('chamado',)
     
     # 2. O que aparece na tabela (colaboradores substituído por exibir_tecnicos)
     list_display = (
@@ -52,13 +71,13 @@ class AtividadeAdmin(admin.ModelAdmin):
     # 6. Organização do formulário de edição
     fieldsets = (
         ('Informações Básicas', {
-            'fields': ('maquina', 'descricao', 'colaboradores', 'status', 'motivo_pausa')
+            'fields': ('maquina', 'descricao', 'chamado', 'colaboradores', 'status', 'motivo_pausa')
         }),
         ('Planejamento (Gantt)', {
             'fields': ('duracao_estimada', 'data_planejada', 'eh_emergencial')
         }),
         ('Execução Real', {
-            'fields': ('tempo_total_gasto', 'ultima_interacao'),
+            'fields': ('tempo_total_gasto', 'ultima_interacao', 'inicio_real', 'fim_real'),
             'classes': ('collapse',) 
         }),
     )
@@ -67,4 +86,26 @@ class AtividadeAdmin(admin.ModelAdmin):
     def exibir_tecnicos(self, obj):
         return ", ".join([t.first_name or t.username for t in obj.colaboradores.all()])
     
-    exibir_tecnicos.short_description = 'Técnicos Responsáveis'
\ No newline at end of file
+    exibir_tecnicos.short_description = 'Técnicos Responsáveis'
+@admin.register(IndicadorMaquinaDia)
+class IndicadorMaquinaDiaAdmin(admin.ModelAdmin):
+    list_display = ('data', 'maquina', 'corretivas', 'preventivas', 'tempo_executando', 'tempo_pausado', 'tempo_parada')
+    list_filter = ('maquina',)
+    date_hierarchy = 'data'
+    list_select_related = ('maquina',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Importacao)
+class ImportacaoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'usuario', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'tipo')
+    exclude = ('conteudo',)
+    readonly_fields = ('tipo', 'status', 'usuario', 'resumo', 'criado_em', 'concluido_em')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,71 @@
+"""
+Motor de sequenciamento das atividades por equipe.
+
+Trabalha só com dados em memória (nenhum acesso ao banco no laço): quem chama
+monta as tarefas a partir de querysets já carregados.
+"""
+import heapq
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+DURACAO_PADRAO = timedelta(hours=1)
+
+
+class Tarefa(NamedTuple):
+    id: int
+    inicio_base: datetime          # data planejada
+    duracao: timedelta
+    tecnicos: tuple = ()           # ids de todos os técnicos da equipe
+    emergencial: bool = False
+    executando: bool = False
+
+
+class TarefaAgendada(NamedTuple):
+    id: int
+    inicio: datetime
+    fim: datetime
+    duracao: timedelta
+
+
+def sequenciar(tarefas, agora):
+    """
+    Sequencia as tarefas respeitando a agenda de cada técnico.
+
+    - Prioridade: emergenciais primeiro, depois por data planejada (fila de prioridade).
+    - A tarefa bloqueia a equipe inteira: começa quando o último técnico da equipe
+      estiver livre e ocupa todos eles até o fim.
+    - Emergenciais cortam a fila: começam na data planejada.
+    - Em execução: puxadas para o presente e com fim no mínimo "agora".
+
+    Custo O(n log n + soma dos tamanhos das equipes). Retorna na ordem de prioridade.
+    """
+    fila = [
+        (not t.emergencial, t.inicio_base, ordem, t)
+        for ordem, t in enumerate(tarefas)
+    ]
+    heapq.heapify(fila)
+
+    livre_em = {}
+    resultado = []
+    while fila:
+        t = heapq.heappop(fila)[3]
+        duracao = t.duracao if t.duracao and t.duracao.total_seconds() > 0 else DURACAO_PADRAO
+
+        inicio = t.inicio_base
+        if not t.emergencial:
+            for tecnico in t.tecnicos:
+                disponivel = livre_em.get(tecnico)
+                if disponivel is not None and disponivel > inicio:
+                    inicio = disponivel
+        fim = inicio + duracao
+
+        if t.executando:
+            if inicio > agora:
+                inicio = agora
+            fim = max(inicio + duracao, agora)
+
+        for tecnico in t.tecnicos:
+            livre_em[tecnico] = fim
+
+        resultado.append(TarefaAgendada(t.id, inicio, fim, duracao))
+    return resultado
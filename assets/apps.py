@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assets'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .preventivas import iniciar_agendador
+        iniciar_agendador()
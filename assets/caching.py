@@ -0,0 +1,122 @@
+import threading
+import time as time_mod
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+# Tempo máximo que um processo segura o cálculo de uma chave antes de outro assumir
+LOCK_TIMEOUT = 30
+# Intervalo de espera enquanto outro processo calcula a mesma chave
+ESPERA_INTERVALO = 0.05
+
+# Gerações e estatísticas ficam num alias próprio, fora da disputa por espaço com
+# os dados: uma geração expulsa voltaria a um número já usado e entradas antigas
+# gravadas com ele seriam servidas de novo como atuais.
+ALIAS_CONTADORES = 'contadores'
+
+# Locks listrados: quantidade fixa, mesmo com chaves novas a cada geração
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _lock_local(chave):
+    """Lock da chave dentro do processo (coalesce as threads do mesmo worker)."""
+    return _locks[hash(chave) % len(_locks)]
+
+
+def _contadores():
+    """Cache das gerações e estatísticas (o default, se o alias não estiver configurado)."""
+    return caches[ALIAS_CONTADORES] if ALIAS_CONTADORES in settings.CACHES else cache
+
+
+def _semente():
+    # Nunca repete um valor já emitido, mesmo que o contador se perca
+    return time_mod.time_ns()
+
+
+def contar(namespace, evento, quantidade=1):
+    """Incrementa o contador compartilhado <namespace>:<evento> (hit, miss, coalescido)."""
+    contadores = _contadores()
+    chave = f"stats:{namespace}:{evento}"
+    contadores.add(chave, 0, None)
+    try:
+        contadores.incr(chave, quantidade)
+    except ValueError:
+        # Chave expulsa entre o add e o incr
+        contadores.set(chave, quantidade, None)
+
+
+def estatisticas(namespace):
+    """Contadores de hit/miss/coalescido e taxa de acerto de um namespace."""
+    dados = _contadores().get_many([f"stats:{namespace}:{e}" for e in ('hit', 'miss', 'coalescido')])
+    hits = dados.get(f"stats:{namespace}:hit", 0)
+    misses = dados.get(f"stats:{namespace}:miss", 0)
+    coalescidos = dados.get(f"stats:{namespace}:coalescido", 0)
+    total = hits + misses + coalescidos
+    return {
+        'hits': hits,
+        'misses': misses,
+        'coalescidos': coalescidos,
+        'taxa_acerto': round((hits + coalescidos) / total, 4) if total else None,
+    }
+
+
+def geracao(namespace):
+    """Geração atual do namespace; faz parte de todas as chaves, então invalidar é só incrementá-la."""
+    contadores = _contadores()
+    chave = f"geracao:{namespace}"
+    valor = contadores.get(chave)
+    if valor is None:
+        semente = _semente()
+        contadores.add(chave, semente, None)
+        valor = contadores.get(chave, semente)
+    return valor
+
+
+def invalidar(namespace):
+    """Descarta de uma vez todas as entradas do namespace (as antigas expiram pelo timeout)."""
+    contadores = _contadores()
+    chave = f"geracao:{namespace}"
+    try:
+        contadores.incr(chave)
+    except ValueError:
+        # Contador perdido: recomeça de um valor maior que qualquer geração já usada
+        contadores.set(chave, _semente(), None)
+
+
+def obter_ou_calcular(namespace, chave, calcular, timeout):
+    """
+    Lê `chave` do cache ou executa `calcular()` uma única vez (single-flight).
+    Threads do mesmo processo esperam no lock local; outros processos (cache em
+    arquivo) esperam pelo lock `<chave>:lock` criado com cache.add().
+    """
+    valor = cache.get(chave)
+    if valor is not None:
+        contar(namespace, 'hit')
+        return valor
+
+    with _lock_local(chave):
+        valor = cache.get(chave)
+        if valor is not None:
+            contar(namespace, 'coalescido')
+            return valor
+
+        chave_lock = f"{chave}:lock"
+        if not cache.add(chave_lock, 1, LOCK_TIMEOUT):
+            # Outro processo já está calculando: espera o resultado
+            limite = time_mod.monotonic() + LOCK_TIMEOUT
+            while time_mod.monotonic() < limite:
+                time_mod.sleep(ESPERA_INTERVALO)
+                valor = cache.get(chave)
+                if valor is not None:
+                    contar(namespace, 'coalescido')
+                    return valor
+                if cache.add(chave_lock, 1, LOCK_TIMEOUT):
+                    break
+
+        try:
+            valor = calcular()
+            cache.set(chave, valor, timeout)
+            contar(namespace, 'miss')
+        finally:
+            cache.delete(chave_lock)
+        return valor
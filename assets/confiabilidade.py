@@ -0,0 +1,112 @@
+"""
+MTTR e MTBF por máquina e da planta, em qualquer período.
+
+Tudo sai de duas agregações agrupadas por máquina, sem varrer AtividadeLog:
+os tempos reais já estão desnormalizados em Atividade (tempo_total_gasto, a
+soma dos intervalos em execução, e inicio_real/fim_real).
+
+- MTTR: média do tempo em execução das corretivas finalizadas no período
+  (primeiro 'executando' até 'finalizada', descontadas as pausas; uma OS
+  reaberta não conta o tempo em que ficou finalizada). A mesma definição para
+  toda OS, venha ou não de chamado.
+- Tempo de resposta: à parte, média da espera entre a abertura do chamado e o
+  início da execução, só nas OS que vieram de chamado.
+- MTBF: média dos intervalos entre corretivas sucessivas da mesma máquina.
+  Os intervalos se somam de forma telescópica, então a média é
+  (última - primeira) / (falhas - 1): basta MIN, MAX e COUNT.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Greatest
+
+from .gantt import TZ_BR
+from .models import Atividade, Maquina
+
+STATUS_DESCARTADOS = ['cancelada', 'parada']
+
+
+def _horas(duracao):
+    return round(duracao.total_seconds() / 3600, 2) if duracao is not None else None
+
+
+def confiabilidade(inicio, fim):
+    """
+    MTTR/MTBF entre as datas `inicio` e `fim` (inclusive), por máquina e da planta.
+    Falhas = corretivas planejadas no período; reparos = corretivas finalizadas nele.
+    """
+    # Limites em datetime (dias de Brasília): os filtros usam os índices de fim_real
+    desde = datetime.combine(inicio, time.min, tzinfo=TZ_BR)
+    ate = datetime.combine(fim + timedelta(days=1), time.min, tzinfo=TZ_BR)
+    corretivas = Atividade.objects.filter(eh_preventiva=False).exclude(status__in=STATUS_DESCARTADOS)
+
+    de_chamado = Q(chamado__isnull=False)
+    espera_chamado = Greatest(
+        ExpressionWrapper(F('inicio_real') - F('chamado__data_abertura'), output_field=DurationField()),
+        Value(timedelta(0)),
+    )
+    reparos = {
+        r['maquina_id']: r
+        for r in corretivas.filter(
+            status='finalizada', inicio_real__isnull=False,
+            fim_real__gte=desde, fim_real__lt=ate,
+        ).values('maquina_id').annotate(
+            total=Sum('tempo_total_gasto'), reparos=Count('id'),
+            espera=Sum(espera_chamado, filter=de_chamado), respostas=Count('id', filter=de_chamado),
+        ).order_by()
+    }
+    falhas = {
+        f['maquina_id']: f
+        for f in corretivas.filter(
+            data_planejada__gte=desde, data_planejada__lt=ate,
+        ).values('maquina_id').annotate(
+            primeira=Min('data_planejada'), ultima=Max('data_planejada'), falhas=Count('id'),
+        ).order_by()
+    }
+
+    maquinas = Maquina.objects.filter(id__in=set(reparos) | set(falhas)).order_by('codigo')
+    por_maquina = []
+    soma_reparo, total_reparos = timedelta(0), 0
+    soma_espera, total_respostas = timedelta(0), 0
+    soma_intervalos, total_intervalos, total_falhas = timedelta(0), 0, 0
+    for maquina in maquinas:
+        r = reparos.get(maquina.id)
+        f = falhas.get(maquina.id)
+        mttr = mtbf = resposta = None
+        if r:
+            mttr = r['total'] / r['reparos']
+            soma_reparo += r['total']
+            total_reparos += r['reparos']
+            if r['respostas']:
+                resposta = r['espera'] / r['respostas']
+                soma_espera += r['espera']
+                total_respostas += r['respostas']
+        if f:
+            total_falhas += f['falhas']
+            if f['falhas'] > 1:
+                mtbf = (f['ultima'] - f['primeira']) / (f['falhas'] - 1)
+                soma_intervalos += f['ultima'] - f['primeira']
+                total_intervalos += f['falhas'] - 1
+        por_maquina.append({
+            'id': maquina.id,
+            'codigo': maquina.codigo,
+            'nome': maquina.nome,
+            'falhas': f['falhas'] if f else 0,
+            'reparos': r['reparos'] if r else 0,
+            'mttr_horas': _horas(mttr),
+            'mtbf_horas': _horas(mtbf),
+            'tempo_resposta_horas': _horas(resposta),
+        })
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'planta': {
+            'falhas': total_falhas,
+            'reparos': total_reparos,
+            'mttr_horas': _horas(soma_reparo / total_reparos) if total_reparos else None,
+            'mtbf_horas': _horas(soma_intervalos / total_intervalos) if total_intervalos else None,
+            'tempo_resposta_horas': _horas(soma_espera / total_respostas) if total_respostas else None,
+        },
+        'maquinas': por_maquina,
+    }
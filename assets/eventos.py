@@ -0,0 +1,264 @@
+"""
+Canal de eventos em tempo real (Server-Sent Events) para Kanban, Gantt e notificações.
+
+Os signals chamam publicar() depois do commit; cada conexão SSE aberta assina
+o barramento do processo e recebe os eventos numa fila asyncio própria.
+
+Backends (settings.EVENTOS['BACKEND']):
+- 'local': entrega direta em memória. Basta com um único processo ASGI. Os ids
+  levam um prefixo por início do processo: Last-Event-ID de outro worker ou de
+  antes de um restart é reconhecido e o cliente recarrega.
+- 'outbox': publicar() grava uma linha em EventoOutbox e cada processo consulta
+  a tabela a cada INTERVALO_OUTBOX segundos, repassando as linhas novas aos
+  seus assinantes. Serve para vários workers/servidores sem broker externo.
+  Só são lidas linhas com mais de GRACA_OUTBOX segundos: um id menor cujo
+  commit saiu depois de um maior já entregue não fica para trás.
+Um caminho pontilhado ('pacote.modulo.Classe') troca o backend por outro
+com a mesma interface (publicar, iniciar, desde).
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time as time_mod
+import uuid
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import EventoOutbox
+
+# Defaults; qualquer chave pode ser sobrescrita em settings.EVENTOS
+DEFAULTS = {
+    'BACKEND': 'local',
+    'INTERVALO_OUTBOX': 1.0,     # segundos entre as consultas à outbox
+    'GRACA_OUTBOX': 1.0,         # segundos até uma linha da outbox ser lida (commits fora de ordem)
+    'RETENCAO_OUTBOX': 3600,     # segundos; também o limite do replay após reconexão
+    'HEARTBEAT': 15,             # comentário SSE periódico (proxies e detecção de queda)
+    'FILA_MAXIMA': 100,          # eventos pendentes por conexão antes de pedir recarga
+}
+# Acima disso o cliente recarrega tudo em vez de repetir evento a evento
+REPLAY_MAXIMO = 500
+LIMPEZA_INTERVALO = 60
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'EVENTOS', {}))
+    return config
+
+
+def _entregar(fila, evento):
+    # Roda no loop dono da fila
+    if fila.full():
+        # Cliente lento: descarta o atraso e pede uma recarga completa
+        while not fila.empty():
+            fila.get_nowait()
+        evento = {'id': evento['id'], 'tipo': 'recarregar', 'dados': {}}
+    fila.put_nowait(evento)
+
+
+class Barramento:
+    """Conexões SSE abertas no processo: um par (loop, fila) por assinante."""
+
+    def __init__(self, fila_maxima):
+        self.fila_maxima = fila_maxima
+        self._assinantes = set()
+        self._lock = threading.Lock()
+
+    def assinar(self):
+        fila = asyncio.Queue(maxsize=self.fila_maxima)
+        with self._lock:
+            self._assinantes.add((asyncio.get_running_loop(), fila))
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes = {a for a in self._assinantes if a[1] is not fila}
+
+    def tem_assinantes(self, loop):
+        with self._lock:
+            return any(a[0] is loop for a in self._assinantes)
+
+    def distribuir(self, evento):
+        """Entrega o evento a todas as filas; pode ser chamado de qualquer thread."""
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for loop, fila in assinantes:
+            try:
+                loop.call_soon_threadsafe(_entregar, fila, evento)
+            except RuntimeError:
+                # Loop encerrado: a conexão já morreu
+                self.cancelar(fila)
+
+
+barramento = Barramento(get_config()['FILA_MAXIMA'])
+
+
+class BackendLocal:
+    """
+    Entrega em memória. Ids '<início>-<n>': reconexões ao mesmo processo repetem
+    os últimos REPLAY_MAXIMO eventos; um id de outro processo pede recarga.
+    """
+
+    def __init__(self):
+        self.inicio = uuid.uuid4().hex[:8]
+        self._ids = itertools.count(1)
+        self._recentes = deque(maxlen=REPLAY_MAXIMO)
+        self._lock = threading.Lock()
+
+    def publicar(self, tipo, dados):
+        with self._lock:
+            numero = next(self._ids)
+            evento = {'id': f"{self.inicio}-{numero}", 'tipo': tipo, 'dados': dados}
+            self._recentes.append((numero, evento))
+            # Dentro do lock: publicações simultâneas chegam às filas na ordem dos ids
+            barramento.distribuir(evento)
+
+    def iniciar(self):
+        pass
+
+    async def desde(self, ultimo_id):
+        inicio, _, numero = ultimo_id.rpartition('-')
+        if inicio != self.inicio or not numero.isdigit():
+            return None
+        numero = int(numero)
+        with self._lock:
+            recentes = list(self._recentes)
+        if recentes and recentes[0][0] > numero + 1:
+            # Mais eventos desde então do que a janela guarda
+            return None
+        return [evento for n, evento in recentes if n > numero]
+
+
+def _evento(linha):
+    return {'id': linha.id, 'tipo': linha.tipo, 'dados': linha.dados}
+
+
+class BackendOutbox:
+    """Outbox no banco consultada por cada processo (substitui um broker pub/sub)."""
+
+    def __init__(self, intervalo, retencao, graca):
+        self.intervalo = intervalo
+        self.retencao = retencao
+        self.graca = timedelta(seconds=graca)
+        self._tarefas = {}
+
+    def publicar(self, tipo, dados):
+        EventoOutbox.objects.create(tipo=tipo, dados=dados)
+
+    def iniciar(self):
+        """Garante a tarefa de consulta no loop da conexão (chamado de dentro do fluxo)."""
+        loop = asyncio.get_running_loop()
+        tarefa = self._tarefas.get(loop)
+        if tarefa is None or tarefa.done():
+            self._tarefas[loop] = loop.create_task(self._consultar(loop))
+
+    def _visiveis(self):
+        # Ids saem da sequência antes do commit: uma linha recente pode ainda ter
+        # vizinhas de id menor por confirmar, então só entra depois da carência
+        return EventoOutbox.objects.filter(criado_em__lte=timezone.now() - self.graca)
+
+    def _ultimo_id(self):
+        close_old_connections()
+        return self._visiveis().aggregate(ultimo=Max('id'))['ultimo'] or 0
+
+    def _ler(self, ultimo_id, limite):
+        # Conexão de longa duração fora do ciclo de request: descarta a que o banco fechou
+        close_old_connections()
+        return [_evento(e) for e in self._visiveis().filter(id__gt=ultimo_id).order_by('id')[:limite]]
+
+    def _limpar(self):
+        EventoOutbox.objects.filter(criado_em__lt=timezone.now() - timedelta(seconds=self.retencao)).delete()
+
+    async def _consultar(self, loop):
+        ultimo = await sync_to_async(self._ultimo_id)()
+        proxima_limpeza = 0
+        # Sem assinantes no loop a tarefa termina; a próxima conexão a recria
+        while barramento.tem_assinantes(loop):
+            await asyncio.sleep(self.intervalo)
+            try:
+                for evento in await sync_to_async(self._ler)(ultimo, REPLAY_MAXIMO):
+                    barramento.distribuir(evento)
+                    ultimo = evento['id']
+                if time_mod.monotonic() >= proxima_limpeza:
+                    await sync_to_async(self._limpar)()
+                    proxima_limpeza = time_mod.monotonic() + LIMPEZA_INTERVALO
+            except Exception:
+                # Banco indisponível: tenta de novo no próximo ciclo
+                pass
+        self._tarefas.pop(loop, None)
+
+    async def desde(self, ultimo_id):
+        if not ultimo_id.isdigit():
+            return None
+        eventos = await sync_to_async(self._ler)(int(ultimo_id), REPLAY_MAXIMO + 1)
+        return eventos if len(eventos) <= REPLAY_MAXIMO else None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = get_config()
+                nome = config['BACKEND']
+                if nome == 'local':
+                    _backend = BackendLocal()
+                elif nome == 'outbox':
+                    _backend = BackendOutbox(config['INTERVALO_OUTBOX'], config['RETENCAO_OUTBOX'], config['GRACA_OUTBOX'])
+                else:
+                    _backend = import_string(nome)()
+    return _backend
+
+
+def publicar(tipo, **dados):
+    """Publica um evento para todas as conexões SSE. Chamar depois do commit."""
+    try:
+        get_backend().publicar(tipo, dados)
+    except Exception:
+        # Tempo real é acessório: nunca quebra a escrita que o originou
+        pass
+
+
+def formatar(evento):
+    dados = json.dumps(evento['dados'], cls=DjangoJSONEncoder)
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+
+
+async def fluxo(ultimo_id=None):
+    """Gerador assíncrono do corpo text/event-stream de uma conexão (ultimo_id: Last-Event-ID cru)."""
+    config = get_config()
+    backend = get_backend()
+    fila = barramento.assinar()
+    backend.iniciar()
+    try:
+        yield 'retry: 5000\n\n'
+        if ultimo_id is not None:
+            # Reconexão: repete o que se perdeu ou pede recarga completa
+            perdidos = await backend.desde(ultimo_id)
+            if perdidos is None:
+                yield formatar({'id': ultimo_id, 'tipo': 'recarregar', 'dados': {}})
+            else:
+                for evento in perdidos:
+                    yield formatar(evento)
+        while True:
+            try:
+                evento = await asyncio.wait_for(fila.get(), config['HEARTBEAT'])
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield formatar(evento)
+    finally:
+        barramento.cancelar(fila)
@@ -0,0 +1,147 @@
+"""
+Exportação CSV em streaming de atividades, logs e chamados.
+
+As linhas são geradas sob demanda a partir de queryset.iterator(chunk_size):
+a memória fica constante e o primeiro byte sai antes de o banco terminar.
+Sob ASGI o Django juntaria um iterador síncrono inteiro antes de enviar;
+por isso lá a view usa linhas_csv_async.
+Separador ';' e BOM UTF-8 para o Excel em português abrir direto.
+"""
+import csv
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .gantt import TZ_BR, parse_data
+from .models import Atividade, AtividadeLog, Chamado
+from .utils import formatar_duracao
+
+CHUNK_SIZE = 2000
+# Linhas por ida à thread do banco no modo assíncrono
+LOTE_ASYNC = 500
+BOM = '\ufeff'
+# Início de célula que o Excel interpreta como fórmula (injeção via texto livre)
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Eco:
+    """Arquivo falso: write() devolve a linha em vez de guardá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def celula(valor):
+    """Texto que começa como fórmula sai com apóstrofo (o Excel o mostra como texto)."""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _data_hora(valor):
+    return valor.astimezone(TZ_BR).strftime('%d/%m/%Y %H:%M') if valor else ''
+
+
+def _horas(duracao):
+    return f"{duracao.total_seconds() / 3600:.2f}".replace('.', ',') if duracao else '0,00'
+
+
+def _atividades(filtros):
+    qs = Atividade.objects.select_related('maquina').prefetch_related('colaboradores').order_by('id')
+    return _filtrar(qs, 'data_planejada', 'maquina', filtros)
+
+
+def _linha_atividade(act):
+    return [
+        act.id, act.maquina.codigo, act.maquina.nome, act.descricao, act.get_status_display(),
+        'Sim' if act.eh_preventiva else 'Não', 'Sim' if act.eh_emergencial else 'Não',
+        ', '.join(t.username for t in act.colaboradores.all()),
+        _data_hora(act.data_planejada), _data_hora(act.inicio_real), _data_hora(act.fim_real),
+        _horas(act.duracao_estimada), _horas(act.tempo_total_gasto), _horas(act.tempo_total_pausa),
+        formatar_duracao(act.tempo_total_gasto),
+    ]
+
+
+def _logs(filtros):
+    qs = AtividadeLog.objects.select_related('atividade__maquina', 'usuario').order_by('id')
+    return _filtrar(qs, 'data_registro', 'atividade__maquina', filtros)
+
+
+def _linha_log(log):
+    return [
+        log.id, log.atividade_id, log.atividade.maquina.codigo, log.status_novo,
+        log.usuario.username if log.usuario else '', log.descricao or '',
+        _data_hora(log.data_registro), _horas(log.duracao) if log.duracao else '',
+    ]
+
+
+def _chamados(filtros):
+    qs = Chamado.objects.select_related('maquina', 'requisitante').order_by('id')
+    return _filtrar(qs, 'data_abertura', 'maquina', filtros)
+
+
+def _linha_chamado(chamado):
+    return [
+        chamado.id, chamado.maquina.codigo, chamado.maquina.nome, chamado.requisitante.username,
+        chamado.descricao_problema, chamado.get_prioridade_indicada_display(),
+        'Sim' if chamado.maquina_parada else 'Não', chamado.get_status_display(),
+        chamado.motivo_resposta or '', _data_hora(chamado.data_abertura),
+    ]
+
+
+# tipo -> (queryset, cabeçalho, linha)
+EXPORTACOES = {
+    'atividades': (_atividades, [
+        'ID', 'Máquina', 'Nome da Máquina', 'Descrição', 'Status', 'Preventiva', 'Emergencial', 'Técnicos',
+        'Planejada', 'Início Real', 'Fim Real', 'Horas Estimadas', 'Horas Gastas', 'Horas Pausadas', 'Tempo Gasto',
+    ], _linha_atividade),
+    'logs': (_logs, [
+        'ID', 'Atividade', 'Máquina', 'Status', 'Usuário', 'Descrição', 'Registro', 'Duração (h)',
+    ], _linha_log),
+    'chamados': (_chamados, [
+        'ID', 'Máquina', 'Nome da Máquina', 'Requisitante', 'Problema', 'Prioridade', 'Máquina Parada',
+        'Status', 'Resposta', 'Abertura',
+    ], _linha_chamado),
+}
+
+
+def filtros_exportacao(params):
+    """inicio/fim (AAAA-MM-DD, dias de Brasília) e maquina (id ou código)."""
+    return {
+        'inicio': parse_data(params.get('inicio')),
+        'fim': parse_data(params.get('fim')),
+        'maquina': (params.get('maquina') or '').strip(),
+    }
+
+
+def _filtrar(qs, campo_data, campo_maquina, filtros):
+    if filtros['inicio']:
+        qs = qs.filter(**{f'{campo_data}__gte': datetime.combine(filtros['inicio'], time.min, tzinfo=TZ_BR)})
+    if filtros['fim']:
+        qs = qs.filter(**{f'{campo_data}__lt': datetime.combine(filtros['fim'] + timedelta(days=1), time.min, tzinfo=TZ_BR)})
+    if filtros['maquina']:
+        chave = 'id' if filtros['maquina'].isdigit() else 'codigo'
+        qs = qs.filter(**{f'{campo_maquina}__{chave}': filtros['maquina']})
+    return qs
+
+
+def linhas_csv(tipo, filtros, chunk_size=CHUNK_SIZE):
+    """Gerador das linhas CSV já formatadas (cabeçalho com BOM primeiro)."""
+    consulta, cabecalho, linha = EXPORTACOES[tipo]
+    escritor = csv.writer(Eco(), delimiter=';')
+    yield BOM + escritor.writerow(cabecalho)
+    for obj in consulta(filtros).iterator(chunk_size=chunk_size):
+        yield escritor.writerow([celula(valor) for valor in linha(obj)])
+
+
+async def linhas_csv_async(tipo, filtros, chunk_size=CHUNK_SIZE):
+    """
+    Mesmas linhas para o StreamingHttpResponse sob ASGI: o gerador síncrono
+    avança em lotes na thread do banco (o cursor fica na mesma conexão) e cada
+    lote é enviado antes de o próximo ser lido.
+    """
+    linhas = linhas_csv(tipo, filtros, chunk_size)
+    proximo_lote = sync_to_async(lambda: list(islice(linhas, LOTE_ASYNC)), thread_sensitive=True)
+    while lote := await proximo_lote():
+        yield ''.join(lote)
@@ -0,0 +1,337 @@
+from datetime import timedelta, datetime, time
+from zoneinfo import ZoneInfo
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django.db.models import Q, Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Atividade, ExpurgoExclusoes, PlanoPreventivo, RegistroExclusao
+from .utils import formatar_duracao, prefetch_logs_recentes
+from .caching import obter_ou_calcular, geracao
+
+# Fuso fixo da fábrica: barras e detalhes sempre em horário de Brasília
+TZ_BR = ZoneInfo("America/Sao_Paulo")
+
+# Janela padrão quando o cliente não informa datas (dias antes/depois de hoje)
+JANELA_PADRAO_PASSADO = 30
+JANELA_PADRAO_FUTURO = 60
+
+STATUS_ATIVOS = ['aberta', 'executando', 'pausada']
+STATUS_ENCERRADOS = ['finalizada', 'cancelada', 'parada']
+
+# Logs por tarefa no detalhe do Gantt
+LOGS_GANTT = 10
+
+# Sobreposição do delta: cobre gravações que comitaram logo após o cursor ser emitido
+MARGEM_DELTA = timedelta(seconds=5)
+# Lápides de exclusão guardadas por este tempo (comando expurgar_exclusoes); o
+# corte de cada expurgo fica em ExpurgoExclusoes e só cursor anterior a ele
+# recebe o cronograma completo
+RETENCAO_EXCLUSOES = timedelta(days=7)
+
+# Cache compartilhado do cronograma (invalidado por escrita; ver signals.py)
+CACHE_NAMESPACE = 'gantt'
+CACHE_TIMEOUT = 60  # limita a defasagem de dados derivados do relógio (atrasos)
+
+
+def parse_data(valor):
+    """Converte 'YYYY-MM-DD' em date. Retorna None se vazio ou inválido."""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def filtros_gantt(params):
+    """
+    Lê os filtros do Gantt a partir de request.GET.
+    - inicio / fim: janela de datas (YYYY-MM-DD)
+    - tecnico: id do colaborador ('todos' ou vazio = sem filtro)
+    - status: um ou mais status separados por vírgula ('todos' ou vazio = sem filtro)
+    - all: 'false' esconde finalizadas/canceladas (padrão: mostra)
+    """
+    hoje = timezone.now().astimezone(TZ_BR).date()
+    inicio = parse_data(params.get('inicio')) or hoje - timedelta(days=JANELA_PADRAO_PASSADO)
+    fim = parse_data(params.get('fim')) or hoje + timedelta(days=JANELA_PADRAO_FUTURO)
+    if fim < inicio:
+        inicio, fim = fim, inicio
+
+    tecnico = params.get('tecnico')
+    tecnico_id = int(tecnico) if tecnico and tecnico.isdigit() else None
+
+    status_raw = params.get('status') or 'todos'
+    status = [s for s in status_raw.split(',') if s and s != 'todos']
+
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'tecnico': tecnico_id,
+        'status': status,
+        'incluir_encerradas': params.get('all', 'true').lower() != 'false',
+    }
+
+
+def atividades_gantt(filtros):
+    """
+    Queryset das atividades dentro da janela (início/fim reais vêm das colunas
+    inicio_real/fim_real). Número de queries constante: atividades + colaboradores + logs.
+    """
+    janela_inicio = datetime.combine(filtros['inicio'], time.min, tzinfo=TZ_BR)
+    janela_fim = datetime.combine(filtros['fim'] + timedelta(days=1), time.min, tzinfo=TZ_BR)
+
+    qs = Atividade.objects.select_related('maquina').annotate(
+        ref_inicio=Coalesce('inicio_real', 'data_planejada'),
+        ref_fim=Coalesce('fim_real', 'ultima_interacao', 'data_planejada'),
+    )
+
+    # Ativas: tudo que começa antes do fim da janela (atrasadas continuam visíveis)
+    # Encerradas: só o que termina dentro da janela
+    janela = Q(status__in=STATUS_ATIVOS, ref_inicio__lt=janela_fim) | Q(
+        ~Q(status__in=STATUS_ATIVOS), ref_inicio__lt=janela_fim, ref_fim__gte=janela_inicio
+    )
+    qs = qs.filter(janela)
+
+    if not filtros['incluir_encerradas']:
+        qs = qs.exclude(status__in=STATUS_ENCERRADOS)
+    if filtros['status']:
+        qs = qs.filter(status__in=filtros['status'])
+    if filtros['tecnico']:
+        qs = qs.filter(colaboradores=filtros['tecnico'])
+
+    return qs.prefetch_related(
+        'colaboradores',
+        prefetch_logs_recentes(LOGS_GANTT),
+    ).order_by('-eh_emergencial', 'data_planejada')
+
+
+def planos_gantt(filtros):
+    """Preventivas agendadas dentro da janela. Planos não têm técnico nem status de OS."""
+    if filtros['tecnico'] or filtros['status']:
+        return PlanoPreventivo.objects.none()
+    return PlanoPreventivo.objects.filter(
+        ativo=True, proxima_data__gte=filtros['inicio'], proxima_data__lte=filtros['fim']
+    ).select_related('maquina', 'procedimento_padrao')
+
+
+def serializar_atividade(act, agora_local):
+    """Monta o dicionário de uma barra do Gantt a partir de uma atividade."""
+    # Início (Real ou Planejado)
+    if act.inicio_real:
+        inicio_v = act.inicio_real.astimezone(TZ_BR)
+    elif act.status in ['executando', 'pausada']:
+        inicio_v = act.ultima_interacao.astimezone(TZ_BR) if act.ultima_interacao else agora_local
+    else:
+        inicio_v = act.data_planejada.astimezone(TZ_BR) if act.data_planejada else agora_local
+
+    # Fim (Dinamismo de Acompanhamento)
+    if act.status == 'executando':
+        # Fim é AGORA para a barra crescer com o tempo
+        fim_v = agora_local
+        end_label = None
+        progresso = 100
+    elif act.status == 'finalizada':
+        if act.fim_real:
+            fim_v = act.fim_real.astimezone(TZ_BR)
+        else:
+            fim_v = inicio_v + (act.duracao_estimada or timedelta(hours=1))
+        end_label = fim_v.strftime('%d/%m %H:%M')
+        progresso = 100
+    else:
+        # Aberta/Pausada: Fim visual baseado no estimado
+        dur_est = act.duracao_estimada if (act.duracao_estimada and act.duracao_estimada.total_seconds() > 0) else timedelta(hours=2)
+        fim_v = inicio_v + dur_est
+        end_label = None
+        progresso = 25 if act.status == 'pausada' else 0
+
+    duracao_efetiva = fim_v - inicio_v
+
+    tecnicos_obj = act.colaboradores.all()
+    tecnicos_nomes = [t.first_name or t.username for t in tecnicos_obj]
+    tecnicos_ids = [str(t.id) for t in tecnicos_obj]
+
+    # CSS Classes
+    if act.status not in ['finalizada', 'cancelada'] and (fim_v < agora_local and act.status != 'executando'):
+        custom_class = 'gantt-atrasado'
+    elif act.status == 'executando': custom_class = 'gantt-status-executando'
+    elif act.status == 'pausada': custom_class = 'gantt-status-pausada'
+    elif act.status == 'finalizada': custom_class = 'gantt-status-finalizada'
+    else: custom_class = 'gantt-status-aberta'
+
+    logs_list = [{
+        'data': l.data_registro.astimezone(TZ_BR).strftime('%d/%m %H:%M'),
+        'usuario': l.usuario.username if l.usuario else "Sistema",
+        'descricao': l.descricao
+    } for l in act.logs_recentes]
+
+    return {
+        'id': str(act.id),
+        'name': f"[{act.maquina.codigo}] {act.maquina.nome}: {act.descricao[:30]}..",
+        'full_name': act.descricao,
+        'description': act.instrucoes_tecnicas or act.descricao or "Sem descrição.",
+        'start': inicio_v.strftime('%Y-%m-%d %H:%M'),
+        'end': fim_v.strftime('%Y-%m-%d %H:%M'),
+        'start_formatted': inicio_v.strftime('%d/%m %H:%M'),
+        'end_formatted': end_label,
+        'duration': formatar_duracao(duracao_efetiva),
+        'progress': progresso,
+        'custom_class': custom_class,
+        'dependencies': '',
+        'maquina': act.maquina.nome,
+        'status': act.status,
+        'status_display': act.get_status_display(),
+        'tech_names': ", ".join(tecnicos_nomes) if tecnicos_nomes else "Sem técnicos",
+        'tecnicos': ", ".join(tecnicos_nomes) if tecnicos_nomes else "Pendente",
+        'tech_ids': tecnicos_ids,
+        'tempo_pausa': act.tempo_total_pausa.total_seconds(),
+        'logs': logs_list
+    }
+
+
+def serializar_plano(plano):
+    """Monta a barra de uma preventiva futura (próxima ocorrência às 08:00)."""
+    inicio_p = timezone.make_aware(datetime.combine(plano.proxima_data, time(8, 0)))
+    inicio_p_local = timezone.localtime(inicio_p)
+    dur_p = plano.procedimento_padrao.duracao_estimada_padrao if (plano.procedimento_padrao and plano.procedimento_padrao.duracao_estimada_padrao) else timedelta(hours=2)
+    fim_p_local = inicio_p_local + dur_p
+
+    return {
+        'id': f"plano-{plano.id}",
+        'name': f"[AGRND] {plano.maquina.nome}: {plano.nome}",
+        'full_name': f"Preventiva: {plano.nome}",
+        'description': f"Procedimento: {plano.procedimento_padrao.nome if plano.procedimento_padrao else 'Padrão'}",
+        'start': inicio_p_local.strftime('%Y-%m-%d %H:%M'),
+        'end': fim_p_local.strftime('%Y-%m-%d %H:%M'),
+        'start_formatted': inicio_p_local.strftime('%d/%m %H:%M'),
+        'end_formatted': fim_p_local.strftime('%d/%m %H:%M'),
+        'duration': formatar_duracao(dur_p),
+        'progress': 0,
+        'custom_class': 'gantt-status-aberta',
+        'dependencies': '',
+        'maquina': plano.maquina.nome,
+        'status': 'Agendada',
+        'status_display': 'Agendada',
+        'tech_names': "Industrial",
+        'tecnicos': "Sincronização Automática",
+        'tech_ids': [],
+        'tempo_pausa': 0,
+        'logs': []
+    }
+
+
+def montar_dados_gantt(filtros):
+    """Lista completa de barras (atividades + preventivas futuras) para os filtros informados."""
+    agora_local = timezone.now().astimezone(TZ_BR)
+    dados = [serializar_atividade(act, agora_local) for act in atividades_gantt(filtros)]
+    dados += [serializar_plano(plano) for plano in planos_gantt(filtros)]
+    return dados
+
+
+def chave_cache(tipo, filtros=None):
+    """Chave do cache para a geração atual; filtros diferentes geram entradas diferentes."""
+    base = f"gantt:{tipo}:{geracao(CACHE_NAMESPACE)}"
+    if filtros is None:
+        return base
+    assinatura = f"{filtros['inicio']}|{filtros['fim']}|{filtros['tecnico']}|{','.join(sorted(filtros['status']))}|{filtros['incluir_encerradas']}"
+    return f"{base}:{hashlib.md5(assinatura.encode()).hexdigest()}"
+
+
+def dados_gantt_json(filtros):
+    """Cronograma completo já serializado em JSON, compartilhado entre todos os usuários."""
+    return obter_ou_calcular(
+        CACHE_NAMESPACE,
+        chave_cache('dados', filtros),
+        lambda: json.dumps(montar_dados_gantt(filtros), cls=DjangoJSONEncoder),
+        CACHE_TIMEOUT,
+    )
+
+
+# --- MODO DELTA (polling incremental) ---
+
+def parse_cursor(valor):
+    """Converte o cursor (ISO 8601) devolvido pela API em datetime. None se inválido."""
+    if not valor:
+        return None
+    try:
+        dt = datetime.fromisoformat(valor.replace(' ', '+'))
+    except ValueError:
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def marcador_alteracoes():
+    """
+    Instante da última escrita em atividades, planos ou exclusões.
+    Três MAX() sobre colunas indexadas: é o custo de um poll sem novidades.
+    """
+    marcas = [
+        Atividade.objects.aggregate(m=Max('atualizado_em'))['m'],
+        PlanoPreventivo.objects.aggregate(m=Max('atualizado_em'))['m'],
+        RegistroExclusao.objects.aggregate(m=Max('data_exclusao'))['m'],
+    ]
+    marcas = [m for m in marcas if m]
+    return max(marcas) if marcas else timezone.make_aware(datetime(2000, 1, 1))
+
+
+def cursor_atual():
+    """Marcador de alterações em ISO 8601; só vai ao banco uma vez por geração do cache."""
+    return obter_ou_calcular(
+        CACHE_NAMESPACE, chave_cache('cursor'), lambda: marcador_alteracoes().isoformat(), CACHE_TIMEOUT
+    )
+
+
+def cursor_expirado(desde):
+    """
+    O delta desse cursor consultaria lápides já expurgadas. Decide pelo corte
+    gravado no expurgo, não pelo relógio: planta parada continua no delta (e no 304).
+    """
+    corte = desde - MARGEM_DELTA
+    if corte >= timezone.now() - RETENCAO_EXCLUSOES:
+        return False  # nenhum expurgo alcança lápides tão recentes: sem consulta
+    ultimo = ExpurgoExclusoes.objects.aggregate(m=Max('limite'))['m']
+    return ultimo is not None and corte <= ultimo
+
+
+def expurgar_exclusoes():
+    """
+    Apaga as lápides mais antigas que a retenção e grava como corte a mais nova
+    delas: só um cursor que ainda a veria perde alguma coisa. Retorna quantas apagou.
+    """
+    antigas = RegistroExclusao.objects.filter(data_exclusao__lt=timezone.now() - RETENCAO_EXCLUSOES)
+    ultima = antigas.aggregate(m=Max('data_exclusao'))['m']
+    if ultima is None:
+        return 0
+    # Marca antes de apagar: um cursor nunca é aceito sem as lápides de que precisa
+    ExpurgoExclusoes.objects.filter(limite__lt=ultima).delete()
+    ExpurgoExclusoes.objects.create(limite=ultima)
+    return RegistroExclusao.objects.filter(data_exclusao__lte=ultima).delete()[0]
+
+
+def montar_delta_gantt(filtros, desde):
+    """
+    Barras alteradas desde o cursor e ids que devem sair do gráfico
+    (excluídos ou que deixaram de atender aos filtros).
+    """
+    corte = desde - MARGEM_DELTA
+    agora_local = timezone.now().astimezone(TZ_BR)
+
+    alteradas = set(Atividade.objects.filter(atualizado_em__gte=corte).values_list('id', flat=True))
+    upserts = [serializar_atividade(act, agora_local) for act in atividades_gantt(filtros).filter(atualizado_em__gte=corte)]
+    removidos = [str(pk) for pk in alteradas - {int(d['id']) for d in upserts}]
+
+    planos_alterados = set(PlanoPreventivo.objects.filter(atualizado_em__gte=corte).values_list('id', flat=True))
+    planos = [serializar_plano(plano) for plano in planos_gantt(filtros).filter(atualizado_em__gte=corte)]
+    upserts += planos
+    removidos += [f"plano-{pk}" for pk in planos_alterados - {int(d['id'].split('-')[1]) for d in planos}]
+
+    for exc in RegistroExclusao.objects.filter(data_exclusao__gte=corte):
+        removidos.append(f"plano-{exc.objeto_id}" if exc.modelo == 'plano' else str(exc.objeto_id))
+
+    return upserts, removidos
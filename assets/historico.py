@@ -0,0 +1,111 @@
+"""
+Feeds paginados por cursor (keyset): histórico unificado, concluídas do quadro
+e chamados pendentes.
+
+O cursor é a chave de ordenação do último item entregue (instante, tipo, id);
+a próxima página é "tudo abaixo dessa chave" com LIMIT, resolvido pelos índices
+de (instante, id). Página 1 ou página 1000 custam o mesmo, sem OFFSET e sem
+ordenação em Python: o histórico une OS e chamados com UNION ALL ordenado no banco.
+"""
+from django.db.models import CharField, F, Q, Value
+
+from .gantt import parse_cursor
+from .models import Atividade, Chamado
+from .utils import formatar_duracao
+
+PAGINA_HISTORICO = 30
+PAGINA_NOTIFICACOES = 10
+SEPARADOR = '|'
+# Ordem decrescente por (momento, tipo, id); o tipo só desempata instantes iguais
+TIPOS = ('atividade', 'chamado')
+STATUS_PROCESSADOS = ['aprovado', 'recusado']
+
+
+def montar_cursor(momento, tipo, pk):
+    return SEPARADOR.join([momento.isoformat(), tipo, str(pk)])
+
+
+def ler_cursor(valor):
+    """(momento, tipo, id) de um cursor; None se ausente ou inválido."""
+    partes = (valor or '').split(SEPARADOR)
+    if len(partes) != 3 or partes[1] not in TIPOS or not partes[2].isdigit():
+        return None
+    momento = parse_cursor(partes[0])
+    return (momento, partes[1], int(partes[2])) if momento else None
+
+
+def abaixo_do_cursor(campo, tipo, cursor):
+    """
+    Filtro "chave < cursor" de um ramo cujo tipo é constante: vira uma faixa
+    simples sobre (campo, id), que o índice resolve.
+    """
+    if cursor is None:
+        return Q()
+    momento, tipo_cursor, pk = cursor
+    if tipo < tipo_cursor:
+        return Q(**{f'{campo}__lte': momento})
+    if tipo > tipo_cursor:
+        return Q(**{f'{campo}__lt': momento})
+    return Q(**{f'{campo}__lt': momento}) | Q(**{campo: momento, 'id__lt': pk})
+
+
+def _pagina(linhas, limite, chave):
+    """Corta a página (busca-se limite + 1) e monta o cursor da próxima."""
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+    proximo = montar_cursor(*chave(linhas[-1])) if tem_mais else None
+    return linhas, proximo
+
+
+def feed_historico(cursor=None, limite=PAGINA_HISTORICO):
+    """
+    OS finalizadas (por fim_real) e chamados aprovados/recusados (por abertura),
+    do mais recente para o mais antigo. Retorna (itens, próximo cursor); cada item
+    é a instância com `tipo_historico` e `momento`.
+    """
+    atividades = Atividade.objects.filter(
+        abaixo_do_cursor('fim_real', 'atividade', cursor), status='finalizada', fim_real__isnull=False,
+    ).annotate(
+        momento=F('fim_real'), tipo=Value('atividade', output_field=CharField()),
+    ).values_list('momento', 'tipo', 'id')
+    chamados = Chamado.objects.filter(
+        abaixo_do_cursor('data_abertura', 'chamado', cursor), status__in=STATUS_PROCESSADOS,
+    ).annotate(
+        momento=F('data_abertura'), tipo=Value('chamado', output_field=CharField()),
+    ).values_list('momento', 'tipo', 'id')
+
+    chaves = list(atividades.union(chamados, all=True).order_by('-momento', '-tipo', '-id')[:limite + 1])
+    chaves, proximo = _pagina(chaves, limite, lambda c: c)
+
+    # Hidrata cada tipo numa consulta e mantém a ordem vinda do banco
+    ids = {tipo: [pk for _, t, pk in chaves if t == tipo] for tipo in TIPOS}
+    objetos = {}
+    if ids['atividade']:
+        for act in Atividade.objects.filter(id__in=ids['atividade']).select_related('maquina').prefetch_related('colaboradores'):
+            act.tempo_gasto_formatado = formatar_duracao(act.tempo_total_gasto)
+            objetos[('atividade', act.id)] = act
+    if ids['chamado']:
+        for chamado in Chamado.objects.filter(id__in=ids['chamado']).select_related('maquina', 'requisitante'):
+            objetos[('chamado', chamado.id)] = chamado
+
+    itens = []
+    for momento, tipo, pk in chaves:
+        item = objetos.get((tipo, pk))
+        if item is not None:
+            item.tipo_historico, item.momento = tipo, momento
+            itens.append(item)
+    return itens, proximo
+
+
+def pagina_concluidas(qs, cursor=None, limite=PAGINA_HISTORICO):
+    """Próxima página das finalizadas do quadro (qs ordenado por -fim_real, -id)."""
+    atividades = list(qs.filter(fim_real__isnull=False).filter(abaixo_do_cursor('fim_real', 'atividade', cursor))[:limite + 1])
+    return _pagina(atividades, limite, lambda act: (act.fim_real, 'atividade', act.id))
+
+
+def chamados_pendentes(cursor=None, limite=PAGINA_NOTIFICACOES):
+    """Chamados na triagem, mais novos primeiro."""
+    qs = Chamado.objects.filter(status='pendente').filter(
+        abaixo_do_cursor('data_abertura', 'chamado', cursor)
+    ).select_related('maquina', 'requisitante').order_by('-data_abertura', '-id')
+    return _pagina(list(qs[:limite + 1]), limite, lambda chamado: (chamado.data_abertura, 'chamado', chamado.id))
@@ -0,0 +1,534 @@
+"""
+Importação em lote (CSV) de máquinas, procedimentos, planos e histórico de OS.
+
+Cada lote de linhas é validado em memória, as chaves estrangeiras (código da
+máquina, do procedimento, usuário, referência da OS) são resolvidas com uma
+consulta por lote e a gravação usa bulk_create/bulk_update numa transação por
+lote. Erros ficam por linha e não interrompem o restante do arquivo. Uploads
+pela tela viram uma Importacao processada fora do request (agendar_importacao).
+
+Colunas aceitas: ver `colunas` de cada importador. Datas em AAAA-MM-DD ou
+DD/MM/AAAA (com HH:MM opcional, horário de Brasília); horas com vírgula ou ponto.
+"""
+import csv
+import io
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .caching import invalidar
+from .gantt import TZ_BR
+from .indicadores import dia_local, reconstruir_atividades
+from .models import Atividade, AtividadeLog, Importacao, Maquina, PlanoPreventivo, ProcedimentoPreventivo
+from .utils import preencher_tempos_reais
+
+logger = logging.getLogger(__name__)
+
+LOTE_PADRAO = 2000
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y')
+FORMATOS_DATA_HORA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+VERDADEIRO = {'1', 'sim', 's', 'true', 'verdadeiro', 'x', 'yes'}
+FALSO = {'0', 'nao', 'não', 'n', 'false', 'falso', 'no', ''}
+
+
+class ErroLinha(ValueError):
+    pass
+
+
+def ler_csv(arquivo):
+    """(número da linha, dict) de um arquivo texto; detecta ';' ou ',' pelo cabeçalho."""
+    cabecalho = arquivo.readline().lstrip('\ufeff')
+    delimitador = ';' if cabecalho.count(';') >= cabecalho.count(',') else ','
+    colunas = [c.strip().lower() for c in next(csv.reader([cabecalho], delimiter=delimitador))]
+    for numero, valores in enumerate(csv.reader(arquivo, delimiter=delimitador), start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, {coluna: valor.strip() for coluna, valor in zip(colunas, valores)}
+
+
+def abrir_upload(arquivo):
+    """Arquivo enviado (bytes) como texto, aceitando UTF-8 com BOM ou Latin-1 (Excel antigo)."""
+    conteudo = arquivo.read()
+    try:
+        texto = conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+    return io.StringIO(texto, newline='')
+
+
+# --- Conversões de campo ---
+
+def texto(linha, coluna, obrigatorio=True, maximo=None):
+    valor = linha.get(coluna, '')
+    if obrigatorio and not valor:
+        raise ErroLinha(f"'{coluna}' é obrigatório")
+    if maximo and len(valor) > maximo:
+        raise ErroLinha(f"'{coluna}' passa de {maximo} caracteres")
+    return valor
+
+
+def inteiro(linha, coluna, padrao=None):
+    valor = linha.get(coluna, '')
+    if not valor:
+        if padrao is None:
+            raise ErroLinha(f"'{coluna}' é obrigatório")
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErroLinha(f"'{coluna}' inválido: {valor}")
+
+
+def horas(linha, coluna, padrao=None):
+    valor = linha.get(coluna, '')
+    if not valor:
+        if padrao is None:
+            raise ErroLinha(f"'{coluna}' é obrigatório")
+        return padrao
+    try:
+        return timedelta(hours=float(valor.replace(',', '.')))
+    except ValueError:
+        raise ErroLinha(f"'{coluna}' inválido: {valor}")
+
+
+def booleano(linha, coluna, padrao=False):
+    valor = linha.get(coluna, '').lower()
+    if coluna not in linha or (not valor and padrao):
+        return padrao
+    if valor in VERDADEIRO:
+        return True
+    if valor in FALSO:
+        return False
+    raise ErroLinha(f"'{coluna}' inválido: {valor}")
+
+
+def data(linha, coluna):
+    valor = texto(linha, coluna)
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ErroLinha(f"'{coluna}' inválida: {valor}")
+
+
+def data_hora(linha, coluna, obrigatorio=True):
+    valor = linha.get(coluna, '')
+    if not valor:
+        if obrigatorio:
+            raise ErroLinha(f"'{coluna}' é obrigatório")
+        return None
+    try:
+        # Caminho rápido (ISO, o formato dos exports): fromisoformat é nativo
+        momento = datetime.fromisoformat(valor)
+    except ValueError:
+        for formato in FORMATOS_DATA_HORA:
+            try:
+                momento = datetime.strptime(valor, formato)
+                break
+            except ValueError:
+                pass
+        else:
+            raise ErroLinha(f"'{coluna}' inválida: {valor}")
+    return momento if momento.tzinfo else momento.replace(tzinfo=TZ_BR)
+
+
+# --- Importadores ---
+
+class Importador:
+    colunas = ()
+
+    def __init__(self, lote=LOTE_PADRAO):
+        self.lote = lote
+        self.criados = 0
+        self.atualizados = 0
+        self.erros = []
+
+    def importar(self, linhas):
+        """Consome (número, dict) em lotes. Retorna o resumo."""
+        pendentes = []
+        for numero, linha in linhas:
+            try:
+                pendentes.append((numero, self.validar(linha)))
+            except ErroLinha as erro:
+                self.erros.append((numero, str(erro)))
+            if len(pendentes) >= self.lote:
+                self._gravar(pendentes)
+                pendentes = []
+        if pendentes:
+            self._gravar(pendentes)
+        if self.criados or self.atualizados:
+            self.finalizar()
+        return self.resumo()
+
+    def _gravar(self, pendentes):
+        with transaction.atomic():
+            self.gravar(pendentes)
+
+    def erro(self, numero, mensagem):
+        self.erros.append((numero, mensagem))
+
+    def resumo(self):
+        return {
+            'criados': self.criados,
+            'atualizados': self.atualizados,
+            'erros': [{'linha': n, 'erro': e} for n, e in sorted(self.erros)],
+        }
+
+    def validar(self, linha):
+        raise NotImplementedError
+
+    def gravar(self, pendentes):
+        raise NotImplementedError
+
+    def finalizar(self):
+        pass
+
+
+def por_chave(pendentes, chave):
+    """Última ocorrência de cada chave no lote (linhas repetidas: a última vence)."""
+    resultado = {}
+    for numero, dados in pendentes:
+        resultado[chave(dados)] = (numero, dados)
+    return resultado
+
+
+class ImportadorMaquinas(Importador):
+    colunas = ('codigo', 'nome')
+
+    def validar(self, linha):
+        return {'codigo': texto(linha, 'codigo', maximo=50), 'nome': texto(linha, 'nome', maximo=100)}
+
+    def gravar(self, pendentes):
+        linhas = por_chave(pendentes, lambda d: d['codigo'])
+        existentes = Maquina.objects.in_bulk(list(linhas), field_name='codigo')
+        novas, alteradas = [], []
+        for codigo, (_, dados) in linhas.items():
+            maquina = existentes.get(codigo)
+            if maquina is None:
+                novas.append(Maquina(**dados))
+            elif maquina.nome != dados['nome']:
+                maquina.nome = dados['nome']
+                alteradas.append(maquina)
+        Maquina.objects.bulk_create(novas)
+        Maquina.objects.bulk_update(alteradas, ['nome'])
+        if alteradas:
+            # Mesmo efeito do sinal maquina_alterada: cards e barras mostram o nome
+            Atividade.objects.filter(maquina__in=alteradas).update(atualizado_em=timezone.now())
+        self.criados += len(novas)
+        self.atualizados += len(alteradas)
+
+    def finalizar(self):
+        invalidar('gantt')
+
+
+class ImportadorProcedimentos(Importador):
+    colunas = ('codigo', 'nome', 'duracao_horas', 'instrucoes')
+
+    def validar(self, linha):
+        return {
+            'codigo': texto(linha, 'codigo', maximo=50),
+            'nome': texto(linha, 'nome', maximo=200),
+            'instrucoes': texto(linha, 'instrucoes', obrigatorio=False),
+            'duracao_estimada_padrao': horas(linha, 'duracao_horas', padrao=timedelta(hours=1)),
+        }
+
+    def gravar(self, pendentes):
+        linhas = por_chave(pendentes, lambda d: d['codigo'])
+        existentes = ProcedimentoPreventivo.objects.in_bulk(list(linhas), field_name='codigo')
+        novos, alterados = [], []
+        for codigo, (_, dados) in linhas.items():
+            procedimento = existentes.get(codigo)
+            if procedimento is None:
+                novos.append(ProcedimentoPreventivo(**dados))
+            else:
+                for campo, valor in dados.items():
+                    setattr(procedimento, campo, valor)
+                alterados.append(procedimento)
+        ProcedimentoPreventivo.objects.bulk_create(novos)
+        ProcedimentoPreventivo.objects.bulk_update(alterados, ['nome', 'instrucoes', 'duracao_estimada_padrao'])
+        self.criados += len(novos)
+        self.atualizados += len(alterados)
+
+
+class ImportadorPlanos(Importador):
+    """Planos identificados por (máquina, nome): reimportar atualiza em vez de duplicar."""
+    colunas = ('nome', 'maquina', 'procedimento', 'frequencia_dias', 'proxima_data', 'ativo')
+
+    def validar(self, linha):
+        frequencia = inteiro(linha, 'frequencia_dias')
+        if frequencia < 1:
+            raise ErroLinha("'frequencia_dias' deve ser maior que zero")
+        return {
+            'nome': texto(linha, 'nome', maximo=100),
+            'maquina': texto(linha, 'maquina'),
+            'procedimento': texto(linha, 'procedimento', obrigatorio=False),
+            'frequencia_dias': frequencia,
+            'proxima_data': data(linha, 'proxima_data'),
+            'ativo': booleano(linha, 'ativo', padrao=True),
+        }
+
+    def gravar(self, pendentes):
+        maquinas = dict(Maquina.objects.filter(codigo__in={d['maquina'] for _, d in pendentes}).values_list('codigo', 'id'))
+        procedimentos = dict(ProcedimentoPreventivo.objects.filter(
+            codigo__in={d['procedimento'] for _, d in pendentes if d['procedimento']}
+        ).values_list('codigo', 'id'))
+
+        resolvidos = []
+        for numero, dados in pendentes:
+            if dados['maquina'] not in maquinas:
+                self.erro(numero, f"máquina desconhecida: {dados['maquina']}")
+            elif dados['procedimento'] and dados['procedimento'] not in procedimentos:
+                self.erro(numero, f"procedimento desconhecido: {dados['procedimento']}")
+            else:
+                dados['maquina_id'] = maquinas[dados.pop('maquina')]
+                codigo = dados.pop('procedimento')
+                dados['procedimento_padrao_id'] = procedimentos.get(codigo)
+                resolvidos.append((numero, dados))
+
+        linhas = por_chave(resolvidos, lambda d: (d['maquina_id'], d['nome']))
+        existentes = {
+            (p.maquina_id, p.nome): p
+            for p in PlanoPreventivo.objects.filter(
+                maquina_id__in={k[0] for k in linhas}, nome__in={k[1] for k in linhas}
+            )
+        }
+        agora = timezone.now()
+        novos, alterados = [], []
+        for chave, (_, dados) in linhas.items():
+            plano = existentes.get(chave)
+            if plano is None:
+                novos.append(PlanoPreventivo(**dados))
+            else:
+                for campo, valor in dados.items():
+                    setattr(plano, campo, valor)
+                plano.atualizado_em = agora
+                alterados.append(plano)
+        PlanoPreventivo.objects.bulk_create(novos)
+        PlanoPreventivo.objects.bulk_update(
+            alterados, ['procedimento_padrao_id', 'frequencia_dias', 'proxima_data', 'ativo', 'atualizado_em']
+        )
+        self.criados += len(novos)
+        self.atualizados += len(alterados)
+
+    def finalizar(self):
+        invalidar('gantt')
+
+
+class ImportadorAtividades(Importador):
+    """Histórico de OS; `referencia` é o id no sistema de origem (Atividade.codigo_legado)."""
+    colunas = ('referencia', 'maquina', 'descricao', 'status', 'preventiva', 'emergencial', 'data_planejada',
+               'duracao_horas', 'inicio_real', 'fim_real', 'tempo_gasto_horas', 'tempo_pausa_horas', 'tecnicos')
+    campos = ('maquina_id', 'descricao', 'status', 'eh_preventiva', 'eh_emergencial', 'data_planejada',
+              'duracao_estimada', 'inicio_real', 'fim_real', 'tempo_total_gasto', 'tempo_total_pausa',
+              'ultima_interacao')
+    status_validos = {s for s, _ in Atividade.STATUS_CHOICES}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # OS gravadas e (máquina, dia) que OS alteradas ocupavam antes: só eles são recalculados
+        self.tocadas = set()
+        self.chaves_anteriores = set()
+
+    def validar(self, linha):
+        status = texto(linha, 'status', obrigatorio=False).lower() or 'finalizada'
+        if status not in self.status_validos:
+            raise ErroLinha(f"status inválido: {status}")
+        inicio_real = data_hora(linha, 'inicio_real', obrigatorio=False)
+        fim_real = data_hora(linha, 'fim_real', obrigatorio=False)
+        if inicio_real and fim_real and fim_real < inicio_real:
+            raise ErroLinha("'fim_real' anterior a 'inicio_real'")
+        tecnicos = texto(linha, 'tecnicos', obrigatorio=False)
+        return {
+            'codigo_legado': texto(linha, 'referencia', maximo=50),
+            'maquina': texto(linha, 'maquina'),
+            'descricao': texto(linha, 'descricao', maximo=255),
+            'status': status,
+            'eh_preventiva': booleano(linha, 'preventiva'),
+            'eh_emergencial': booleano(linha, 'emergencial'),
+            'data_planejada': data_hora(linha, 'data_planejada'),
+            'duracao_estimada': horas(linha, 'duracao_horas', padrao=timedelta(hours=1)),
+            'inicio_real': inicio_real,
+            'fim_real': fim_real,
+            'tempo_total_gasto': horas(linha, 'tempo_gasto_horas', padrao=timedelta(0)),
+            'tempo_total_pausa': horas(linha, 'tempo_pausa_horas', padrao=timedelta(0)),
+            'ultima_interacao': fim_real or inicio_real,
+            'tecnicos': [t.strip() for t in tecnicos.replace('|', ',').split(',') if t.strip()],
+        }
+
+    def gravar(self, pendentes):
+        maquinas = dict(Maquina.objects.filter(codigo__in={d['maquina'] for _, d in pendentes}).values_list('codigo', 'id'))
+        usuarios = dict(User.objects.filter(
+            username__in={t for _, d in pendentes for t in d['tecnicos']}
+        ).values_list('username', 'id'))
+
+        resolvidos = []
+        for numero, dados in pendentes:
+            desconhecidos = [t for t in dados['tecnicos'] if t not in usuarios]
+            if dados['maquina'] not in maquinas:
+                self.erro(numero, f"máquina desconhecida: {dados['maquina']}")
+            elif desconhecidos:
+                self.erro(numero, f"técnico desconhecido: {', '.join(desconhecidos)}")
+            else:
+                dados['maquina_id'] = maquinas[dados.pop('maquina')]
+                resolvidos.append((numero, dados))
+
+        linhas = por_chave(resolvidos, lambda d: d['codigo_legado'])
+        existentes = Atividade.objects.in_bulk(list(linhas), field_name='codigo_legado')
+        novas, alteradas = [], []
+        for referencia, (_, dados) in linhas.items():
+            atividade = existentes.get(referencia)
+            valores = {campo: dados[campo] for campo in self.campos}
+            if atividade is None:
+                novas.append(Atividade(codigo_legado=referencia, **valores))
+            else:
+                self.chaves_anteriores.update(
+                    (atividade.maquina_id, dia_local(momento))
+                    for momento in (atividade.data_planejada, atividade.inicio_real, atividade.fim_real) if momento
+                )
+                for campo, valor in valores.items():
+                    setattr(atividade, campo, valor)
+                alteradas.append(atividade)
+        Atividade.objects.bulk_create(novas)
+        Atividade.objects.bulk_update(alteradas, list(self.campos))
+
+        # Equipes: ids das OS do lote numa consulta (nem todo banco devolve pk no bulk_create)
+        ids = dict(Atividade.objects.filter(codigo_legado__in=list(linhas)).values_list('codigo_legado', 'id'))
+        Equipe = Atividade.colaboradores.through
+        Equipe.objects.filter(atividade_id__in=ids.values()).delete()
+        Equipe.objects.bulk_create([
+            Equipe(atividade_id=ids[referencia], user_id=usuarios[t])
+            for referencia, (_, dados) in linhas.items() for t in set(dados['tecnicos'])
+        ], batch_size=5000)
+
+        self.tocadas.update(ids.values())
+        self.criados += len(novas)
+        self.atualizados += len(alteradas)
+
+    def finalizar(self):
+        # bulk_* não disparam sinais: cache do Gantt e indicadores das OS do arquivo são refeitos aqui
+        invalidar('gantt')
+        reconstruir_atividades(self.tocadas, self.chaves_anteriores)
+
+
+class ImportadorLogs(Importador):
+    """Transições de status das OS importadas (referencia = codigo_legado). Reimportar não duplica."""
+    colunas = ('referencia', 'status', 'data_registro', 'usuario', 'descricao', 'duracao_horas')
+    status_validos = ImportadorAtividades.status_validos
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tocadas = set()
+
+    def validar(self, linha):
+        status = texto(linha, 'status', maximo=20).lower()
+        if status not in self.status_validos:
+            raise ErroLinha(f"status inválido: {status}")
+        duracao = linha.get('duracao_horas', '')
+        return {
+            'referencia': texto(linha, 'referencia', maximo=50),
+            'status_novo': status,
+            'data_registro': data_hora(linha, 'data_registro'),
+            'usuario': texto(linha, 'usuario', obrigatorio=False),
+            'descricao': texto(linha, 'descricao', obrigatorio=False, maximo=255) or None,
+            'duracao': horas(linha, 'duracao_horas') if duracao else None,
+        }
+
+    def gravar(self, pendentes):
+        atividades = dict(Atividade.objects.filter(
+            codigo_legado__in={d['referencia'] for _, d in pendentes}
+        ).values_list('codigo_legado', 'id'))
+        usuarios = dict(User.objects.filter(
+            username__in={d['usuario'] for _, d in pendentes if d['usuario']}
+        ).values_list('username', 'id'))
+        ja_importados = set(AtividadeLog.objects.filter(
+            atividade_id__in=atividades.values()
+        ).values_list('atividade_id', 'status_novo', 'data_registro'))
+
+        novos = []
+        for numero, dados in pendentes:
+            atividade_id = atividades.get(dados['referencia'])
+            if atividade_id is None:
+                self.erro(numero, f"OS desconhecida: {dados['referencia']}")
+                continue
+            if dados['usuario'] and dados['usuario'] not in usuarios:
+                self.erro(numero, f"usuário desconhecido: {dados['usuario']}")
+                continue
+            chave = (atividade_id, dados['status_novo'], dados['data_registro'])
+            if chave in ja_importados:
+                continue
+            ja_importados.add(chave)
+            novos.append(AtividadeLog(
+                atividade_id=atividade_id,
+                usuario_id=usuarios.get(dados['usuario']),
+                status_novo=dados['status_novo'],
+                data_registro=dados['data_registro'],
+                descricao=dados['descricao'],
+                duracao=dados['duracao'],
+            ))
+        AtividadeLog.objects.bulk_create(novos, batch_size=5000)
+        self.tocadas.update(log.atividade_id for log in novos)
+        self.criados += len(novos)
+
+    def finalizar(self):
+        # Início/fim reais das OS sem esses campos saem do histórico recém-importado
+        preencher_tempos_reais(self.tocadas)
+        invalidar('gantt')
+        reconstruir_atividades(self.tocadas)
+
+
+IMPORTADORES = {
+    'maquinas': ImportadorMaquinas,
+    'procedimentos': ImportadorProcedimentos,
+    'planos': ImportadorPlanos,
+    'atividades': ImportadorAtividades,
+    'logs': ImportadorLogs,
+}
+
+
+# --- Uploads em segundo plano ---
+
+def processar_importacao(importacao_id):
+    """Executa uma Importacao pendente e grava o resumo (ou 'falhou', com o erro no log)."""
+    importacao = Importacao.objects.get(pk=importacao_id)
+    importacao.status = 'processando'
+    importacao.save(update_fields=['status'])
+    try:
+        importador = IMPORTADORES[importacao.tipo]()
+        importacao.resumo = importador.importar(ler_csv(io.StringIO(importacao.conteudo, newline='')))
+        importacao.status = 'concluida'
+    except Exception:
+        logger.exception("Falha na importação #%s (%s)", importacao.id, importacao.tipo)
+        importacao.status = 'falhou'
+    importacao.conteudo = ''
+    importacao.concluido_em = timezone.now()
+    importacao.save(update_fields=['status', 'resumo', 'conteudo', 'concluido_em'])
+
+
+def _processar_em_thread(importacao_id):
+    try:
+        processar_importacao(importacao_id)
+    except Exception:
+        logger.exception("Falha ao processar a importação #%s", importacao_id)
+    finally:
+        close_old_connections()
+
+
+def agendar_importacao(importacao):
+    """
+    Processa a importação depois do commit: numa thread daemon (padrão) ou no
+    próprio processo com settings.IMPORTACAO['ASYNC'] = False (testes, depuração).
+    """
+    def iniciar():
+        if getattr(settings, 'IMPORTACAO', {}).get('ASYNC', True):
+            threading.Thread(
+                target=_processar_em_thread, args=(importacao.id,), name=f'importacao-{importacao.id}', daemon=True
+            ).start()
+        else:
+            processar_importacao(importacao.id)
+    transaction.on_commit(iniciar)
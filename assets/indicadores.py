@@ -0,0 +1,224 @@
+"""
+Indicadores diários por máquina (IndicadorMaquinaDia).
+
+Mantidos incrementalmente a cada transição registrada em AtividadeLog; o
+comando `reconstruir_indicadores` recalcula tudo a partir do histórico e as
+importações recalculam só as máquinas e dias que tocaram. Os
+gráficos leem estas linhas agregadas em vez de varrer Atividade/AtividadeLog.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Case, DateTimeField, ExpressionWrapper, F, Max, Min, PositiveIntegerField, Q, Sum, Value, When,
+)
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .gantt import TZ_BR
+from .models import Atividade, AtividadeLog, Chamado, IndicadorMaquinaDia
+
+# Status cujo tempo é acumulado quando o intervalo fecha
+CAMPO_TEMPO = {'executando': 'tempo_executando', 'pausada': 'tempo_pausado'}
+
+
+def dia_local(momento):
+    """Dia (fuso de Brasília) de um datetime; aceita o texto cru vindo de um POST."""
+    if isinstance(momento, str):
+        momento = Atividade._meta.get_field('data_planejada').to_python(momento)
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento, TZ_BR)
+    return timezone.localtime(momento, TZ_BR).date()
+
+
+def fatiar_por_dia(inicio, fim):
+    """Divide [inicio, fim) nas meias-noites de Brasília: [(data, duração), ...]."""
+    inicio, fim = timezone.localtime(inicio, TZ_BR), timezone.localtime(fim, TZ_BR)
+    fatias = []
+    while inicio < fim:
+        meia_noite = datetime.combine(inicio.date() + timedelta(days=1), time.min, tzinfo=TZ_BR)
+        corte = min(meia_noite, fim)
+        fatias.append((inicio.date(), corte - inicio))
+        inicio = corte
+    return fatias
+
+
+def acumular(*lotes):
+    """
+    Soma lotes de incrementos {(maquina, data): {campo: valor}} em duas consultas,
+    quantos dias e máquinas forem: cria as linhas que faltam e aplica tudo num
+    único UPDATE com CASE por campo.
+    """
+    total = defaultdict(dict)
+    for lote in lotes:
+        for chave, incrementos in lote.items():
+            for campo, valor in incrementos.items():
+                if valor:
+                    total[chave][campo] = total[chave][campo] + valor if campo in total[chave] else valor
+    total = {chave: incrementos for chave, incrementos in total.items() if any(incrementos.values())}
+    if not total:
+        return
+
+    IndicadorMaquinaDia.objects.bulk_create(
+        [IndicadorMaquinaDia(maquina_id=maquina_id, data=data) for maquina_id, data in total], ignore_conflicts=True,
+    )
+    linhas = Q()
+    for maquina_id, data in total:
+        linhas |= Q(maquina_id=maquina_id, data=data)
+    campos = {campo for incrementos in total.values() for campo in incrementos}
+    # F(): transições concorrentes da mesma máquina não se sobrescrevem
+    atualizacao = {}
+    for campo in campos:
+        field = IndicadorMaquinaDia._meta.get_field(campo)
+        atualizacao[campo] = novo = F(campo) + Case(
+            *[
+                When(maquina_id=maquina_id, data=data, then=Value(incrementos[campo], output_field=field))
+                for (maquina_id, data), incrementos in total.items() if campo in incrementos
+            ],
+            default=Value(field.get_default(), output_field=field), output_field=field,
+        )
+        if isinstance(field, PositiveIntegerField):
+            # Baixas de OS anteriores aos indicadores (sem reconstruir) não ficam negativas
+            atualizacao[campo] = Greatest(novo, Value(0))
+    IndicadorMaquinaDia.objects.filter(linhas).update(**atualizacao)
+
+
+def aberturas(atividades, sinal=1):
+    """Corretivas/preventivas no dia planejado de cada uma (sinal=-1 para retirá-las)."""
+    contagem = defaultdict(lambda: {'corretivas': 0, 'preventivas': 0})
+    for act in atividades:
+        campo = 'preventivas' if act.eh_preventiva else 'corretivas'
+        contagem[(act.maquina_id, dia_local(act.data_planejada))][campo] += sinal
+    return contagem
+
+
+def registrar_aberturas(atividades):
+    """Conta OS novas (criação avulsa ou lote de preventivas)."""
+    acumular(aberturas(atividades))
+
+
+def intervalo(maquina_id, status, inicio, fim):
+    """Intervalo fechado de um status (o log anterior recebeu a duração), fatiado por dia."""
+    campo = CAMPO_TEMPO.get(status)
+    if not campo:
+        return {}
+    return {(maquina_id, data): {campo: duracao} for data, duracao in fatiar_por_dia(inicio, fim)}
+
+
+def finalizacao(atividade, fim_anterior=None):
+    """
+    OS de chamado com máquina parada: parada vai da abertura do chamado até a
+    finalização. Numa refinalização (OS reaberta), troca o intervalo antigo pelo novo.
+    """
+    if not atividade.chamado_id or not atividade.fim_real:
+        return {}
+    abertura = Chamado.objects.filter(id=atividade.chamado_id, maquina_parada=True).values_list('data_abertura', flat=True).first()
+    if not abertura:
+        return {}
+    parada = defaultdict(lambda: {'tempo_parada': timedelta(0)})
+    if fim_anterior:
+        for data, duracao in fatiar_por_dia(abertura, fim_anterior):
+            parada[(atividade.maquina_id, data)]['tempo_parada'] -= duracao
+    for data, duracao in fatiar_por_dia(abertura, atividade.fim_real):
+        parada[(atividade.maquina_id, data)]['tempo_parada'] += duracao
+    return parada
+
+
+def reconstruir(maquinas=None, inicio=None, fim=None):
+    """
+    Recalcula os indicadores a partir de Atividade, AtividadeLog e Chamado: todos,
+    ou só as linhas das `maquinas` entre os dias `inicio` e `fim` (inclusive).
+    No recálculo parcial as linhas do recorte ficam travadas até a troca, para
+    que transições simultâneas (acumular) não se percam entre a leitura e a gravação.
+    """
+    linhas = defaultdict(lambda: {
+        'corretivas': 0, 'preventivas': 0,
+        'tempo_executando': timedelta(0), 'tempo_pausado': timedelta(0), 'tempo_parada': timedelta(0),
+    })
+    atividades = Atividade.objects.all()
+    logs = AtividadeLog.objects.filter(status_novo__in=list(CAMPO_TEMPO), duracao__isnull=False)
+    finalizadas = Atividade.objects.filter(chamado__maquina_parada=True, status='finalizada', fim_real__isnull=False)
+    alvo = IndicadorMaquinaDia.objects.all()
+    if maquinas is not None:
+        desde = datetime.combine(inicio, time.min, tzinfo=TZ_BR)
+        ate = datetime.combine(fim + timedelta(days=1), time.min, tzinfo=TZ_BR)
+        atividades = atividades.filter(maquina_id__in=maquinas, data_planejada__gte=desde, data_planejada__lt=ate)
+        # Intervalos que atravessam o início do recorte também contam (só a fatia de dentro)
+        logs = logs.filter(atividade__maquina_id__in=maquinas, data_registro__lt=ate).alias(
+            termino=ExpressionWrapper(F('data_registro') + F('duracao'), output_field=DateTimeField())
+        ).filter(termino__gt=desde)
+        finalizadas = finalizadas.filter(maquina_id__in=maquinas, chamado__data_abertura__lt=ate, fim_real__gt=desde)
+        alvo = alvo.filter(maquina_id__in=maquinas, data__gte=inicio, data__lte=fim)
+
+    with transaction.atomic():
+        if maquinas is not None:
+            list(alvo.select_for_update().values_list('id', flat=True))
+
+        for maquina_id, planejada, preventiva in atividades.values_list(
+            'maquina_id', 'data_planejada', 'eh_preventiva'
+        ).iterator(chunk_size=2000):
+            linhas[(maquina_id, dia_local(planejada))]['preventivas' if preventiva else 'corretivas'] += 1
+
+        for maquina_id, status, inicio_log, duracao in logs.values_list(
+            'atividade__maquina_id', 'status_novo', 'data_registro', 'duracao'
+        ).iterator(chunk_size=2000):
+            for data, fatia in fatiar_por_dia(inicio_log, inicio_log + duracao):
+                linhas[(maquina_id, data)][CAMPO_TEMPO[status]] += fatia
+
+        for maquina_id, abertura, fim_real in finalizadas.values_list(
+            'maquina_id', 'chamado__data_abertura', 'fim_real'
+        ).iterator(chunk_size=2000):
+            for data, fatia in fatiar_por_dia(abertura, fim_real):
+                linhas[(maquina_id, data)]['tempo_parada'] += fatia
+
+        if maquinas is not None:
+            linhas = {(maquina_id, data): valores for (maquina_id, data), valores in linhas.items() if inicio <= data <= fim}
+        alvo.delete()
+        IndicadorMaquinaDia.objects.bulk_create(
+            [IndicadorMaquinaDia(maquina_id=maquina_id, data=data, **valores) for (maquina_id, data), valores in linhas.items()],
+            batch_size=1000,
+        )
+    return len(linhas)
+
+
+def reconstruir_atividades(atividade_ids, chaves=()):
+    """
+    Recalcula só as linhas alcançadas por essas OS (dia planejado, execução,
+    pausas e parada) e pelas `chaves` (maquina, data) extras, p. ex. a posição
+    anterior de OS alteradas por uma importação. Retorna as linhas gravadas.
+    """
+    maquinas = {maquina_id for maquina_id, _ in chaves}
+    dias = {data for _, data in chaves}
+    atividade_ids = sorted(atividade_ids)
+    for i in range(0, len(atividade_ids), 2000):
+        lote = atividade_ids[i:i + 2000]
+        for maquina_id, *momentos in Atividade.objects.filter(id__in=lote).values_list(
+            'maquina_id', 'data_planejada', 'inicio_real', 'fim_real', 'chamado__data_abertura'
+        ):
+            maquinas.add(maquina_id)
+            dias.update(dia_local(momento) for momento in momentos if momento)
+        # Intervalos fechados terminam no registro seguinte: primeiro e último log bastam
+        extremos = AtividadeLog.objects.filter(atividade_id__in=lote).aggregate(
+            primeiro=Min('data_registro'), ultimo=Max('data_registro')
+        )
+        dias.update(dia_local(momento) for momento in extremos.values() if momento)
+    if not maquinas or not dias:
+        return 0
+    return reconstruir(maquinas, min(dias), max(dias))
+
+
+def totais_por_maquina(inicio=None, fim=None):
+    """Totais do período por máquina, lidos das linhas diárias."""
+    linhas = IndicadorMaquinaDia.objects.all()
+    if inicio:
+        linhas = linhas.filter(data__gte=inicio)
+    if fim:
+        linhas = linhas.filter(data__lte=fim)
+    return linhas.values('maquina_id', 'maquina__codigo', 'maquina__nome').annotate(
+        corretivas=Sum('corretivas'),
+        preventivas=Sum('preventivas'),
+        tempo_executando=Sum('tempo_executando'),
+        tempo_pausado=Sum('tempo_pausado'),
+        tempo_parada=Sum('tempo_parada'),
+    ).order_by('-corretivas', 'maquina__codigo')
@@ -0,0 +1,257 @@
+from datetime import timedelta, datetime, time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F, Count, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .models import Atividade, Chamado
+from .utils import sequenciar_atividades, formatar_duracao, prefetch_logs_recentes
+from .caching import geracao, contar
+from .historico import feed_historico, pagina_concluidas
+from .services import carga_tecnicos_cache
+
+STATUS_QUADRO = ['aberta', 'executando', 'pausada']
+
+# Concluídas por página da coluna (as demais chegam por rolagem, paginadas por cursor)
+PAGINA_CONCLUIDAS = 50
+
+# Fragmentos de card: chave muda quando a atividade ou a lista de técnicos muda
+CARD_TEMPLATE = 'assets/partials/_kanban_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def atividades_ativas():
+    """Ordens em aberto, execução ou pausa: as únicas que passam pelo sequenciamento."""
+    return Atividade.objects.filter(status__in=STATUS_QUADRO).select_related(
+        'maquina', 'procedimento_base'
+    ).prefetch_related('colaboradores')
+
+
+def concluidas_queryset(filtro_data, data_especifica=None):
+    """
+    Finalizadas do filtro como faixa sobre fim_real (índice), sem fatiar.
+    Retorna (queryset, rótulo da coluna).
+    """
+    hoje = timezone.localdate()
+    qs = Atividade.objects.filter(status='finalizada').select_related(
+        'maquina', 'procedimento_base'
+    ).prefetch_related('colaboradores').order_by(F('fim_real').desc(nulls_last=True), '-id')
+
+    def faixa(inicio, fim):
+        return qs.filter(
+            fim_real__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+            fim_real__lt=timezone.make_aware(datetime.combine(fim, time.min)),
+        )
+
+    if filtro_data == 'hoje':
+        return faixa(hoje, hoje + timedelta(days=1)), "Concluídas (Hoje)"
+    if filtro_data == 'mes':
+        inicio_mes = hoje.replace(day=1)
+        return faixa(inicio_mes, (inicio_mes + timedelta(days=32)).replace(day=1)), "Concluídas (Este Mês)"
+    if filtro_data == 'ano':
+        return faixa(hoje.replace(month=1, day=1), hoje.replace(year=hoje.year + 1, month=1, day=1)), "Concluídas (Este Ano)"
+    if filtro_data == 'custom' and data_especifica:
+        try:
+            dt_obj = datetime.strptime(data_especifica, '%Y-%m-%d').date()
+            return faixa(dt_obj, dt_obj + timedelta(days=1)), f"Concluídas ({dt_obj.strftime('%d/%m/%Y')})"
+        except (ValueError, TypeError):
+            pass
+    return qs, "Concluídas (Recentes)"
+
+
+def atividades_concluidas(filtro_data, data_especifica=None, cursor=None):
+    """
+    Uma página das finalizadas do filtro, a partir do cursor (keyset em fim_real, id).
+    Retorna (lista, rótulo da coluna, cursor da próxima página ou None).
+    """
+    qs, label = concluidas_queryset(filtro_data, data_especifica)
+    concluidas, proximo = pagina_concluidas(qs, cursor, PAGINA_CONCLUIDAS)
+    for act in concluidas:
+        act.tempo_gasto_formatado = formatar_duracao(act.tempo_total_gasto)
+    return concluidas, label, proximo
+
+
+def chave_card(act, versao_tecnicos):
+    return f"kanban:card:{act.id}:{act.atualizado_em.timestamp()}:{versao_tecnicos}"
+
+
+def anexar_cards(atividades, tecnicos):
+    """
+    Preenche `card_html` de cada atividade a partir do cache (um get_many para o
+    quadro todo). Só os cards alterados são renderizados, e só eles carregam logs.
+    """
+    versao_tecnicos = geracao('tecnicos')
+    chaves = {act.id: chave_card(act, versao_tecnicos) for act in atividades}
+    em_cache = cache.get_many(list(chaves.values()))
+
+    faltando = [act for act in atividades if chaves[act.id] not in em_cache]
+    contar('kanban_cards', 'hit', len(atividades) - len(faltando))
+    if faltando:
+        contar('kanban_cards', 'miss', len(faltando))
+        prefetch_related_objects(faltando, prefetch_logs_recentes())
+        novos = {
+            chaves[act.id]: render_to_string(CARD_TEMPLATE, {'atividade': act, 'tecnicos': tecnicos})
+            for act in faltando
+        }
+        cache.set_many(novos, CARD_TIMEOUT)
+        em_cache.update(novos)
+
+    for act in atividades:
+        act.card_html = mark_safe(em_cache[chaves[act.id]])
+
+
+# --- ATUALIZAÇÕES PONTUAIS (HTMX out-of-band) ---
+
+def filtros_request(request):
+    """Filtro das concluídas enviado pelo quadro (hx-include)."""
+    return (
+        request.GET.get('filtro_data') or request.POST.get('filtro_data') or 'recente',
+        request.GET.get('data_especifica') or request.POST.get('data_especifica'),
+    )
+
+
+def contadores_quadro(colunas, filtro_data='recente', data_especifica=None):
+    """Totais só das colunas pedidas: ativas numa query agrupada, concluídas e triagem à parte."""
+    totais = {}
+    ativas = [c for c in colunas if c in STATUS_QUADRO]
+    if ativas:
+        por_status = dict(
+            Atividade.objects.filter(status__in=ativas).values_list('status').annotate(n=Count('id')).order_by()
+        )
+        totais.update({c: por_status.get(c, 0) for c in ativas})
+    if 'finalizada' in colunas:
+        qs, _ = concluidas_queryset(filtro_data, data_especifica)
+        totais['finalizada'] = qs.count()
+    if 'triagem' in colunas:
+        totais['triagem'] = Chamado.objects.filter(status='pendente').count()
+    return totais
+
+
+def card_atividade(atividade_id, tecnicos):
+    """Atividade pronta para o quadro, com `card_html` vindo do cache de fragmentos."""
+    act = Atividade.objects.select_related('maquina', 'procedimento_base').prefetch_related('colaboradores').get(pk=atividade_id)
+    act.tempo_gasto_formatado = formatar_duracao(act.tempo_total_gasto)
+    anexar_cards([act], tecnicos)
+    return act
+
+
+def html_oob(inserir=(), contadores=None, remover=()):
+    """
+    Fragmentos hx-swap-oob: `remover` são ids de elementos a excluir (aplicados
+    antes), `inserir` é uma lista de (coluna, posição, html) e `contadores` um
+    dict coluna -> total.
+    """
+    return render_to_string('assets/partials/_kanban_oob.html', {
+        'remover': remover,
+        'inserir': [{'coluna': c, 'posicao': p, 'html': h} for c, p, h in inserir],
+        'contadores': sorted((contadores or {}).items()),
+    })
+
+
+def oob_mudanca_status(request, atividade_id, status_anterior, remover_card=False):
+    """
+    Resposta de uma troca de status no quadro: o card sai da coluna antiga
+    (conteúdo principal vazio) e entra na nova, e só os contadores envolvidos mudam.
+
+    remover_card: o card antigo sai por OOB (eventos de outros usuários, sem alvo
+    principal); se a atividade não existe mais, só ele e o contador mudam.
+    """
+    filtro_data, data_especifica = filtros_request(request)
+    remover = [f'card-{atividade_id}'] if remover_card else []
+    try:
+        act = card_atividade(atividade_id, list(User.objects.all()))
+    except Atividade.DoesNotExist:
+        if not remover_card:
+            raise
+        colunas = {status_anterior} & set(STATUS_QUADRO + ['finalizada'])
+        return html_oob(contadores=contadores_quadro(colunas, filtro_data, data_especifica), remover=remover)
+
+    inserir = []
+    if act.status in STATUS_QUADRO:
+        inserir.append((act.status, 'beforeend', act.card_html))
+    elif act.status == 'finalizada':
+        qs, _ = concluidas_queryset(filtro_data, data_especifica)
+        if qs.filter(pk=act.pk).exists():
+            inserir.append(('finalizada', 'afterbegin', act.card_html))
+
+    colunas = {c for c in (status_anterior, act.status) if c in STATUS_QUADRO or c == 'finalizada'}
+    return html_oob(inserir, contadores_quadro(colunas, filtro_data, data_especifica), remover)
+
+
+def oob_chamado(request, chamado_id):
+    """
+    Chamado alterado por outro usuário: o card sai da triagem e, se ainda
+    pendente, volta no topo (mesma ordem do quadro); o contador é recalculado.
+    """
+    inserir = []
+    chamado = Chamado.objects.select_related('maquina', 'requisitante').filter(pk=chamado_id, status='pendente').first()
+    if chamado:
+        html = render_to_string('assets/partials/_kanban_chamado_card.html', {
+            'chamado': chamado, 'carga_equipe': carga_tecnicos_cache(), 'tecnicos': list(User.objects.all()),
+        }, request=request)
+        inserir.append(('triagem', 'afterbegin', html))
+    return html_oob(inserir, contadores_quadro({'triagem'}), [f'chamado-{chamado_id}'])
+
+
+def get_kanban_context(request):
+    """
+    Helper para centralizar a lógica de busca e filtragem do Kanban/Lista.
+    O custo depende do tamanho do quadro ativo, não do histórico.
+    """
+    view_mode = request.GET.get('mode') or request.POST.get('mode') or 'board'
+    filtro_data, data_especifica = filtros_request(request)
+    
+    # Quadro ativo: sequenciado e separado por status numa única passada
+    colunas = {status: [] for status in STATUS_QUADRO}
+    atividades_sequenciadas = sequenciar_atividades(atividades_ativas())
+    for act in atividades_sequenciadas:
+        colunas[act.status].append(act)
+
+    chamados_pendentes = Chamado.objects.select_related('maquina', 'requisitante').filter(status='pendente').order_by('-data_abertura')
+    chamados_pendentes_count = chamados_pendentes.count()
+    tecnicos = list(User.objects.all())
+    # Disponibilidade no seletor de técnico da triagem (consulta agrupada, em cache)
+    carga_equipe = carga_tecnicos_cache() if chamados_pendentes_count else []
+
+    historico, cursor_historico = [], None
+    concluidas, cursor_concluidas = [], None
+    if view_mode == 'board':
+        concluidas, label_concluidas, cursor_concluidas = atividades_concluidas(filtro_data, data_especifica)
+        total_concluidas = contadores_quadro({'finalizada'}, filtro_data, data_especifica)['finalizada']
+        anexar_cards(atividades_sequenciadas + concluidas, tecnicos)
+    else:
+        # Lista: ativas + histórico unificado (OS finalizadas e chamados processados) por rolagem
+        label_concluidas, total_concluidas = None, None
+        historico, cursor_historico = feed_historico()
+        # A lista mostra o histórico de cada linha sem passar pelo cache de cards
+        prefetch_related_objects(
+            atividades_sequenciadas + [item for item in historico if item.tipo_historico == 'atividade'], prefetch_logs_recentes()
+        )
+
+    return {
+        'view_mode': view_mode,
+        'filtro_data': filtro_data,
+        'data_especifica': data_especifica,
+        'label_concluidas': label_concluidas,
+        'total_concluidas': total_concluidas,
+        'cursor_concluidas': cursor_concluidas,
+        'historico': historico,
+        'cursor_historico': cursor_historico,
+        'chamados_pendentes': chamados_pendentes,
+        'chamados_pendentes_count': chamados_pendentes_count,
+        'carga_equipe': carga_equipe,
+        'abertas': colunas['aberta'],
+        'executando': colunas['executando'],
+        'pausadas': colunas['pausada'],
+        'concluidas': concluidas,
+        'atividades': atividades_sequenciadas,
+        'tecnicos': tecnicos,
+        'is_recente': filtro_data == 'recente',
+        'is_hoje': filtro_data == 'hoje',
+        'is_mes': filtro_data == 'mes',
+        'is_ano': filtro_data == 'ano',
+        'is_custom': filtro_data == 'custom',
+    }
@@ -0,0 +1,45 @@
+import random
+import time as time_mod
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from assets.agendamento import Tarefa, sequenciar
+
+
+class Command(BaseCommand):
+    help = "Mede o motor de sequenciamento com ordens sintéticas em memória (sem banco)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ordens', type=int, default=50000)
+        parser.add_argument('--tecnicos', type=int, default=200)
+        parser.add_argument('--equipe-max', type=int, default=4, help="Máximo de técnicos por ordem")
+        parser.add_argument('--limite', type=float, default=1.0, help="Falha se passar deste tempo (segundos)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        agora = timezone.now()
+        tecnicos = list(range(1, options['tecnicos'] + 1))
+
+        tarefas = [
+            Tarefa(
+                id=i,
+                inicio_base=agora + timedelta(minutes=rnd.randint(-60 * 24 * 30, 60 * 24 * 90)),
+                duracao=timedelta(minutes=rnd.choice([30, 60, 120, 240, 480])),
+                tecnicos=tuple(rnd.sample(tecnicos, rnd.randint(0, options['equipe_max']))),
+                emergencial=rnd.random() < 0.02,
+                executando=rnd.random() < 0.05,
+            )
+            for i in range(options['ordens'])
+        ]
+
+        inicio = time_mod.perf_counter()
+        resultado = sequenciar(tarefas, agora)
+        decorrido = time_mod.perf_counter() - inicio
+
+        self.stdout.write(f"{len(resultado)} ordens, {len(tecnicos)} técnicos: {decorrido * 1000:.1f} ms")
+        if decorrido > options['limite']:
+            raise CommandError(f"Sequenciamento levou {decorrido:.3f}s (limite {options['limite']}s)")
+        self.stdout.write(self.style.SUCCESS("OK"))
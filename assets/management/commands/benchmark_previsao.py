@@ -0,0 +1,45 @@
+import random
+import time as time_mod
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.previsao import agrupar, expandir, horas_por_plano_semana, segunda_feira
+
+
+class Command(BaseCommand):
+    help = "Mede a expansão vetorizada da previsão de preventivas com planos sintéticos em memória (sem banco)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--planos', type=int, default=10000)
+        parser.add_argument('--maquinas', type=int, default=300)
+        parser.add_argument('--dias', type=int, default=365, help="Horizonte da previsão")
+        parser.add_argument('--limite', type=float, default=1.0, help="Falha se passar deste tempo (segundos)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        total = options['planos']
+        inicio = date.today().toordinal()
+        fim = inicio + options['dias']
+
+        inicios = np.array([inicio + rnd.randint(-60, 60) for _ in range(total)], dtype=np.int64)
+        frequencias = np.array([rnd.choice([1, 7, 14, 30, 90, 180]) for _ in range(total)], dtype=np.int64)
+        horas = np.array([rnd.choice([0.5, 1, 2, 4, 8]) for _ in range(total)], dtype=np.float64)
+        maquinas = np.array([rnd.randrange(options['maquinas']) for _ in range(total)], dtype=np.int64)
+        semanas = (fim - segunda_feira(inicio)) // 7 + 1
+
+        comeco = time_mod.perf_counter()
+        planos, dias = expandir(inicios, frequencias, inicio, fim)
+        matriz = horas_por_plano_semana(planos, dias, horas, inicio, semanas)
+        por_maquina = agrupar(matriz, maquinas, options['maquinas'])
+        decorrido = time_mod.perf_counter() - comeco
+
+        self.stdout.write(
+            f"{total} planos, {planos.size} ocorrências em {semanas} semanas "
+            f"({por_maquina.sum():.0f} h): {decorrido * 1000:.1f} ms"
+        )
+        if decorrido > options['limite']:
+            raise CommandError(f"Previsão levou {decorrido:.3f}s (limite {options['limite']}s)")
+        self.stdout.write(self.style.SUCCESS("OK"))
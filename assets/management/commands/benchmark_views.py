@@ -0,0 +1,153 @@
+import statistics
+import time as time_mod
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_started
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+
+from assets.models import Atividade, Chamado
+from assets.sintetico import cadastros, gerar_planta
+
+# Orçamento por view: máximo de consultas em qualquer repetição (não pode crescer
+# com o volume) e teto da mediana de latência em ms por tamanho de base
+# (SQLite/PostgreSQL local; a 1ª repetição é de cache frio). As contagens exatas
+# ficam em assets/tests.py (OrcamentoConsultasTests); aqui é a latência em volume.
+ORCAMENTOS = {
+    'kanban_view': {'consultas': 12, 'ms': {1000: 400, 10000: 800, 100000: 2500}},
+    'dados_gantt': {'consultas': 6, 'ms': {1000: 300, 10000: 600, 100000: 2000}},
+    'dashboard_analitico': {'consultas': 20, 'ms': {1000: 400, 10000: 800, 100000: 3000}},
+    'alterar_status': {'consultas': 25, 'ms': {1000: 150, 10000: 200, 100000: 400}},
+    'aprovar_chamado': {'consultas': 25, 'ms': {1000: 150, 10000: 250, 100000: 800}},
+}
+
+
+def teto(limites, tamanho):
+    """Teto do maior tamanho tabelado que não passa de `tamanho` (ou o menor)."""
+    chaves = sorted(limites)
+    aplicavel = [k for k in chaves if k <= tamanho] or chaves[:1]
+    return limites[aplicavel[-1]]
+
+
+class Command(BaseCommand):
+    help = (
+        "Orçamento de consultas e latência das views principais (kanban, Gantt, dashboard, "
+        "mudança de status, aprovação de chamado) sobre plantas sintéticas de tamanho crescente. "
+        "Roda num banco de teste descartável; falha se uma view passar do orçamento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos', default='1000,10000',
+            help="Quantidades de OS, separadas por vírgula (100000 é opcional: alguns minutos só para gerar)",
+        )
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--maquinas', type=int, default=100)
+        parser.add_argument('--tecnicos', type=int, default=30)
+        parser.add_argument('--anos', type=int, default=2)
+        parser.add_argument('--sem-limites', action='store_true', help="Só relata, sem falhar")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            tamanhos = sorted(int(t) for t in options['tamanhos'].split(','))
+        except ValueError:
+            raise CommandError("--tamanhos deve ser uma lista de inteiros (ex.: 1000,10000).")
+
+        # Sem agendador de preventivas nem log de acesso interferindo nas medições
+        request_started.disconnect(dispatch_uid='preventivas_agendador')
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        bancos = runner.setup_databases()
+        try:
+            with override_settings(ACCESS_LOGGING={'DEFAULT_SAMPLE_RATE': 0.0, 'ALWAYS_LOG_ERRORS': False}):
+                falhas = self.executar(tamanhos, options)
+        finally:
+            runner.teardown_databases(bancos)
+            teardown_test_environment()
+
+        if falhas and not options['sem_limites']:
+            raise CommandError("Orçamento estourado:\n  " + "\n  ".join(falhas))
+        self.stdout.write(self.style.SUCCESS("OK"))
+
+    def executar(self, tamanhos, options):
+        usuario = User.objects.create_superuser('benchmark', password='benchmark')
+        cliente = Client()
+        cliente.force_login(usuario)
+        _, tecnicos, _ = cadastros(options['maquinas'], options['tecnicos'], options['seed'])
+
+        falhas = []
+        consultas_anteriores = {}
+        atual = 0
+        for tamanho in tamanhos:
+            inicio = time_mod.perf_counter()
+            gerar_planta(
+                maquinas=options['maquinas'], tecnicos=options['tecnicos'], atividades=tamanho - atual,
+                anos=options['anos'], pendentes=0, seed=options['seed'] + tamanho,
+            )
+            atual = tamanho
+            self.stdout.write(f"\n{tamanho} OS (gerada em {time_mod.perf_counter() - inicio:.1f}s)")
+
+            for nome, requisicoes in self.cenarios(options['repeticoes'], tecnicos):
+                consultas, tempos = [], []
+                # 1ª repetição com cache frio (caminho completo), as demais como em produção
+                cache.clear()
+                for metodo, url, dados, cabecalhos in requisicoes:
+                    with CaptureQueriesContext(connection) as capturadas:
+                        comeco = time_mod.perf_counter()
+                        resposta = getattr(cliente, metodo)(url, dados, headers=cabecalhos)
+                        if getattr(resposta, 'streaming', False):
+                            b''.join(resposta.streaming_content)
+                        tempos.append((time_mod.perf_counter() - comeco) * 1000)
+                    if resposta.status_code >= 400:
+                        raise CommandError(f"{nome}: {url} respondeu {resposta.status_code}")
+                    consultas.append(len(capturadas))
+
+                maximo = max(consultas)
+                mediana = statistics.median(tempos)
+                orcamento = ORCAMENTOS[nome]
+                limite_ms = teto(orcamento['ms'], tamanho)
+                problemas = []
+                if maximo > orcamento['consultas']:
+                    problemas.append(f"{maximo} consultas > {orcamento['consultas']}")
+                if maximo > consultas_anteriores.get(nome, maximo):
+                    problemas.append(f"consultas cresceram com o volume ({consultas_anteriores[nome]} -> {maximo})")
+                if mediana > limite_ms:
+                    problemas.append(f"{mediana:.0f} ms > {limite_ms} ms")
+                consultas_anteriores[nome] = maximo
+
+                linha = f"  {nome:<22} {maximo:>3} consultas  {mediana:>8.1f} ms (mediana)  {tempos[0]:>8.1f} ms (cache frio)"
+                if problemas:
+                    falhas.append(f"{nome} @ {tamanho}: " + '; '.join(problemas))
+                    self.stdout.write(self.style.ERROR(linha + '  <- ' + '; '.join(problemas)))
+                else:
+                    self.stdout.write(linha)
+        return falhas
+
+    def cenarios(self, repeticoes, tecnicos):
+        """(nome, [(método, url, dados, cabeçalhos), ...]) com alvos novos a cada repetição."""
+        hx = {'HX-Request': 'true'}
+        yield 'kanban_view', [('get', '/kanban/', {}, {})] * repeticoes
+        yield 'dados_gantt', [('get', '/api/gantt/dados/', {}, {})] * repeticoes
+        yield 'dashboard_analitico', [('get', '/dashboard/', {}, {})] * repeticoes
+
+        # Mudança de status pelo card do quadro (resposta OOB), como na interface
+        abertas = Atividade.objects.filter(status='aberta').order_by('-data_planejada').values_list('id', flat=True)[:repeticoes]
+        yield 'alterar_status', [
+            ('post', f'/status/{atividade_id}/executando/', {}, {**hx, 'HX-Target': f'card-{atividade_id}'})
+            for atividade_id in abertas
+        ]
+
+        maquina_id = Atividade.objects.values_list('maquina_id', flat=True).first()
+        pendentes = Chamado.objects.bulk_create([
+            Chamado(maquina_id=maquina_id, requisitante=tecnicos[0], descricao_problema='Benchmark')
+            for _ in range(repeticoes)
+        ])
+        yield 'aprovar_chamado', [
+            ('post', f'/chamado/aprovar/{chamado.id}/', {'tecnico': [tecnicos[0].id]}, {**hx, 'HX-Target': f'chamado-{chamado.id}'})
+            for chamado in pendentes
+        ]
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from assets.models import AcessoLog, AcessoResumoHora
+
+
+def inicio_da_hora(momento):
+    return momento.replace(minute=0, second=0, microsecond=0)
+
+
+def apagar_em_lotes(queryset, lote):
+    """DELETE por faixas de ids, sem carregar a tabela inteira nem segurar um lock gigante."""
+    total = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:lote])
+        if not ids:
+            return total
+        # AcessoLog não tem relacionamentos dependentes: vira um único DELETE ... WHERE id IN
+        total += AcessoLog.objects.filter(id__in=ids).delete()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida os logs de acesso mais antigos que --dias em resumos por hora "
+        "(path, usuário, status) e apaga as linhas brutas consolidadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help="Mantém as linhas brutas dos últimos N dias")
+        parser.add_argument('--janela-horas', type=int, default=24, help="Horas consolidadas por transação")
+        parser.add_argument('--lote', type=int, default=5000, help="Linhas apagadas por DELETE")
+        parser.add_argument(
+            '--sem-apagar', action='store_true',
+            help="Só consolida (ex.: tabela particionada, em que o descarte é feito por partição)",
+        )
+
+    def handle(self, *args, **options):
+        corte = inicio_da_hora(timezone.now() - timedelta(days=options['dias']))
+        janela = timedelta(hours=options['janela_horas'])
+        lote = options['lote']
+        apagar = not options['sem_apagar']
+
+        antigos = AcessoLog.objects.filter(data_acesso__lt=corte)
+        if apagar:
+            inicio = antigos.aggregate(inicio=Min('data_acesso'))['inicio']
+        else:
+            # Sem apagar, as linhas continuam lá: recomeça depois da última hora já consolidada
+            ultima = AcessoResumoHora.objects.aggregate(ultima=Max('hora'))['ultima']
+            inicio = ultima + timedelta(hours=1) if ultima else antigos.aggregate(inicio=Min('data_acesso'))['inicio']
+
+        if inicio is None or inicio >= corte:
+            self.stdout.write("Nada a consolidar.")
+            return
+
+        inicio = inicio_da_hora(inicio)
+        consolidadas = apagadas = resumos = 0
+        while inicio < corte:
+            fim = min(inicio + janela, corte)
+            with transaction.atomic():
+                n, r = self.consolidar(inicio, fim)
+                consolidadas += n
+                resumos += r
+                if apagar:
+                    apagadas += apagar_em_lotes(
+                        AcessoLog.objects.filter(data_acesso__gte=inicio, data_acesso__lt=fim), lote
+                    )
+            inicio = fim
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{consolidadas} acessos consolidados em {resumos} resumos; {apagadas} linhas brutas apagadas."
+        ))
+
+    def consolidar(self, inicio, fim):
+        """Agrega a janela [inicio, fim) no banco e soma nos resumos existentes."""
+        grupos = (
+            AcessoLog.objects.filter(data_acesso__gte=inicio, data_acesso__lt=fim)
+            .annotate(hora=TruncHour('data_acesso'))
+            .values('hora', 'path', 'usuario_id', 'status_code')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        existentes = {
+            (r.hora, r.path, r.usuario_id, r.status_code): r
+            for r in AcessoResumoHora.objects.select_for_update().filter(hora__gte=inicio, hora__lt=fim)
+        }
+
+        novos, alterados, total = [], [], 0
+        for g in grupos:
+            total += g['total']
+            resumo = existentes.get((g['hora'], g['path'], g['usuario_id'], g['status_code']))
+            if resumo:
+                # Linhas que chegaram atrasadas numa hora já consolidada
+                resumo.total += g['total']
+                alterados.append(resumo)
+            else:
+                novos.append(AcessoResumoHora(
+                    hora=g['hora'], path=g['path'], usuario_id=g['usuario_id'],
+                    status_code=g['status_code'], total=g['total'],
+                ))
+
+        AcessoResumoHora.objects.bulk_create(novos, batch_size=1000)
+        AcessoResumoHora.objects.bulk_update(alterados, ['total'], batch_size=1000)
+        return total, len(novos)
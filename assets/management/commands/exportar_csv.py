@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.exportacao import CHUNK_SIZE, EXPORTACOES, filtros_exportacao, linhas_csv
+
+
+class Command(BaseCommand):
+    help = "Exporta atividades, logs ou chamados em CSV (streaming, memória constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(EXPORTACOES))
+        parser.add_argument('--inicio', help="AAAA-MM-DD")
+        parser.add_argument('--fim', help="AAAA-MM-DD")
+        parser.add_argument('--maquina', help="Id ou código da máquina")
+        parser.add_argument('--saida', help="Arquivo de destino (padrão: saída padrão)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        filtros = filtros_exportacao(options)
+        for campo in ('inicio', 'fim'):
+            if options[campo] and not filtros[campo]:
+                raise CommandError(f"--{campo} deve estar no formato AAAA-MM-DD.")
+
+        destino = open(options['saida'], 'w', encoding='utf-8', newline='') if options['saida'] else sys.stdout
+        total = -1  # cabeçalho
+        try:
+            for linha in linhas_csv(options['tipo'], filtros, options['chunk_size']):
+                destino.write(linha)
+                total += 1
+        finally:
+            if options['saida']:
+                destino.close()
+        if options['saida']:
+            self.stdout.write(self.style.SUCCESS(f"{total} linhas exportadas para {options['saida']}."))
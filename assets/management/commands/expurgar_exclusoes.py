@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from assets.gantt import RETENCAO_EXCLUSOES, expurgar_exclusoes
+
+
+class Command(BaseCommand):
+    help = (
+        f"Apaga as lápides de exclusão (RegistroExclusao) com mais de {RETENCAO_EXCLUSOES.days} dias e grava o corte: "
+        "clientes do Gantt com cursor anterior a ele recebem o cronograma completo. Rodar periodicamente (cron)."
+    )
+
+    def handle(self, *args, **options):
+        apagadas = expurgar_exclusoes()
+        self.stdout.write(self.style.SUCCESS(f"{apagadas} lápides de exclusão expurgadas."))
@@ -0,0 +1,46 @@
+import time as time_mod
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.sintetico import LOTE_PADRAO, SENHA_PADRAO, gerar_planta
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera uma planta sintética (máquinas SIM-*, técnicos tec*, planos, OS, logs e chamados) "
+        "com bulk_create. Para benchmarks e testes de carga; não usar no banco de produção."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--maquinas', type=int, default=50)
+        parser.add_argument('--tecnicos', type=int, default=20)
+        parser.add_argument('--atividades', type=int, default=10000)
+        parser.add_argument('--anos', type=int, default=2, help="Anos de histórico (até 30 dias à frente)")
+        parser.add_argument('--taxa-chamados', type=float, default=0.3, help="Fração das corretivas vindas de chamados")
+        parser.add_argument('--pendentes', type=int, default=10, help="Chamados pendentes na triagem")
+        parser.add_argument('--lote', type=int, default=LOTE_PADRAO)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['maquinas'] < 1 or options['tecnicos'] < 1:
+            raise CommandError("São necessárias ao menos uma máquina e um técnico.")
+
+        def progresso(totais):
+            self.stdout.write(f"  {totais['atividades']} OS, {totais['logs']} logs, {totais['chamados']} chamados")
+
+        inicio = time_mod.perf_counter()
+        try:
+            totais = gerar_planta(
+                maquinas=options['maquinas'], tecnicos=options['tecnicos'], atividades=options['atividades'],
+                anos=options['anos'], taxa_chamados=options['taxa_chamados'], pendentes=options['pendentes'],
+                seed=options['seed'], lote=options['lote'], progresso=progresso,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        decorrido = time_mod.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['atividades']} OS, {totais['logs']} logs, {totais['chamados']} chamados e "
+            f"{totais['indicadores']} indicadores diários em {decorrido:.1f}s "
+            f"(senha dos técnicos: '{SENHA_PADRAO}')"
+        ))
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.preventivas import gerar_preventivas
+
+
+class Command(BaseCommand):
+    help = "Gera as ordens preventivas vencidas (todos os ciclos perdidos). Seguro para rodar em paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help="Considera esta data como hoje (AAAA-MM-DD)")
+
+    def handle(self, *args, **options):
+        hoje = None
+        if options['data']:
+            try:
+                hoje = date.fromisoformat(options['data'])
+            except ValueError:
+                raise CommandError("--data deve estar no formato AAAA-MM-DD.")
+        criadas = gerar_preventivas(hoje)
+        self.stdout.write(self.style.SUCCESS(f"{criadas} preventivas geradas."))
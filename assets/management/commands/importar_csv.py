@@ -0,0 +1,38 @@
+import time as time_mod
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.importacao import IMPORTADORES, LOTE_PADRAO, ler_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa máquinas, procedimentos, planos, atividades (histórico) ou logs de um CSV. "
+        "Ordem recomendada: maquinas, procedimentos, planos, atividades, logs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTADORES))
+        parser.add_argument('arquivo')
+        parser.add_argument('--lote', type=int, default=LOTE_PADRAO, help="Linhas validadas e gravadas por transação")
+        parser.add_argument('--max-erros', type=int, default=50, help="Erros de linha exibidos")
+
+    def handle(self, *args, **options):
+        importador = IMPORTADORES[options['tipo']](lote=options['lote'])
+        inicio = time_mod.perf_counter()
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                resumo = importador.importar(ler_csv(arquivo))
+        except OSError as erro:
+            raise CommandError(f"Não foi possível ler o arquivo: {erro}")
+        decorrido = time_mod.perf_counter() - inicio
+
+        for erro in resumo['erros'][:options['max_erros']]:
+            self.stderr.write(f"Linha {erro['linha']}: {erro['erro']}")
+        if len(resumo['erros']) > options['max_erros']:
+            self.stderr.write(f"... e mais {len(resumo['erros']) - options['max_erros']} erros.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo['criados']} criados, {resumo['atualizados']} atualizados, "
+            f"{len(resumo['erros'])} linhas com erro ({decorrido:.1f}s)."
+        ))
@@ -0,0 +1,129 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from assets.models import AcessoLog
+
+TABELA = AcessoLog._meta.db_table
+SEQUENCIA = f"{TABELA}_part_id_seq"
+
+
+def primeiro_dia(d):
+    return d.replace(day=1)
+
+
+def proximo_mes(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def nome_particao(mes):
+    return f"{TABELA}_{mes.year}{mes.month:02d}"
+
+
+class Command(BaseCommand):
+    help = (
+        "PostgreSQL: particiona o log de acessos por mês (RANGE em data_acesso), "
+        "cria partições futuras e descarta meses inteiros com DROP TABLE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--converter', action='store_true', help="Converte a tabela atual em particionada (uma vez)")
+        parser.add_argument('--meses-futuros', type=int, default=3, help="Partições criadas à frente do mês atual")
+        parser.add_argument(
+            '--descartar-antes', metavar='AAAA-MM',
+            help="Remove as partições de meses anteriores a este (rode consolidar_acessos --sem-apagar antes)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Particionamento disponível apenas no PostgreSQL.")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            particionada = self.particionada(cursor)
+            if options['converter']:
+                if particionada:
+                    raise CommandError(f"{TABELA} já é particionada.")
+                self.converter(cursor)
+            elif not particionada:
+                raise CommandError(f"{TABELA} não é particionada: use --converter primeiro.")
+
+            hoje = date.today()
+            mes = primeiro_dia(hoje)
+            for _ in range(options['meses_futuros'] + 1):
+                self.criar_particao(cursor, mes)
+                mes = proximo_mes(mes)
+
+            if options['descartar_antes']:
+                try:
+                    ano, mes = map(int, options['descartar_antes'].split('-'))
+                    limite = date(ano, mes, 1)
+                except ValueError:
+                    raise CommandError("--descartar-antes deve estar no formato AAAA-MM.")
+                self.descartar(cursor, limite)
+
+    def particionada(self, cursor):
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABELA])
+        return cursor.fetchone() is not None
+
+    def criar_particao(self, cursor, mes):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{nome_particao(mes)}" PARTITION OF "{TABELA}" '
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{proximo_mes(mes).isoformat()}')"
+        )
+
+    def converter(self, cursor):
+        antiga = f"{TABELA}_antiga"
+        self.stdout.write(f"Convertendo {TABELA} em tabela particionada...")
+        cursor.execute(f'ALTER TABLE "{TABELA}" RENAME TO "{antiga}"')
+        # Mesmas colunas e defaults; a PK passa a incluir a chave de partição
+        cursor.execute(
+            f'CREATE TABLE "{TABELA}" (LIKE "{antiga}" INCLUDING DEFAULTS) '
+            f"PARTITION BY RANGE (data_acesso)"
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABELA}" ADD FOREIGN KEY (usuario_id) REFERENCES "auth_user" (id) '
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+
+        # Sequência própria (colunas identity em tabela particionada variam entre versões)
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{SEQUENCIA}" OWNED BY "{TABELA}".id')
+        cursor.execute(f'SELECT setval(\'"{SEQUENCIA}"\', COALESCE((SELECT MAX(id) FROM "{antiga}"), 0) + 1, false)')
+        cursor.execute(f'ALTER TABLE "{TABELA}" ALTER COLUMN id SET DEFAULT nextval(\'"{SEQUENCIA}"\')')
+
+        # Partições para todo o histórico existente + uma default de segurança
+        cursor.execute(f'SELECT MIN(data_acesso)::date FROM "{antiga}"')
+        inicio = cursor.fetchone()[0] or date.today()
+        mes = primeiro_dia(inicio)
+        while mes <= date.today():
+            self.criar_particao(cursor, mes)
+            mes = proximo_mes(mes)
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS "{TABELA}_default" PARTITION OF "{TABELA}" DEFAULT')
+
+        cursor.execute(f'INSERT INTO "{TABELA}" SELECT * FROM "{antiga}"')
+        cursor.execute(f'DROP TABLE "{antiga}"')
+        # PK e índices só depois do DROP: os nomes antigos (pkey, Meta.indexes) ficam livres
+        # e as migrações seguintes continuam encontrando os mesmos nomes
+        cursor.execute(f'ALTER TABLE "{TABELA}" ADD PRIMARY KEY (id, data_acesso)')
+        cursor.execute(f'CREATE INDEX "acessolog_data_idx" ON "{TABELA}" (data_acesso)')
+        cursor.execute(f'CREATE INDEX "{TABELA}_usuario_part_idx" ON "{TABELA}" (usuario_id)')
+        self.stdout.write(self.style.SUCCESS("Conversão concluída."))
+
+    def descartar(self, cursor, limite):
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [TABELA],
+        )
+        prefixo = f"{TABELA}_"
+        for (nome,) in cursor.fetchall():
+            sufixo = nome[len(prefixo):]
+            if not (nome.startswith(prefixo) and len(sufixo) == 6 and sufixo.isdigit()):
+                continue
+            mes = date(int(sufixo[:4]), int(sufixo[4:]), 1)
+            if mes < limite:
+                cursor.execute(f'DROP TABLE "{nome}"')
+                self.stdout.write(f"Partição {nome} removida.")
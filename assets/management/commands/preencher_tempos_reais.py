@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from assets.caching import invalidar
+from assets.utils import preencher_tempos_reais
+
+
+class Command(BaseCommand):
+    help = "Preenche inicio_real/fim_real das atividades a partir do histórico (AtividadeLog)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Atividades gravadas por UPDATE em lote")
+        parser.add_argument('--todas', action='store_true', help="Recalcula também as que já têm valores")
+
+    def handle(self, *args, **options):
+        total = preencher_tempos_reais(todas=options['todas'], batch_size=options['batch_size'])
+        invalidar('gantt')
+        self.stdout.write(self.style.SUCCESS(f"{total} atividades atualizadas."))
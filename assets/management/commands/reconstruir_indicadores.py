@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assets.indicadores import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Recalcula os indicadores diários por máquina (IndicadorMaquinaDia) a partir de todo o histórico."
+
+    def handle(self, *args, **options):
+        linhas = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{linhas} linhas de indicadores geradas."))
@@ -0,0 +1,153 @@
+import os
+import random
+import tempfile
+import threading
+import time as time_mod
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from assets.models import Atividade, AtividadeLog, IndicadorMaquinaDia, Maquina
+from assets.transicoes import TransicaoInvalida, alterar_status, pode_transicionar
+
+DESTINOS = ['executando', 'pausada', 'finalizada']
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de concorrência da máquina de estados: várias threads disparam transições "
+        "aleatórias na mesma OS ao mesmo tempo. Roda num banco de teste descartável e falha "
+        "se a sequência de logs, os tempos acumulados ou os indicadores ficarem inconsistentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--transicoes', type=int, default=50, help="Tentativas por thread")
+        parser.add_argument('--atividades', type=int, default=1, help="OS disputadas pelas threads")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['threads'] < 2 or options['atividades'] < 1:
+            raise CommandError("São necessárias ao menos duas threads e uma atividade.")
+
+        setup_test_environment()
+        arquivo = None
+        if connection.vendor == 'sqlite':
+            # O banco de teste em memória não aceita escrita de várias threads: usa um arquivo
+            descritor, arquivo = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(descritor)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = arquivo
+            # Um escritor por vez e a espera do SQLite não é justa: com muitas threads, 5s não bastam
+            connection.settings_dict.setdefault('OPTIONS', {})['timeout'] = 60
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        bancos = runner.setup_databases()
+        try:
+            falhas = self.executar(options)
+        finally:
+            runner.teardown_databases(bancos)
+            teardown_test_environment()
+            if arquivo and os.path.exists(arquivo):
+                os.remove(arquivo)
+
+        if falhas:
+            raise CommandError("Inconsistências:\n  " + "\n  ".join(falhas))
+        self.stdout.write(self.style.SUCCESS("OK"))
+
+    def executar(self, options):
+        maquina = Maquina.objects.create(codigo='STRESS-01', nome='Stress')
+        atividades = [
+            Atividade.objects.create(maquina=maquina, descricao=f'Stress {i}', duracao_estimada=timedelta(hours=1))
+            for i in range(options['atividades'])
+        ]
+        usuarios = [User.objects.create_user(f'stress{i:02d}') for i in range(options['threads'])]
+
+        resultados = Counter()
+        lock = threading.Lock()
+        largada = threading.Barrier(options['threads'])
+
+        def trabalhar(indice):
+            rnd = random.Random(options['seed'] + indice)
+            contagem = Counter()
+            try:
+                largada.wait()
+                for _ in range(options['transicoes']):
+                    atividade = rnd.choice(atividades)
+                    try:
+                        alterar_status(atividade.id, rnd.choice(DESTINOS), usuarios[indice], 'stress')
+                        contagem['aplicadas'] += 1
+                    except TransicaoInvalida:
+                        contagem['recusadas'] += 1
+                    except DatabaseError:
+                        contagem['erros_banco'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    resultados.update(contagem)
+
+        inicio = time_mod.perf_counter()
+        threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time_mod.perf_counter() - inicio
+
+        total = options['threads'] * options['transicoes']
+        self.stdout.write(
+            f"{total} tentativas em {duracao:.1f}s ({connection.vendor}): {resultados['aplicadas']} aplicadas, "
+            f"{resultados['recusadas']} recusadas pela máquina de estados, {resultados['erros_banco']} erros do banco"
+        )
+
+        falhas = []
+        if resultados['erros_banco']:
+            falhas.append(f"{resultados['erros_banco']} transações falharam no banco (lock/serialização)")
+        logs_total = AtividadeLog.objects.filter(atividade__in=atividades).count()
+        if logs_total != resultados['aplicadas']:
+            falhas.append(f"{logs_total} logs para {resultados['aplicadas']} transições aplicadas")
+        gasto_total, pausa_total = timedelta(0), timedelta(0)
+        for atividade in atividades:
+            atividade.refresh_from_db()
+            falhas.extend(self.verificar(atividade))
+            gasto_total += atividade.tempo_total_gasto
+            pausa_total += atividade.tempo_total_pausa
+
+        indicadores = IndicadorMaquinaDia.objects.filter(maquina=maquina).aggregate(
+            executando=Sum('tempo_executando'), pausado=Sum('tempo_pausado'),
+        )
+        if (indicadores['executando'] or timedelta(0)) != gasto_total:
+            falhas.append(f"indicadores: executando {indicadores['executando']} != soma das OS {gasto_total}")
+        if (indicadores['pausado'] or timedelta(0)) != pausa_total:
+            falhas.append(f"indicadores: pausado {indicadores['pausado']} != soma das OS {pausa_total}")
+        return falhas
+
+    def verificar(self, atividade):
+        """Logs formam uma cadeia válida e os totais batem com as durações fechadas."""
+        falhas = []
+        logs = list(atividade.logs.order_by('data_registro', 'id'))
+        status = 'aberta'
+        for log in logs:
+            if not pode_transicionar(status, log.status_novo):
+                falhas.append(f"OS {atividade.id}: log {log.id} {status} -> {log.status_novo}")
+            status = log.status_novo
+        if status != atividade.status:
+            falhas.append(f"OS {atividade.id}: status {atividade.status}, último log {status}")
+
+        for log, proximo in zip(logs, logs[1:]):
+            if log.duracao != proximo.data_registro - log.data_registro:
+                falhas.append(f"OS {atividade.id}: log {log.id} com duração {log.duracao}")
+        if logs and logs[-1].duracao is not None:
+            falhas.append(f"OS {atividade.id}: último log já fechado")
+
+        gasto = sum((log.duracao for log in logs if log.status_novo == 'executando' and log.duracao), timedelta(0))
+        pausa = sum((log.duracao for log in logs if log.status_novo == 'pausada' and log.duracao), timedelta(0))
+        if atividade.tempo_total_gasto != gasto:
+            falhas.append(f"OS {atividade.id}: tempo_total_gasto {atividade.tempo_total_gasto} != logs {gasto}")
+        if atividade.tempo_total_pausa != pausa:
+            falhas.append(f"OS {atividade.id}: tempo_total_pausa {atividade.tempo_total_pausa} != logs {pausa}")
+        return falhas
@@ -0,0 +1,195 @@
+"""
+Métricas por view (latência, consultas SQL, tempo de SQL e de templates).
+
+Alimentadas pelo InstrumentationMiddleware nas requisições amostradas e
+exportadas em texto Prometheus em /metrics. Os histogramas são do processo:
+com vários workers, cada um expõe os seus (o Prometheus soma por instância).
+"""
+import logging
+import threading
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Defaults; qualquer chave pode ser sobrescrita em settings.INSTRUMENTATION
+DEFAULTS = {
+    'SAMPLE_RATE': 1.0,          # fração das requisições medidas; 0 desliga (middleware vira passagem direta)
+    'SLOW_QUERY_MS': 300,        # consultas acima disso vão para o log (assets.metricas, WARNING)
+    'SERVER_TIMING': 'staff',    # True (todos), 'staff' ou False
+    'EXCLUDE_PATHS': ['/static/', '/favicon.ico'],
+    'METRICS_TOKEN': '',         # Bearer aceito em /metrics além de usuários staff
+}
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# nome -> (tipo, ajuda, buckets)
+METRICAS = {
+    'pcm_request_duration_seconds': ('histogram', "Latência da requisição por view", BUCKETS_SEGUNDOS),
+    'pcm_request_sql_queries': ('histogram', "Consultas SQL por requisição", BUCKETS_CONSULTAS),
+    'pcm_request_sql_seconds': ('histogram', "Tempo em SQL por requisição", BUCKETS_SEGUNDOS),
+    'pcm_request_template_seconds': ('histogram', "Renderização de templates por requisição (inclui o SQL disparado nela)", BUCKETS_SEGUNDOS),
+    'pcm_slow_queries_total': ('counter', "Consultas acima de SLOW_QUERY_MS", None),
+}
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'INSTRUMENTATION', {}))
+    return config
+
+
+class Medicao:
+    """Contadores de uma requisição; também é o execute_wrapper das conexões."""
+
+    def __init__(self, caminho, limite_lenta):
+        self.caminho = caminho
+        self.limite_lenta = limite_lenta
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.tempo_templates = 0.0
+        self.lentas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = perf_counter() - inicio
+            self.consultas += 1
+            self.tempo_sql += duracao
+            if duracao >= self.limite_lenta:
+                self.lentas += 1
+                logger.warning("Consulta lenta (%.0f ms) em %s: %s", duracao * 1000, self.caminho, sql[:2000])
+
+    @contextmanager
+    def ativa(self):
+        """Liga a medição em todas as conexões e nos templates enquanto dura o bloco."""
+        token = _medicao_atual.set(self)
+        try:
+            with ExitStack() as pilha:
+                for alias in connections:
+                    pilha.enter_context(connections[alias].execute_wrapper(self))
+                yield self
+        finally:
+            _medicao_atual.reset(token)
+
+    def server_timing(self, total):
+        return (
+            f'app;dur={total * 1000:.1f}, '
+            f'db;dur={self.tempo_sql * 1000:.1f};desc="{self.consultas} consultas", '
+            f'tpl;dur={self.tempo_templates * 1000:.1f}'
+        )
+
+
+def instrumentar_templates():
+    """
+    Envolve o render() dos templates do backend Django (uma vez por processo).
+    Só o template de topo passa por aqui: includes não contam duas vezes.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumentado', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        medicao = _medicao_atual.get()
+        if medicao is None:
+            return original(self, context, request)
+        inicio = perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            medicao.tempo_templates += perf_counter() - inicio
+
+    render.instrumentado = True
+    Template.render = render
+
+
+class Registro:
+    """Histogramas e contadores do processo, por conjunto de rótulos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (nome, rótulos) -> [contagens por bucket..., soma, total] ou valor do contador
+        self._series = {}
+
+    def observar(self, nome, rotulos, valor):
+        buckets = METRICAS[nome][2]
+        chave = (nome, rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * len(buckets) + [0.0, 0]
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def incrementar(self, nome, rotulos, valor=1):
+        chave = (nome, rotulos)
+        with self._lock:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (version=0.0.4)."""
+        with self._lock:
+            series = {chave: list(v) if isinstance(v, list) else v for chave, v in self._series.items()}
+
+        linhas = []
+        for nome, (tipo, ajuda, buckets) in METRICAS.items():
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for (serie_nome, rotulos), valor in sorted(series.items()):
+                if serie_nome != nome:
+                    continue
+                if tipo == 'counter':
+                    linhas.append(f"{nome}{_rotulos(rotulos)} {valor}")
+                    continue
+                for limite, contagem in zip(buckets, valor):
+                    linhas.append(f"{nome}_bucket{_rotulos(rotulos + (('le', _numero(limite)),))} {contagem}")
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos + (('le', '+Inf'),))} {valor[-1]}")
+                linhas.append(f"{nome}_sum{_rotulos(rotulos)} {valor[-2]:.6f}")
+                linhas.append(f"{nome}_count{_rotulos(rotulos)} {valor[-1]}")
+        return '\n'.join(linhas) + '\n'
+
+
+def _numero(valor):
+    return str(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    escapado = (
+        (nome, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for nome, valor in rotulos
+    )
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in escapado) + '}'
+
+
+registro = Registro()
+
+
+def registrar(view, metodo, status, total, medicao):
+    """Soma uma requisição medida aos histogramas."""
+    por_view = (('view', view),)
+    registro.observar('pcm_request_duration_seconds', (('view', view), ('method', metodo), ('status', f"{status // 100}xx")), total)
+    registro.observar('pcm_request_sql_queries', por_view, medicao.consultas)
+    registro.observar('pcm_request_sql_seconds', por_view, medicao.tempo_sql)
+    registro.observar('pcm_request_template_seconds', por_view, medicao.tempo_templates)
+    if medicao.lentas:
+        registro.incrementar('pcm_slow_queries_total', por_view, medicao.lentas)
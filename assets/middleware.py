@@ -1,15 +1,142 @@
+import atexit
+import logging
+import random
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metricas
 from .models import AcessoLog
 
+logger = logging.getLogger(__name__)
+
+# Defaults; override any key through settings.ACCESS_LOGGING
+DEFAULTS = {
+    'BUFFER_SIZE': 200,          # flush as soon as this many records are waiting
+    'FLUSH_INTERVAL': 5.0,       # ... or after this many seconds
+    'EXCLUDE_PATHS': ['/static/', '/favicon.ico'],
+    'SAMPLE_RATES': {},          # path prefix -> fraction of requests logged (0.0 - 1.0)
+    'DEFAULT_SAMPLE_RATE': 1.0,
+    'ALWAYS_LOG_ERRORS': True,   # 4xx/5xx bypass sampling
+    'ASYNC': True,               # False writes each full batch inline, no thread and no flush at exit (tests)
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'ACCESS_LOGGING', {}))
+    return config
+
+
+class AccessLogBuffer:
+    """
+    In-memory queue of AcessoLog rows written with bulk_create by a daemon thread,
+    so the INSERT never runs on the request path.
+    """
+
+    def __init__(self, buffer_size, flush_interval, run_async=True):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.run_async = run_async
+        self._records = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+            full = len(self._records) >= self.buffer_size
+        if not self.run_async:
+            if full:
+                self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            records, self._records = self._records, []
+        if not records:
+            return 0
+        try:
+            AcessoLog.objects.bulk_create(records, batch_size=self.buffer_size)
+        except Exception:
+            # Avoid breaking the site if logging fails; the batch is lost, but not silently
+            logger.exception("Access log flush failed, %d records dropped", len(records))
+            return 0
+        return len(records)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # Drop the thread's connection if the DB closed it or it outlived CONN_MAX_AGE
+            close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_config()
+                _buffer = AccessLogBuffer(config['BUFFER_SIZE'], config['FLUSH_INTERVAL'], config['ASYNC'])
+                if config['ASYNC']:
+                    atexit.register(_buffer.flush)
+    return _buffer
+
+
 class AccessLoggingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        config = get_config()
+        self.exclude_paths = tuple(config['EXCLUDE_PATHS'])
+        # Longest prefix first so '/api/gantt/' wins over '/api/'
+        self.sample_rates = sorted(config['SAMPLE_RATES'].items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_sample_rate = config['DEFAULT_SAMPLE_RATE']
+        self.always_log_errors = config['ALWAYS_LOG_ERRORS']
+        self.buffer = get_buffer()
+
+    def sample_rate(self, path):
+        for prefix, rate in self.sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_sample_rate
+
+    def should_log(self, request, response):
+        if request.path.startswith(self.exclude_paths):
+            return False
+        if self.always_log_errors and response.status_code >= 400:
+            return True
+        rate = self.sample_rate(request.path)
+        return rate >= 1.0 or random.random() < rate
 
     def __call__(self, request):
         # Process request
         response = self.get_response(request)
 
-        # Log after response is generated
+        # Queue the log record; the background writer persists it
         try:
+            if not self.should_log(request, response):
+                return response
+
             # Capture IP (handling potential proxy headers)
             x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
             if x_forwarded_for:
@@ -17,16 +144,62 @@ class AccessLoggingMiddleware:
             else:
                 ip = request.META.get('REMOTE_ADDR')
 
-            AcessoLog.objects.create(
-                usuario=request.user if request.user.is_authenticated else None,
+            self.buffer.add(AcessoLog(
+                usuario_id=request.user.pk if request.user.is_authenticated else None,
                 ip_address=ip,
-                path=request.path,
+                path=request.path[:255],
                 method=request.method,
                 status_code=response.status_code,
                 user_agent=request.META.get('HTTP_USER_AGENT', '')[:255]
-            )
+            ))
         except Exception:
             # Avoid breaking the site if logging fails
             pass
 
         return response
+
+
+class InstrumentationMiddleware:
+    """
+    Per-view latency, SQL query count/time and template render time for sampled
+    requests: sent back as a Server-Timing header and aggregated into the
+    histograms served at /metrics (see assets/metricas.py). With SAMPLE_RATE 0
+    the middleware is a plain passthrough.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = metricas.get_config()
+        self.sample_rate = config['SAMPLE_RATE']
+        self.slow_query = config['SLOW_QUERY_MS'] / 1000
+        self.server_timing = config['SERVER_TIMING']
+        self.exclude_paths = tuple(config['EXCLUDE_PATHS'])
+        if self.sample_rate > 0:
+            metricas.instrumentar_templates()
+
+    def sampled(self, request):
+        if self.sample_rate <= 0 or request.path.startswith(self.exclude_paths):
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        medicao = metricas.Medicao(request.path, self.slow_query)
+        with medicao.ativa():
+            start = perf_counter()
+            response = self.get_response(request)
+            total = perf_counter() - start
+
+        try:
+            match = request.resolver_match
+            view = match.view_name if match else 'unresolved'
+            metricas.registrar(view, request.method, response.status_code, total, medicao)
+            user = getattr(request, 'user', None)
+            if self.server_timing is True or (self.server_timing == 'staff' and user is not None and user.is_staff):
+                response['Server-Timing'] = medicao.server_timing(total)
+        except Exception:
+            # Metrics must never break the response
+            pass
+        return response
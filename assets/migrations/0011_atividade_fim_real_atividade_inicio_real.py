@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0010_registroexclusao_atividade_atualizado_em_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atividade',
+            name='fim_real',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Última finalização', null=True),
+        ),
+        migrations.AddField(
+            model_name='atividade',
+            name='inicio_real',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Primeira entrada em execução', null=True),
+        ),
+    ]
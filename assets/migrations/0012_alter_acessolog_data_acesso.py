@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_atividade_fim_real_atividade_inicio_real'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='acessolog',
+            name='data_acesso',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0012_alter_acessolog_data_acesso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcessoResumoHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(db_index=True)),
+                ('path', models.CharField(max_length=255)),
+                ('status_code', models.IntegerField()),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumo de Acessos (Hora)',
+                'verbose_name_plural': 'Resumos de Acessos (Hora)',
+                'ordering': ['-hora'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='acessolog',
+            index=models.Index(fields=['data_acesso'], name='acessolog_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='acessoresumohora',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='acessoresumohora',
+            constraint=models.UniqueConstraint(fields=('hora', 'path', 'usuario', 'status_code'), name='acessoresumo_unico'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0013_acessoresumohora_acessolog_acessolog_data_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atividade',
+            name='data_vencimento',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='atividade',
+            name='plano_origem',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ocorrencias', to='assets.planopreventivo'),
+        ),
+        migrations.AddConstraint(
+            model_name='atividade',
+            constraint=models.UniqueConstraint(fields=('plano_origem', 'data_vencimento'), name='atividade_plano_vencimento_unico'),
+        ),
+    ]
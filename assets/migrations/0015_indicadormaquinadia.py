@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:30
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0014_atividade_data_vencimento_atividade_plano_origem_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadorMaquinaDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('corretivas', models.PositiveIntegerField(default=0)),
+                ('preventivas', models.PositiveIntegerField(default=0)),
+                ('tempo_executando', models.DurationField(default=datetime.timedelta(0))),
+                ('tempo_pausado', models.DurationField(default=datetime.timedelta(0))),
+                ('tempo_parada', models.DurationField(default=datetime.timedelta(0), help_text='Máquina parada (chamados com maquina_parada)')),
+                ('maquina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indicadores', to='assets.maquina')),
+            ],
+            options={
+                'verbose_name': 'Indicador Diário da Máquina',
+                'verbose_name_plural': 'Indicadores Diários das Máquinas',
+                'ordering': ['-data'],
+                'indexes': [models.Index(fields=['data'], name='indicador_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('maquina', 'data'), name='indicador_maquina_dia_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0015_indicadormaquinadia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['maquina', 'data_planejada'], name='atividade_maquina_plan_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0016_atividade_atividade_maquina_plan_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atividade',
+            name='codigo_legado',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='atividadelog',
+            name='data_registro',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0018_eventooutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atividade',
+            name='chamado',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordem_servico', to='assets.chamado'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:06
+
+import logging
+import re
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+RE_CHAMADO = re.compile(r'^CHAMADO #(\d+):')
+LOTE = 2000
+
+
+def vincular(Atividade, Chamado):
+    """
+    Preenche Atividade.chamado a partir das descrições 'CHAMADO #<id>: ...'.
+    Retorna as contagens: vinculadas, fora do padrão, chamado inexistente,
+    duplicadas (outra OS já ficou com o chamado) e chamados aprovados sem OS.
+    """
+    existentes = set(Chamado.objects.values_list('id', flat=True))
+    contagem = {'vinculadas': 0, 'fora_do_padrao': 0, 'chamado_inexistente': 0, 'duplicadas': 0}
+
+    vinculados = set()
+    pendentes = []
+    # Em ordem de id: havendo OS duplicadas para o mesmo chamado, fica a primeira
+    for atividade_id, descricao in Atividade.objects.filter(
+        descricao__startswith='CHAMADO #'
+    ).order_by('id').values_list('id', 'descricao').iterator(chunk_size=LOTE):
+        encontrado = RE_CHAMADO.match(descricao)
+        if not encontrado:
+            contagem['fora_do_padrao'] += 1
+            continue
+        chamado_id = int(encontrado.group(1))
+        if chamado_id not in existentes:
+            contagem['chamado_inexistente'] += 1
+        elif chamado_id in vinculados:
+            contagem['duplicadas'] += 1
+        else:
+            vinculados.add(chamado_id)
+            pendentes.append(Atividade(id=atividade_id, chamado_id=chamado_id))
+        if len(pendentes) >= LOTE:
+            Atividade.objects.bulk_update(pendentes, ['chamado'])
+            contagem['vinculadas'] += len(pendentes)
+            pendentes = []
+    Atividade.objects.bulk_update(pendentes, ['chamado'])
+    contagem['vinculadas'] += len(pendentes)
+    # aprovar_chamado passa a depender só do vínculo: estes seriam aprovados de novo
+    contagem['aprovados_sem_os'] = Chamado.objects.filter(status='aprovado').exclude(id__in=vinculados).count()
+    return contagem
+
+
+def vincular_chamados(apps, schema_editor):
+    contagem = vincular(apps.get_model('assets', 'Atividade'), apps.get_model('assets', 'Chamado'))
+    nao_vinculadas = contagem['fora_do_padrao'] + contagem['chamado_inexistente'] + contagem['duplicadas']
+    if nao_vinculadas or contagem['aprovados_sem_os']:
+        logger.warning(
+            "Vínculo OS-chamado: %(vinculadas)d OS vinculadas; não vinculadas: %(fora_do_padrao)d fora do padrão "
+            "'CHAMADO #<id>:', %(chamado_inexistente)d com chamado inexistente, %(duplicadas)d duplicadas; "
+            "%(aprovados_sem_os)d chamados aprovados sem OS.", contagem,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0019_atividade_chamado'),
+    ]
+
+    operations = [
+        migrations.RunPython(vincular_chamados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0020_vincular_chamados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(condition=models.Q(('status', 'finalizada')), fields=['-fim_real', '-id'], name='atividade_historico_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['status', '-data_abertura', '-id'], name='chamado_status_abertura_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0021_atividade_atividade_historico_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpurgoExclusoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('limite', models.DateTimeField()),
+                ('executado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
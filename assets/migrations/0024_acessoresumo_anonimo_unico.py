@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def juntar_anonimos_duplicados(apps, schema_editor):
+    """Soma os resumos anônimos repetidos na linha de menor id antes da constraint."""
+    AcessoResumoHora = apps.get_model('assets', 'AcessoResumoHora')
+    repetidos = (
+        AcessoResumoHora.objects.filter(usuario__isnull=True)
+        .values('hora', 'path', 'status_code')
+        .annotate(n=Count('id'), primeiro=Min('id'), soma=Sum('total'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for grupo in repetidos.iterator():
+        AcessoResumoHora.objects.filter(id=grupo['primeiro']).update(total=grupo['soma'])
+        AcessoResumoHora.objects.filter(
+            usuario__isnull=True, hora=grupo['hora'], path=grupo['path'], status_code=grupo['status_code'],
+        ).exclude(id=grupo['primeiro']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0023_importacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_anonimos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='acessoresumohora',
+            constraint=models.UniqueConstraint(condition=models.Q(('usuario__isnull', True)), fields=('hora', 'path', 'status_code'), name='acessoresumo_anonimo_unico'),
+        ),
+    ]
@@ -17,6 +17,7 @@ class PlanoPreventivo(models.Model):
     frequencia_dias = models.IntegerField(help_text="A cada quantos dias deve ocorrer?")
     proxima_data = models.DateField(help_text="Data da próxima geração automática")
     ativo = models.BooleanField(default=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
     def __str__(self):
         return f"{self.nome} - {self.maquina.codigo} (Cada {self.frequencia_dias} dias)"
     
@@ -57,6 +58,11 @@ class Atividade(models.Model):
     tempo_total_gasto = models.DurationField(default=timezone.timedelta(0))
     tempo_total_pausa = models.DurationField(default=timezone.timedelta(0))
     ultima_interacao = models.DateTimeField(null=True, blank=True)
+    inicio_real = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Primeira entrada em execução")
+    fim_real = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Última finalização")
+
+    # Controle de alterações (delta do Gantt)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     @property
     def duration_seconds(self):
@@ -67,6 +73,11 @@ class Atividade(models.Model):
             total += delta
         return int(total)
 
+    @property
+    def tempo_gasto_segundos(self):
+        """Tempo acumulado até a última pausa/finalização (sem o trecho em andamento)."""
+        return int(self.tempo_total_gasto.total_seconds()) if self.tempo_total_gasto else 0
+
     # Novos campos para a lógica de Preventiva
     eh_preventiva = models.BooleanField(default=False, verbose_name="É uma manutenção preventiva?")
     procedimento_base = models.ForeignKey(
@@ -76,7 +87,38 @@ class Atividade(models.Model):
         blank=True,
         verbose_name="Procedimento de Origem"
     )
+    # Ocorrência gerada por um plano (uma por plano e vencimento)
+    plano_origem = models.ForeignKey(
+        PlanoPreventivo,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ocorrencias',
+    )
+    data_vencimento = models.DateField(null=True, blank=True)
+    # Id da OS no sistema de origem (importação de histórico)
+    codigo_legado = models.CharField(max_length=50, null=True, blank=True, unique=True)
+    # Chamado aprovado que originou a OS (no máximo uma OS por chamado)
+    chamado = models.OneToOneField(
+        'Chamado',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ordem_servico',
+    )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['plano_origem', 'data_vencimento'], name='atividade_plano_vencimento_unico'),
+        ]
+        indexes = [
+            # Falhas por período (MTBF) e janelas do Gantt
+            models.Index(fields=['maquina', 'data_planejada'], name='atividade_maquina_plan_idx'),
+            # Histórico/concluídas paginados por (fim_real, id)
+            models.Index(
+                fields=['-fim_real', '-id'], condition=models.Q(status='finalizada'), name='atividade_historico_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.maquina.codigo} - {self.descricao}"
@@ -103,6 +145,12 @@ class Chamado(models.Model):
     data_abertura = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHAMADO, default='pendente')
 
+    class Meta:
+        indexes = [
+            # Notificações e histórico paginados por (data_abertura, id) dentro do status
+            models.Index(fields=['status', '-data_abertura', '-id'], name='chamado_status_abertura_idx'),
+        ]
+
     def __str__(self):
         return f"Chamado {self.id} - {self.maquina.codigo}"
     
@@ -113,11 +161,88 @@ class AtividadeLog(models.Model):
     status_novo = models.CharField(max_length=20)
     descricao = models.CharField(max_length=255, blank=True, null=True) 
     duracao = models.DurationField(null=True, blank=True)
-    data_registro = models.DateTimeField(auto_now_add=True)
+    # default em vez de auto_now_add: a importação de histórico grava a data original
+    data_registro = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"{self.atividade.id} - {self.status_novo} - {self.data_registro}"
 
+class IndicadorMaquinaDia(models.Model):
+    """Indicadores diários por máquina, mantidos incrementalmente (ver assets/indicadores.py)."""
+    maquina = models.ForeignKey(Maquina, on_delete=models.CASCADE, related_name='indicadores')
+    data = models.DateField()
+    corretivas = models.PositiveIntegerField(default=0)
+    preventivas = models.PositiveIntegerField(default=0)
+    tempo_executando = models.DurationField(default=timedelta(0))
+    tempo_pausado = models.DurationField(default=timedelta(0))
+    tempo_parada = models.DurationField(default=timedelta(0), help_text="Máquina parada (chamados com maquina_parada)")
+
+    class Meta:
+        verbose_name = "Indicador Diário da Máquina"
+        verbose_name_plural = "Indicadores Diários das Máquinas"
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['maquina', 'data'], name='indicador_maquina_dia_unico'),
+        ]
+        indexes = [models.Index(fields=['data'], name='indicador_data_idx')]
+
+    def __str__(self):
+        return f"{self.maquina.codigo} - {self.data}"
+
+class RegistroExclusao(models.Model):
+    """Lápide de registros apagados, para que clientes em modo delta possam removê-los."""
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    data_exclusao = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} - {self.data_exclusao}"
+
+class ExpurgoExclusoes(models.Model):
+    """Corte do último expurgo de RegistroExclusao: cursor do Gantt anterior a ele recebe o cronograma completo."""
+    limite = models.DateTimeField()
+    executado_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Expurgo até {self.limite}"
+
+class Importacao(models.Model):
+    """Upload de CSV processado em segundo plano (assets/importacao.py); a tela de importação acompanha o status."""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+    tipo = models.CharField(max_length=20)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    conteudo = models.TextField(blank=True)  # esvaziado ao terminar
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    resumo = models.JSONField(null=True, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Importação #{self.id} ({self.tipo}) - {self.get_status_display()}"
+
+    @property
+    def em_andamento(self):
+        return self.status in ('pendente', 'processando')
+
+class EventoOutbox(models.Model):
+    """Eventos em tempo real gravados para os demais processos (backend 'outbox' de assets/eventos.py)."""
+    tipo = models.CharField(max_length=30)
+    dados = models.JSONField(default=dict)
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Evento (Outbox)"
+        verbose_name_plural = "Eventos (Outbox)"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.tipo}"
+
 class AcessoLog(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -125,13 +250,39 @@ class AcessoLog(models.Model):
     method = models.CharField(max_length=10)
     status_code = models.IntegerField()
     user_agent = models.TextField(null=True, blank=True)
-    data_acesso = models.DateTimeField(auto_now_add=True)
+    # default (não auto_now_add): o middleware grava em lote e preserva o instante da requisição
+    data_acesso = models.DateTimeField(default=timezone.now)
 
     class Meta:
         verbose_name = "Log de Acesso"
         verbose_name_plural = "Logs de Acesso"
         ordering = ['-data_acesso']
+        indexes = [models.Index(fields=['data_acesso'], name='acessolog_data_idx')]
 
     def __str__(self):
         user_display = self.usuario.username if self.usuario else "Anônimo"
-        return f"{self.data_acesso.strftime('%d/%m %H:%M')} - {user_display} - {self.path} ({self.status_code})"
\ No newline at end of file
+        return f"{self.data_acesso.strftime('%d/%m %H:%M')} - {user_display} - {self.path} ({self.status_code})"
+
+class AcessoResumoHora(models.Model):
+    """Consolidação horária dos logs de acesso antigos (ver comando consolidar_acessos)."""
+    hora = models.DateTimeField(db_index=True)
+    path = models.CharField(max_length=255)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status_code = models.IntegerField()
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumo de Acessos (Hora)"
+        verbose_name_plural = "Resumos de Acessos (Hora)"
+        ordering = ['-hora']
+        constraints = [
+            models.UniqueConstraint(fields=['hora', 'path', 'usuario', 'status_code'], name='acessoresumo_unico'),
+            # NULLs são distintos na constraint acima: anônimos (e usuários excluídos) têm a sua
+            models.UniqueConstraint(
+                fields=['hora', 'path', 'status_code'], condition=models.Q(usuario__isnull=True),
+                name='acessoresumo_anonimo_unico',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hora.strftime('%d/%m %H:00')} - {self.path} ({self.status_code}): {self.total}"
@@ -0,0 +1,159 @@
+"""
+Geração das ordens preventivas a partir dos planos vencidos.
+
+Roda fora do request: comando `gerar_preventivas` (cron) e/ou o agendador em
+processo (ligado em AssetsConfig.ready(), sobe no primeiro request). Vários
+executores ao mesmo tempo são seguros: cada plano é travado com skip_locked e
+a constraint (plano_origem, data_vencimento) impede ocorrência duplicada.
+"""
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .caching import invalidar
+from .eventos import publicar
+from .indicadores import registrar_aberturas
+from .models import Atividade, PlanoPreventivo
+
+logger = logging.getLogger(__name__)
+
+DURACAO_PREVENTIVA = timedelta(hours=2)
+# Planos travados e gravados por transação
+LOTE_PLANOS = 500
+
+
+def vencimentos(plano, hoje):
+    """Todas as datas de vencimento de `plano` até `hoje` (recupera ciclos perdidos)."""
+    passo = timedelta(days=max(plano.frequencia_dias, 1))
+    data = plano.proxima_data
+    datas = []
+    while data <= hoje:
+        datas.append(data)
+        data += passo
+    return datas, data
+
+
+def gerar_preventivas(hoje=None):
+    """Gera as ocorrências vencidas de todos os planos ativos. Retorna quantas foram criadas."""
+    hoje = hoje or timezone.localdate()
+    total = 0
+    while True:
+        criadas, planos = _gerar_lote(hoje)
+        total += criadas
+        if planos < LOTE_PLANOS:
+            return total
+
+
+def _gerar_lote(hoje):
+    with transaction.atomic():
+        # Planos já travados por outro executor ficam para ele
+        planos = list(
+            PlanoPreventivo.objects.select_for_update(skip_locked=True)
+            .filter(ativo=True, proxima_data__lte=hoje)
+            .order_by('id')[:LOTE_PLANOS]
+        )
+        if not planos:
+            return 0, 0
+
+        existentes = set(
+            Atividade.objects.filter(plano_origem__in=planos, data_vencimento__isnull=False)
+            .values_list('plano_origem_id', 'data_vencimento')
+        )
+
+        agora = timezone.now()
+        novas = []
+        for plano in planos:
+            datas, proxima = vencimentos(plano, hoje)
+            for data in datas:
+                if (plano.id, data) in existentes:
+                    continue
+                novas.append(Atividade(
+                    maquina_id=plano.maquina_id,
+                    descricao=f"[AUTO] {plano.nome}",
+                    data_planejada=timezone.make_aware(datetime.combine(data, time.min)),
+                    eh_preventiva=True,
+                    procedimento_base_id=plano.procedimento_padrao_id,
+                    plano_origem=plano,
+                    data_vencimento=data,
+                    duracao_estimada=DURACAO_PREVENTIVA,
+                    status='aberta',
+                ))
+            plano.proxima_data = proxima
+            plano.atualizado_em = agora
+
+        # ignore_conflicts: última barreira caso a ocorrência tenha sido criada por fora
+        inicio_insercao = timezone.now()
+        Atividade.objects.bulk_create(novas, batch_size=500, ignore_conflicts=True)
+        if novas:
+            # Conflitos ignorados não são sinalizados: relê as chaves e fica só com as gravadas
+            # agora (auto_now de atualizado_em); a ocorrência criada por fora já é mais antiga
+            gravadas = set(
+                Atividade.objects.filter(
+                    plano_origem__in=planos, data_vencimento__isnull=False, atualizado_em__gte=inicio_insercao,
+                ).values_list('plano_origem_id', 'data_vencimento')
+            )
+            novas = [act for act in novas if (act.plano_origem_id, act.data_vencimento) in gravadas]
+        registrar_aberturas(novas)
+        PlanoPreventivo.objects.bulk_update(planos, ['proxima_data', 'atualizado_em'], batch_size=500)
+        # bulk_create/bulk_update não disparam os sinais (cache, indicadores e eventos)
+        transaction.on_commit(lambda: invalidar('gantt'))
+        if novas:
+            quantidade = len(novas)
+            transaction.on_commit(lambda: publicar('atividade', id=None, status='aberta', geradas=quantidade))
+    return len(novas), len(planos)
+
+
+class AgendadorPreventivas:
+    """Thread daemon que chama gerar_preventivas() a cada `intervalo` segundos."""
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='gerador-preventivas', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _run(self):
+        while not self._parar.is_set():
+            try:
+                criadas = gerar_preventivas()
+                if criadas:
+                    logger.info("%s preventivas geradas automaticamente.", criadas)
+            except Exception:
+                logger.exception("Falha ao gerar preventivas")
+            finally:
+                close_old_connections()
+            self._parar.wait(self.intervalo)
+
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+
+def _primeiro_request(sender, **kwargs):
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None:
+            _agendador = AgendadorPreventivas(settings.PREVENTIVAS_AUTOMATICAS['INTERVALO'])
+            _agendador.iniciar()
+    request_started.disconnect(dispatch_uid='preventivas_agendador')
+
+
+def iniciar_agendador():
+    """
+    Agenda o início do gerador para o primeiro request do processo: só quem
+    atende HTTP roda o agendador (migrate, shell e scripts não).
+    """
+    if getattr(settings, 'PREVENTIVAS_AUTOMATICAS', {}).get('INTERVALO'):
+        request_started.connect(_primeiro_request, dispatch_uid='preventivas_agendador')
@@ -0,0 +1,148 @@
+"""
+Previsão de carga das preventivas num horizonte (6 a 12 meses).
+
+Expande todas as ocorrências de todos os planos ativos de uma vez, com
+aritmética vetorizada sobre ordinais de data (NumPy): nenhum objeto por
+ocorrência, nem consulta no laço. O resultado são horas estimadas por semana,
+agregadas por máquina e por técnico.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import Max
+
+from .models import Atividade, PlanoPreventivo
+
+HORAS_PADRAO = 2.0           # mesma duração assumida na barra do plano no Gantt
+MESES_PADRAO = 6
+MESES_MAXIMO = 12
+
+
+def segunda_feira(ordinal):
+    """Ordinal da segunda-feira da semana (ordinal 1, 01/01/0001, é segunda)."""
+    return ordinal - (ordinal - 1) % 7
+
+
+def expandir(inicios, frequencias, inicio, fim):
+    """
+    Todas as ocorrências dos planos dentro de [inicio, fim] (ordinais de data).
+
+    `inicios` e `frequencias` são arrays int64 (próxima data e intervalo em dias
+    de cada plano). Retorna (indice_do_plano, dia) de cada ocorrência.
+    """
+    frequencias = np.maximum(frequencias, 1)
+    # Planos atrasados pulam direto para o primeiro ciclo dentro do horizonte
+    pulos = np.maximum(-((inicios - inicio) // frequencias), 0)
+    primeiros = inicios + pulos * frequencias
+    quantidades = np.where(primeiros <= fim, (fim - primeiros) // frequencias + 1, 0)
+
+    planos = np.repeat(np.arange(len(inicios)), quantidades)
+    # Posição de cada ocorrência dentro do seu plano: 0, 1, 2, ...
+    deslocamentos = np.arange(planos.size) - np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+    dias = primeiros[planos] + deslocamentos * frequencias[planos]
+    return planos, dias
+
+
+def horas_por_plano_semana(planos, dias, horas, inicio, semanas):
+    """Matriz (plano x semana) de horas; semanas começam na segunda-feira de `inicio`."""
+    indice_semana = (dias - segunda_feira(inicio)) // 7
+    total_planos = len(horas)
+    matriz = np.bincount(
+        planos * semanas + indice_semana,
+        weights=horas[planos],
+        minlength=total_planos * semanas,
+    )
+    return matriz.reshape(total_planos, semanas)
+
+
+def agrupar(matriz, grupos, total_grupos):
+    """Soma as linhas de `matriz` por grupo (índices 0..total_grupos-1)."""
+    resultado = np.zeros((total_grupos, matriz.shape[1]))
+    np.add.at(resultado, grupos, matriz)
+    return resultado
+
+
+def previsao_carga(inicio=None, meses=MESES_PADRAO):
+    """
+    Horas estimadas de preventiva por semana, máquina e técnico.
+
+    O técnico de um plano é a equipe da última ocorrência gerada por ele;
+    planos que nunca tiveram equipe ficam em "Sem técnico".
+    """
+    inicio = inicio or date.today()
+    fim = inicio + timedelta(days=round(30.44 * min(meses, MESES_MAXIMO)))
+    inicio_ord, fim_ord = inicio.toordinal(), fim.toordinal()
+
+    linhas = list(
+        PlanoPreventivo.objects.filter(ativo=True).values_list(
+            'id', 'maquina_id', 'maquina__nome', 'frequencia_dias', 'proxima_data',
+            'procedimento_padrao__duracao_estimada_padrao',
+        )
+    )
+    segunda = segunda_feira(inicio_ord)
+    semanas = (fim_ord - segunda) // 7 + 1
+    rotulos = [date.fromordinal(segunda + 7 * s).isoformat() for s in range(semanas)]
+    if not linhas:
+        return {'semanas': rotulos, 'total': [0.0] * semanas, 'ocorrencias': 0, 'por_maquina': [], 'por_tecnico': []}
+
+    ids = [l[0] for l in linhas]
+    inicios = np.fromiter((l[4].toordinal() for l in linhas), dtype=np.int64, count=len(linhas))
+    frequencias = np.fromiter((l[3] for l in linhas), dtype=np.int64, count=len(linhas))
+    horas = np.fromiter(
+        (l[5].total_seconds() / 3600 if l[5] else HORAS_PADRAO for l in linhas),
+        dtype=np.float64, count=len(linhas),
+    )
+
+    planos, dias = expandir(inicios, frequencias, inicio_ord, fim_ord)
+    matriz = horas_por_plano_semana(planos, dias, horas, inicio_ord, semanas)
+
+    # Máquinas
+    maquina_ids, maquina_idx = np.unique(np.array([l[1] for l in linhas]), return_inverse=True)
+    nomes_maquina = {l[1]: l[2] for l in linhas}
+    por_maquina = agrupar(matriz, maquina_idx, len(maquina_ids))
+
+    # Técnicos: equipe da última ocorrência de cada plano (uma consulta)
+    ultimas = (
+        Atividade.objects.filter(plano_origem__ativo=True)
+        .values('plano_origem').annotate(ultima=Max('id')).values('ultima')
+    )
+    pares = list(
+        Atividade.colaboradores.through.objects.filter(atividade_id__in=ultimas)
+        .values_list('atividade__plano_origem_id', 'user_id', 'user__first_name', 'user__username')
+    )
+    posicao = {plano_id: i for i, plano_id in enumerate(ids)}
+    # Plano desativado entre as duas consultas: ignora
+    pares = [p for p in pares if p[0] in posicao]
+    tecnicos = {}
+    for _, user_id, nome, username in pares:
+        tecnicos.setdefault(user_id, nome or username)
+    tecnico_ids = list(tecnicos)
+    tecnico_pos = {t: i for i, t in enumerate(tecnico_ids)}
+    com_equipe = np.zeros(len(ids), dtype=bool)
+    par_plano = np.array([posicao[p[0]] for p in pares], dtype=np.int64)
+    par_tecnico = np.array([tecnico_pos[p[1]] for p in pares], dtype=np.int64)
+    com_equipe[par_plano] = True
+    # A equipe inteira fica ocupada: cada técnico recebe as horas completas da ordem
+    por_tecnico = agrupar(matriz[par_plano], par_tecnico, len(tecnico_ids))
+    sem_tecnico = matriz[~com_equipe].sum(axis=0)
+
+    def arredondar(valores):
+        return np.round(valores, 2).tolist()
+
+    resultado_tecnicos = [
+        {'id': t, 'nome': tecnicos[t], 'horas': arredondar(por_tecnico[i])}
+        for i, t in enumerate(tecnico_ids)
+    ]
+    if sem_tecnico.any():
+        resultado_tecnicos.append({'id': None, 'nome': 'Sem técnico', 'horas': arredondar(sem_tecnico)})
+
+    return {
+        'semanas': rotulos,
+        'total': arredondar(matriz.sum(axis=0)),
+        'ocorrencias': int(planos.size),
+        'por_maquina': [
+            {'id': int(m), 'nome': nomes_maquina[int(m)], 'horas': arredondar(por_maquina[i])}
+            for i, m in enumerate(maquina_ids)
+        ],
+        'por_tecnico': resultado_tecnicos,
+    }
@@ -1,12 +1,89 @@
-from django.db.models import Sum
 from datetime import timedelta
-from . import Atividade
 
+from django.contrib.auth.models import User
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
-def calcular_proxima_disponibilidade(colaborador):
-    """Calcula a próxima disponibilidade de um colaborador com base nas atividades atribuídas."""
-    atividades_ativas = Atividade.objects.filter(colaborador=colaborador, status_in=['aberta','executando','pausada'])
+from .caching import geracao, obter_ou_calcular
+from .models import Atividade
+
+STATUS_PENDENTES = ['aberta', 'executando', 'pausada']
+# A carga muda com o relógio (ordem em execução consome horas): cache curto
+CARGA_TIMEOUT = 30
+
+
+def carga_tecnicos(agora=None):
+    """
+    Carga de toda a equipe numa única consulta agrupada sobre `colaboradores`.
+
+    Para cada técnico: horas estimadas ainda pendentes (estimado - gasto, por
+    ordem), quantidade de ordens, ordem em execução e o próximo horário livre
+    (agora + horas pendentes, trabalhando em sequência).
+    """
+    agora = agora or timezone.now()
+    pendente = Q(atividades__status__in=STATUS_PENDENTES)
+    em_execucao = Atividade.objects.filter(colaboradores=OuterRef('pk'), status='executando').order_by('-ultima_interacao')
+    restante = Greatest(
+        ExpressionWrapper(F('atividades__duracao_estimada') - F('atividades__tempo_total_gasto'), output_field=DurationField()),
+        Value(timedelta(0)),
+    )
+    restante_execucao = em_execucao.annotate(restante=Greatest(
+        ExpressionWrapper(F('duracao_estimada') - F('tempo_total_gasto'), output_field=DurationField()),
+        Value(timedelta(0)),
+    ))
 
-    tempo_total = atividades_ativas.aggregate(total=Sum('duracao_estimada'))['total'] or timedelta(0)
+    linhas = (
+        User.objects.filter(is_active=True)
+        .annotate(
+            restante=Sum(restante, filter=pendente),
+            ordens=Count('atividades', filter=pendente),
+            executando_desde=Max('atividades__ultima_interacao', filter=Q(atividades__status='executando')),
+            executando_id=Subquery(em_execucao.values('id')[:1]),
+            executando_descricao=Subquery(em_execucao.values('descricao')[:1]),
+            executando_restante=Subquery(restante_execucao.values('restante')[:1], output_field=DurationField()),
+        )
+        .order_by('username')
+        .values(
+            'id', 'username', 'first_name', 'restante', 'ordens',
+            'executando_desde', 'executando_id', 'executando_descricao', 'executando_restante',
+        )
+    )
 
-    return tempo_total
\ No newline at end of file
+    resultado = []
+    for linha in linhas:
+        restante = linha['restante'] or timedelta(0)
+        if linha['executando_desde']:
+            # O tempo da execução em curso ainda não entrou em tempo_total_gasto; uma OS
+            # que estoura a estimativa só zera o que é dela, não as horas das outras
+            decorrido = min(agora - linha['executando_desde'], linha['executando_restante'] or timedelta(0))
+            restante = max(restante - decorrido, timedelta(0))
+        resultado.append({
+            'id': linha['id'],
+            'username': linha['username'],
+            'nome': linha['first_name'] or linha['username'],
+            'horas_pendentes': round(restante.total_seconds() / 3600, 2),
+            'ordens_pendentes': linha['ordens'],
+            'executando': {
+                'id': linha['executando_id'],
+                'descricao': linha['executando_descricao'],
+                'desde': linha['executando_desde'].isoformat(),
+            } if linha['executando_id'] else None,
+            'livre_em': (agora + restante).isoformat(),
+            'livre': not linha['ordens'],
+        })
+    return resultado
+
+
+def carga_tecnicos_cache():
+    """carga_tecnicos() compartilhada entre requests; descartada a cada alteração de atividade."""
+    chave = f"carga:{geracao('gantt')}:{geracao('tecnicos')}"
+    return obter_ou_calcular('carga', chave, carga_tecnicos, CARGA_TIMEOUT)
+
+
+def calcular_proxima_disponibilidade(colaborador):
+    """Horas estimadas ainda pendentes de um colaborador (atalho sobre carga_tecnicos)."""
+    for linha in carga_tecnicos_cache():
+        if linha['id'] == colaborador.pk:
+            return timedelta(hours=linha['horas_pendentes'])
+    return timedelta(0)
@@ -0,0 +1,172 @@
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from django.contrib.auth.models import User
+
+from .models import AcessoResumoHora, Atividade, AtividadeLog, PlanoPreventivo, RegistroExclusao, Maquina, Chamado
+from .caching import invalidar
+from .eventos import publicar
+from .indicadores import acumular, aberturas, dia_local, registrar_aberturas
+
+from core.context_processors import contar_chamados_pendentes
+
+
+def tocar_atividade(atividade_id):
+    """Marca a atividade como alterada sem disparar save() (não reescreve os demais campos)."""
+    Atividade.objects.filter(pk=atividade_id).update(atualizado_em=timezone.now())
+
+
+@receiver(m2m_changed, sender=Atividade.colaboradores.through)
+def colaboradores_alterados(sender, instance, action, reverse, **kwargs):
+    # Troca de equipe não passa por Atividade.save()
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        tocar_atividade(instance.pk)
+
+
+@receiver(post_save, sender=AtividadeLog)
+def log_registrado(sender, instance, created, **kwargs):
+    # O histórico faz parte da barra do Gantt
+    if created:
+        tocar_atividade(instance.atividade_id)
+
+
+# Campos que decidem em que linha (máquina, dia, tipo) a OS é contada
+CAMPOS_ABERTURA = ('maquina_id', 'data_planejada', 'eh_preventiva')
+
+
+@receiver(post_init, sender=Atividade)
+def guardar_abertura_carregada(sender, instance, **kwargs):
+    # Como _status_carregado: __dict__ não dispara consulta para campos adiados
+    instance._abertura_carregada = {campo: instance.__dict__.get(campo) for campo in CAMPOS_ABERTURA}
+
+
+def chave_abertura(valores):
+    return valores['maquina_id'], dia_local(valores['data_planejada']), bool(valores['eh_preventiva'])
+
+
+@receiver(post_save, sender=Atividade)
+def atividade_criada(sender, instance, created, **kwargs):
+    # Contagem de corretivas/preventivas do dia (IndicadorMaquinaDia)
+    anterior = instance._abertura_carregada
+    instance._abertura_carregada = atual = {campo: getattr(instance, campo) for campo in CAMPOS_ABERTURA}
+    if created:
+        registrar_aberturas([instance])
+    elif None not in anterior.values() and chave_abertura(anterior) != chave_abertura(atual):
+        # Máquina, dia planejado ou tipo mudaram: a OS troca de linha
+        acumular(aberturas([Atividade(**anterior)], sinal=-1), aberturas([instance]))
+
+
+@receiver(post_delete, sender=Atividade)
+def atividade_excluida(sender, instance, origin=None, **kwargs):
+    RegistroExclusao.objects.create(modelo='atividade', objeto_id=instance.pk)
+    # Exclusão da máquina leva as linhas de indicadores junto
+    if not isinstance(origin, Maquina) and getattr(origin, 'model', None) is not Maquina:
+        acumular(aberturas([instance], sinal=-1))
+
+
+@receiver(post_delete, sender=PlanoPreventivo)
+def plano_excluido(sender, instance, **kwargs):
+    RegistroExclusao.objects.create(modelo='plano', objeto_id=instance.pk)
+
+
+@receiver(post_save, sender=Atividade)
+@receiver(post_delete, sender=Atividade)
+@receiver(post_save, sender=AtividadeLog)
+@receiver(post_delete, sender=AtividadeLog)
+@receiver(post_save, sender=PlanoPreventivo)
+@receiver(post_delete, sender=PlanoPreventivo)
+@receiver(m2m_changed, sender=Atividade.colaboradores.through)
+def invalidar_cache_gantt(sender, **kwargs):
+    # Só após o commit: quem recalcular já enxerga a escrita
+    transaction.on_commit(lambda: invalidar('gantt'))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_tecnicos(sender, update_fields=None, **kwargs):
+    # Cards do Kanban listam os técnicos (nomes e seletor de equipe); login não conta
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(lambda: invalidar('tecnicos'))
+
+
+@receiver(pre_delete, sender=User)
+def resumos_de_acesso_anonimizados(sender, instance, **kwargs):
+    """
+    Os resumos de acesso do usuário excluído viram anônimos (SET_NULL). Onde já
+    há o resumo anônimo da mesma hora/path/status, o total é somado nele e a
+    linha do usuário sai antes, senão a constraint de anônimos barraria a exclusão.
+    """
+    mesma_chave = {'hora': OuterRef('hora'), 'path': OuterRef('path'), 'status_code': OuterRef('status_code')}
+    do_usuario = AcessoResumoHora.objects.filter(usuario=instance, **mesma_chave)
+    AcessoResumoHora.objects.filter(usuario__isnull=True).filter(Exists(do_usuario)).update(
+        total=F('total') + Subquery(do_usuario.values('total')[:1])
+    )
+    anonimos = AcessoResumoHora.objects.filter(usuario__isnull=True, **mesma_chave)
+    AcessoResumoHora.objects.filter(usuario=instance).filter(Exists(anonimos)).delete()
+
+
+@receiver(post_save, sender=Maquina)
+def maquina_alterada(sender, instance, created, **kwargs):
+    # Nome/código da máquina aparece nos cards e barras das atividades dela
+    if not created:
+        Atividade.objects.filter(maquina=instance).update(atualizado_em=timezone.now())
+        transaction.on_commit(lambda: invalidar('gantt'))
+
+
+@receiver(post_save, sender=Chamado)
+@receiver(post_delete, sender=Chamado)
+def invalidar_contador_chamados(sender, created=False, update_fields=None, **kwargs):
+    # Contador do sino de notificações: só criação, exclusão ou troca de status o alteram
+    if update_fields and 'status' not in update_fields and not created:
+        return
+    transaction.on_commit(lambda: invalidar('chamados'))
+
+
+# --- Eventos em tempo real (SSE, ver assets/eventos.py) ---
+
+@receiver(post_init, sender=Atividade)
+@receiver(post_init, sender=Chamado)
+def guardar_status_carregado(sender, instance, **kwargs):
+    # __dict__: com o campo adiado (only/defer) não dispara consulta
+    instance._status_carregado = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Atividade)
+def publicar_atividade(sender, instance, created, **kwargs):
+    anterior = instance._status_carregado
+    instance._status_carregado = instance.status
+    if created or instance.status != anterior:
+        dados = {
+            'id': instance.pk, 'maquina': instance.maquina_id, 'status': instance.status,
+            'anterior': None if created else anterior,
+        }
+        transaction.on_commit(lambda: publicar('atividade', **dados))
+
+
+@receiver(post_delete, sender=Atividade)
+def publicar_atividade_excluida(sender, instance, **kwargs):
+    dados = {'id': instance.pk, 'maquina': instance.maquina_id, 'status': None, 'anterior': instance.status}
+    transaction.on_commit(lambda: publicar('atividade', **dados))
+
+
+@receiver(m2m_changed, sender=Atividade.colaboradores.through)
+def publicar_equipe(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # reverse: técnico.atividades.add(...) -> pk_set são as atividades
+    atividades = sorted(pk_set or []) if reverse else [instance.pk]
+    transaction.on_commit(lambda: publicar('equipe', atividades=atividades))
+
+
+@receiver(post_save, sender=Chamado)
+def publicar_chamado(sender, instance, created, **kwargs):
+    anterior = instance._status_carregado
+    instance._status_carregado = instance.status
+    if created or instance.status != anterior:
+        # Registrado depois de invalidar_contador_chamados: a contagem já sai nova
+        dados = {'id': instance.pk, 'maquina': instance.maquina_id, 'status': instance.status, 'novo': created}
+        transaction.on_commit(lambda: publicar('chamado', pendentes=contar_chamados_pendentes(), **dados))
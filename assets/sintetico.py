@@ -0,0 +1,220 @@
+"""
+Planta sintética para benchmarks: máquinas, técnicos, planos e anos de OS,
+logs e chamados gravados com bulk_create em lotes.
+
+As OS seguem a mesma forma das reais: finalizadas com início/fim reais, tempos
+gastos e de pausa coerentes com os logs, as recentes abertas/em execução/pausadas,
+e corretivas originadas de chamados (Atividade.chamado). Os indicadores
+diários são reconstruídos ao final (bulk_create não dispara os signals).
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import invalidar
+from .indicadores import reconstruir
+from .models import Atividade, AtividadeLog, Chamado, Maquina, PlanoPreventivo, ProcedimentoPreventivo
+
+LOTE_PADRAO = 2000
+SENHA_PADRAO = 'pcm'
+TIPOS_MAQUINA = ['Torno', 'Fresadora', 'Prensa', 'Compressor', 'Injetora', 'Esteira', 'Caldeira', 'Retífica']
+PROBLEMAS = [
+    'Vazamento de óleo', 'Ruído no rolamento', 'Superaquecimento do motor', 'Falha no sensor',
+    'Correia rompida', 'Painel sem energia', 'Vibração excessiva', 'Pressão baixa',
+]
+PROCEDIMENTOS = [
+    ('LUB', 'Lubrificação geral', 1), ('INS', 'Inspeção visual', 0.5), ('FIL', 'Troca de filtros', 2),
+    ('ALI', 'Alinhamento', 3), ('ELE', 'Revisão elétrica', 4),
+]
+HORAS_ESTIMADAS = [0.5, 1, 2, 2, 4, 8]
+# Janela "recente": OS ainda em andamento ficam nos últimos dias
+DIAS_RECENTES = 14
+
+
+def cadastros(maquinas, tecnicos, seed=42):
+    """
+    Garante `maquinas` máquinas (SIM-0001...), `tecnicos` usuários (tec001...),
+    os procedimentos e até dois planos por máquina. Reexecutar não duplica.
+    """
+    rnd = random.Random(seed)
+    Maquina.objects.bulk_create([
+        Maquina(codigo=f"SIM-{i:04d}", nome=f"{rnd.choice(TIPOS_MAQUINA)} {i:04d}")
+        for i in range(1, maquinas + 1)
+    ], ignore_conflicts=True)
+    senha = make_password(SENHA_PADRAO)
+    User.objects.bulk_create([
+        User(username=f"tec{i:03d}", first_name=f"Técnico {i:03d}", password=senha)
+        for i in range(1, tecnicos + 1)
+    ], ignore_conflicts=True)
+    ProcedimentoPreventivo.objects.bulk_create([
+        ProcedimentoPreventivo(codigo=f"SIM-{codigo}", nome=nome, duracao_estimada_padrao=timedelta(hours=horas))
+        for codigo, nome, horas in PROCEDIMENTOS
+    ], ignore_conflicts=True)
+
+    lista_maquinas = list(Maquina.objects.filter(codigo__startswith='SIM-').order_by('codigo')[:maquinas])
+    lista_tecnicos = list(User.objects.filter(username__regex=r'^tec\d{3}$').order_by('username')[:tecnicos])
+    procedimentos = list(ProcedimentoPreventivo.objects.filter(codigo__startswith='SIM-'))
+
+    com_plano = set(PlanoPreventivo.objects.filter(maquina__in=lista_maquinas).values_list('maquina_id', flat=True))
+    hoje = timezone.localdate()
+    PlanoPreventivo.objects.bulk_create([
+        PlanoPreventivo(
+            nome=proc.nome, maquina=maquina, procedimento_padrao=proc,
+            frequencia_dias=rnd.choice([7, 14, 30, 90]), proxima_data=hoje + timedelta(days=rnd.randint(1, 30)),
+        )
+        for maquina in lista_maquinas if maquina.id not in com_plano
+        for proc in rnd.sample(procedimentos, 2)
+    ])
+    return lista_maquinas, lista_tecnicos, procedimentos
+
+
+def _logs(act, rnd, tecnicos):
+    """Logs coerentes com os tempos da OS (a duração de cada log é até o próximo)."""
+    usuario = rnd.choice(tecnicos)
+    if act.status == 'finalizada':
+        if act.tempo_total_pausa:
+            metade = act.tempo_total_gasto / 2
+            pausa_em = act.inicio_real + metade
+            volta_em = pausa_em + act.tempo_total_pausa
+            return [
+                AtividadeLog(atividade=act, usuario=usuario, status_novo='executando', data_registro=act.inicio_real, duracao=metade),
+                AtividadeLog(atividade=act, usuario=usuario, status_novo='pausada', data_registro=pausa_em,
+                             duracao=act.tempo_total_pausa, descricao='Status: pausada | Aguardando peça'),
+                AtividadeLog(atividade=act, usuario=usuario, status_novo='executando', data_registro=volta_em, duracao=metade),
+                AtividadeLog(atividade=act, usuario=usuario, status_novo='finalizada', data_registro=act.fim_real),
+            ]
+        return [
+            AtividadeLog(atividade=act, usuario=usuario, status_novo='executando', data_registro=act.inicio_real,
+                         duracao=act.tempo_total_gasto),
+            AtividadeLog(atividade=act, usuario=usuario, status_novo='finalizada', data_registro=act.fim_real),
+        ]
+    if act.status == 'executando':
+        return [AtividadeLog(atividade=act, usuario=usuario, status_novo='executando', data_registro=act.inicio_real)]
+    if act.status == 'pausada':
+        return [
+            AtividadeLog(atividade=act, usuario=usuario, status_novo='executando', data_registro=act.inicio_real,
+                         duracao=act.tempo_total_gasto),
+            AtividadeLog(atividade=act, usuario=usuario, status_novo='pausada', data_registro=act.ultima_interacao,
+                         descricao='Status: pausada | Aguardando liberação'),
+        ]
+    return []
+
+
+def _atividade(rnd, agora, inicio, maquinas, procedimentos):
+    planejada = inicio + (agora + timedelta(days=30) - inicio) * rnd.random()
+    duracao = timedelta(hours=rnd.choice(HORAS_ESTIMADAS))
+    preventiva = rnd.random() < 0.3
+    proc = rnd.choice(procedimentos) if preventiva else None
+    act = Atividade(
+        maquina=rnd.choice(maquinas),
+        descricao=f"[AUTO] {proc.nome}" if preventiva else rnd.choice(PROBLEMAS),
+        eh_preventiva=preventiva, procedimento_base=proc,
+        eh_emergencial=not preventiva and rnd.random() < 0.05,
+        duracao_estimada=duracao, data_planejada=planejada, status='aberta',
+    )
+
+    sorteio = rnd.random()
+    if planejada > agora:
+        return act
+    if planejada < agora - timedelta(days=DIAS_RECENTES):
+        status = 'finalizada' if sorteio < 0.94 else 'cancelada' if sorteio < 0.99 else 'aberta'
+    else:
+        status = 'aberta' if sorteio < 0.4 else 'executando' if sorteio < 0.5 else 'pausada' if sorteio < 0.6 else 'finalizada'
+    act.status = status
+
+    if status in ('finalizada', 'pausada'):
+        act.inicio_real = planejada + timedelta(minutes=rnd.randint(0, 240))
+        act.tempo_total_gasto = duracao * rnd.uniform(0.5, 1.5)
+        act.ultima_interacao = act.inicio_real + act.tempo_total_gasto
+        if status == 'finalizada':
+            if rnd.random() < 0.2:
+                act.tempo_total_pausa = timedelta(minutes=rnd.randint(10, 180))
+            act.fim_real = act.ultima_interacao + act.tempo_total_pausa
+            act.ultima_interacao = act.fim_real
+        if act.ultima_interacao > agora:
+            # OS recente: comprime para terminar antes de agora
+            act.inicio_real = agora - (act.ultima_interacao - act.inicio_real) - timedelta(minutes=5)
+            act.ultima_interacao = act.inicio_real + act.tempo_total_gasto + act.tempo_total_pausa
+            act.fim_real = act.ultima_interacao if status == 'finalizada' else None
+    elif status == 'executando':
+        act.inicio_real = agora - timedelta(minutes=rnd.randint(5, 180))
+        act.ultima_interacao = act.inicio_real
+    return act
+
+
+def historico(atividades, maquinas, tecnicos, procedimentos, anos=2, taxa_chamados=0.3,
+              seed=42, lote=LOTE_PADRAO, progresso=None):
+    """
+    `atividades` OS distribuídas de `anos` atrás até 30 dias à frente, com equipes
+    de 1 a 3 técnicos, logs e, para `taxa_chamados` das corretivas, o chamado que
+    as originou. Uma transação por lote.
+    """
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise RuntimeError("O banco precisa devolver os ids no bulk_create (PostgreSQL ou SQLite 3.35+).")
+    rnd = random.Random(seed)
+    agora = timezone.now()
+    inicio = agora - timedelta(days=365 * anos)
+    Equipe = Atividade.colaboradores.through
+    totais = {'atividades': 0, 'logs': 0, 'chamados': 0}
+
+    for comeco in range(0, atividades, lote):
+        quantidade = min(lote, atividades - comeco)
+        novas = [_atividade(rnd, agora, inicio, maquinas, procedimentos) for _ in range(quantidade)]
+        with transaction.atomic():
+            # Chamados primeiro: a OS aponta para eles (e a descrição leva o id)
+            origem = [act for act in novas if not act.eh_preventiva and rnd.random() < taxa_chamados]
+            chamados = Chamado.objects.bulk_create([
+                Chamado(
+                    maquina=act.maquina, requisitante=rnd.choice(tecnicos), descricao_problema=act.descricao,
+                    prioridade_indicada=3 if act.eh_emergencial else rnd.choice([1, 2]),
+                    maquina_parada=rnd.random() < 0.3, status='aprovado',
+                )
+                for act in origem
+            ])
+            for act, chamado in zip(origem, chamados):
+                # data_abertura é auto_now_add: corrigida depois do insert
+                chamado.data_abertura = act.data_planejada - timedelta(minutes=rnd.randint(5, 240))
+                act.descricao = f"CHAMADO #{chamado.id}: {chamado.descricao_problema[:50]}"
+                act.chamado = chamado
+            Chamado.objects.bulk_update(chamados, ['data_abertura'])
+
+            Atividade.objects.bulk_create(novas)
+            Equipe.objects.bulk_create([
+                Equipe(atividade_id=act.id, user_id=tecnico.id)
+                for act in novas for tecnico in rnd.sample(tecnicos, min(len(tecnicos), rnd.randint(1, 3)))
+            ])
+            logs = [log for act in novas for log in _logs(act, rnd, tecnicos)]
+            AtividadeLog.objects.bulk_create(logs, batch_size=5000)
+
+        totais['atividades'] += len(novas)
+        totais['logs'] += len(logs)
+        totais['chamados'] += len(chamados)
+        if progresso:
+            progresso(totais)
+    return totais
+
+
+def gerar_planta(maquinas=50, tecnicos=20, atividades=1000, anos=2, taxa_chamados=0.3,
+                 pendentes=10, seed=42, lote=LOTE_PADRAO, progresso=None):
+    """Cadastros + histórico + chamados pendentes; reconstrói indicadores e descarta os caches."""
+    lista_maquinas, lista_tecnicos, procedimentos = cadastros(maquinas, tecnicos, seed)
+    totais = historico(atividades, lista_maquinas, lista_tecnicos, procedimentos, anos, taxa_chamados, seed, lote, progresso)
+
+    rnd = random.Random(seed)
+    Chamado.objects.bulk_create([
+        Chamado(
+            maquina=rnd.choice(lista_maquinas), requisitante=rnd.choice(lista_tecnicos),
+            descricao_problema=rnd.choice(PROBLEMAS), prioridade_indicada=rnd.choice([1, 2, 3]),
+            maquina_parada=rnd.random() < 0.3,
+        )
+        for _ in range(pendentes)
+    ])
+    totais['chamados'] += pendentes
+    totais['indicadores'] = reconstruir()
+    for namespace in ('gantt', 'tecnicos', 'chamados'):
+        invalidar(namespace)
+    return totais
@@ -1,3 +1,1195 @@
-from django.test import TestCase
+import importlib
+import random
+import threading
+import time as time_mod
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_started
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Sum, prefetch_related_objects
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import eventos, metricas, transicoes
+from .agendamento import Tarefa, sequenciar
+from core.context_processors import contar_chamados_pendentes, notifications
+
+from .caching import ALIAS_CONTADORES, estatisticas, geracao, invalidar, obter_ou_calcular
+from .confiabilidade import confiabilidade
+from .gantt import parse_cursor
+from .historico import feed_historico, ler_cursor
+from .indicadores import reconstruir
+from .kanban import concluidas_queryset
+from .models import (
+    AcessoLog, AcessoResumoHora, Atividade, AtividadeLog, Chamado, EventoOutbox, Importacao, IndicadorMaquinaDia, Maquina, PlanoPreventivo,
+    ProcedimentoPreventivo, RegistroExclusao,
+)
+from .importacao import ImportadorAtividades, ImportadorLogs
+from .middleware import AccessLogBuffer, AccessLoggingMiddleware
+from .preventivas import gerar_preventivas
+from .previsao import HORAS_PADRAO, previsao_carga
+from .services import carga_tecnicos
+from .sintetico import gerar_planta
+from .utils import prefetch_logs_recentes, preencher_tempos_reais, sequenciar_atividades
+
+
+def setUpModule():
+    # O gerador de preventivas em segundo plano não participa dos testes
+    request_started.disconnect(dispatch_uid='preventivas_agendador')
+
+
+def limpar_caches():
+    cache.clear()
+    caches[ALIAS_CONTADORES].clear()
+
+
+class CachingTests(TestCase):
+    def setUp(self):
+        limpar_caches()
+
+    def test_geracao_nao_repete_depois_de_perder_o_contador(self):
+        vistas = [geracao('teste')]
+        invalidar('teste')
+        vistas.append(geracao('teste'))
+
+        caches[ALIAS_CONTADORES].delete('geracao:teste')
+        vistas.append(geracao('teste'))
+        caches[ALIAS_CONTADORES].delete('geracao:teste')
+        invalidar('teste')
+        vistas.append(geracao('teste'))
+
+        self.assertEqual(vistas, sorted(set(vistas)))
+
+    def test_geracao_e_estatisticas_fora_do_cache_de_dados(self):
+        obter_ou_calcular('teste', 'teste:chave', lambda: 'valor', 60)
+        obter_ou_calcular('teste', 'teste:chave', lambda: 'valor', 60)
+        antes = geracao('teste')
+
+        # Enche o cache de dados até expulsar tudo
+        for i in range(cache._max_entries + 50):
+            cache.set(f'lixo:{i}', i)
+
+        self.assertEqual(geracao('teste'), antes)
+        self.assertEqual(estatisticas('teste')['hits'], 1)
+        self.assertEqual(estatisticas('teste')['misses'], 1)
+
+    def test_single_flight_calcula_uma_vez_para_threads_simultaneas(self):
+        chamadas = []
+        largada = threading.Barrier(8)
+        resultados = []
+
+        def calcular():
+            chamadas.append(1)
+            time_mod.sleep(0.1)
+            return 'valor'
+
+        def pedir():
+            largada.wait()
+            resultados.append(obter_ou_calcular('teste', 'teste:disputada', calcular, 60))
+
+        threads = [threading.Thread(target=pedir) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(resultados, ['valor'] * 8)
+        stats = estatisticas('teste')
+        self.assertEqual((stats['misses'], stats['hits'] + stats['coalescidos']), (1, 7))
+
+    def test_espera_o_calculo_de_outro_processo(self):
+        # Lock de outro processo (cache compartilhado): espera o valor em vez de recalcular
+        cache.add('teste:remota:lock', 1, 30)
+        threading.Timer(0.1, lambda: cache.set('teste:remota', 'de fora', 60)).start()
+
+        valor = obter_ou_calcular('teste', 'teste:remota', mock.Mock(return_value='local'), 60)
+        self.assertEqual(valor, 'de fora')
+        self.assertEqual(estatisticas('teste')['coalescidos'], 1)
+
+    def test_nova_geracao_descarta_o_valor_anterior(self):
+        chave = lambda: f"teste:{geracao('teste')}"
+        self.assertEqual(obter_ou_calcular('teste', chave(), lambda: 'antigo', 60), 'antigo')
+        invalidar('teste')
+        self.assertEqual(obter_ou_calcular('teste', chave(), lambda: 'novo', 60), 'novo')
+
+
+class GanttApiTests(TestCase):
+    """Janela e filtros do Gantt aplicados no banco; cronograma em cache até a próxima escrita."""
+
+    def setUp(self):
+        limpar_caches()
+        self.tecnico = User.objects.create_user('tecnico')
+        self.client.force_login(User.objects.create_user('pcm'))
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        agora = timezone.now()
+        self.ativa = self.os_('Ativa', planejada=agora)
+        self.ativa.colaboradores.add(self.tecnico)
+        self.antiga = self.os_('Antiga', planejada=agora - timedelta(days=200), status='finalizada',
+                               inicio_real=agora - timedelta(days=200), fim_real=agora - timedelta(days=199))
+        self.recente = self.os_('Recente', planejada=agora - timedelta(days=2), status='finalizada',
+                                inicio_real=agora - timedelta(days=2), fim_real=agora - timedelta(days=1))
+
+    def os_(self, descricao, planejada, **campos):
+        return Atividade.objects.create(
+            maquina=self.maquina, descricao=descricao, duracao_estimada=timedelta(hours=1), data_planejada=planejada, **campos,
+        )
+
+    def ids(self, **params):
+        return {int(item['id']) for item in self.client.get('/api/gantt/dados/', params).json()}
+
+    def test_janela_e_filtros(self):
+        self.assertEqual(self.ids(), {self.ativa.id, self.recente.id})
+        self.assertEqual(self.ids(tecnico=self.tecnico.id), {self.ativa.id})
+        self.assertEqual(self.ids(status='finalizada'), {self.recente.id})
+        self.assertEqual(self.ids(all='false'), {self.ativa.id})
+        inicio = (timezone.localdate() - timedelta(days=210)).isoformat()
+        self.assertIn(self.antiga.id, self.ids(inicio=inicio))
+
+    def test_escrita_invalida_o_cronograma_em_cache(self):
+        self.assertEqual(self.ids(), {self.ativa.id, self.recente.id})
+        self.assertEqual(self.ids(), {self.ativa.id, self.recente.id})
+        self.assertEqual(estatisticas('gantt')['hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nova = self.os_('Nova', planejada=timezone.now())
+        self.assertEqual(self.ids(), {self.ativa.id, self.recente.id, nova.id})
+
+
+class KanbanCacheTests(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.client.force_login(User.objects.create_user('pcm'))
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        # Mais cards ativos que o limite padrão do Django (300 entradas)
+        Atividade.objects.bulk_create([
+            Atividade(
+                maquina=maquina, descricao=f'OS {i}', duracao_estimada=timedelta(hours=1),
+                status='aberta' if i % 5 else 'executando',
+            )
+            for i in range(500)
+        ])
+
+    def test_quadro_grande_reaproveita_os_cards_em_cache(self):
+        self.client.get('/kanban/')
+        self.assertEqual(estatisticas('kanban_cards')['misses'], 500)
+
+        self.client.get('/kanban/')
+        stats = estatisticas('kanban_cards')
+        self.assertEqual(stats['hits'], 500)
+        self.assertEqual(stats['taxa_acerto'], 0.5)
+
+
+class KanbanEventosTests(TestCase):
+    """Eventos de outros usuários trocam só o card afetado (fragmentos OOB)."""
+
+    def setUp(self):
+        limpar_caches()
+        self.usuario = User.objects.create_user('pcm')
+        self.client.force_login(self.usuario)
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        self.atividade = Atividade.objects.create(
+            maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1), status='executando',
+        )
+
+    def test_troca_de_status_move_o_card_e_os_contadores(self):
+        html = self.client.get(f'/kanban/atividade/{self.atividade.id}/', {'anterior': 'aberta'}).content.decode()
+        self.assertIn(f'<div id="card-{self.atividade.id}" hx-swap-oob="delete">', html)
+        self.assertIn('hx-swap-oob="beforeend:#coluna-executando"', html)
+        self.assertIn('innerHTML:#contador-aberta', html)
+        self.assertIn('innerHTML:#contador-executando', html)
+        self.assertNotIn('#kanban-container', html)
+
+    def test_atividade_excluida_sai_do_quadro(self):
+        atividade_id = self.atividade.id
+        self.atividade.delete()
+        html = self.client.get(f'/kanban/atividade/{atividade_id}/', {'anterior': 'executando'}).content.decode()
+        self.assertIn(f'<div id="card-{atividade_id}" hx-swap-oob="delete">', html)
+        self.assertNotIn('#coluna-', html)
+        self.assertIn('innerHTML:#contador-executando">0<', html)
+
+    def test_equipe_alterada_devolve_so_o_card(self):
+        html = self.client.get(f'/kanban/atividade/{self.atividade.id}/').content.decode()
+        self.assertIn(f'id="card-{self.atividade.id}"', html)
+        self.assertNotIn('hx-swap-oob', html)
+
+    def test_chamado_pendente_entra_na_triagem(self):
+        chamado = Chamado.objects.create(maquina=self.maquina, requisitante=self.usuario, descricao_problema='Vazamento')
+        html = self.client.get(f'/kanban/chamado/{chamado.id}/').content.decode()
+        self.assertIn('afterbegin:#coluna-triagem', html)
+        self.assertIn('innerHTML:#contador-triagem">1<', html)
+
+        Chamado.objects.filter(pk=chamado.pk).update(status='recusado')
+        html = self.client.get(f'/kanban/chamado/{chamado.id}/').content.decode()
+        self.assertIn(f'<div id="chamado-{chamado.id}" hx-swap-oob="delete">', html)
+        self.assertNotIn('#coluna-triagem', html)
+
+
+class OrcamentoConsultasTests(TestCase):
+    """
+    Consultas por requisição das views principais (os tetos de benchmark_views).
+    A subclasse repete tudo com o dobro de OS: o número não pode crescer com o volume.
+    """
+    ATIVIDADES = 150
+    HX = {'HX-Request': 'true'}
+
+    @classmethod
+    def setUpTestData(cls):
+        gerar_planta(maquinas=10, tecnicos=5, atividades=cls.ATIVIDADES, anos=1, pendentes=3, seed=cls.ATIVIDADES)
+        cls.usuario = User.objects.create_superuser('pcm')
+
+    def setUp(self):
+        limpar_caches()
+        self.client.force_login(self.usuario)
+
+    def assertConsultas(self, url, frio, quente):
+        with self.assertNumQueries(frio):
+            self.client.get(url)
+        with self.assertNumQueries(quente):
+            self.client.get(url)
+
+    def test_kanban(self):
+        self.assertConsultas('/kanban/', 12, 10)
+
+    def test_gantt(self):
+        self.assertConsultas('/api/gantt/dados/', 6, 2)
+
+    def test_dashboard(self):
+        self.assertConsultas('/dashboard/', 11, 10)
+
+    def test_alterar_status(self):
+        atividade = Atividade.objects.filter(status='aberta').first()
+        with self.assertNumQueries(12):
+            resposta = self.client.post(
+                f'/status/{atividade.id}/executando/', headers={**self.HX, 'HX-Target': f'card-{atividade.id}'},
+            )
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_aprovar_chamado(self):
+        chamado = Chamado.objects.filter(status='pendente').first()
+        with self.assertNumQueries(21):
+            resposta = self.client.post(
+                f'/chamado/aprovar/{chamado.id}/', {'tecnico': [self.usuario.id]},
+                headers={**self.HX, 'HX-Target': f'chamado-{chamado.id}'},
+            )
+        self.assertEqual(resposta.status_code, 200)
+
+
+class OrcamentoConsultasVolumeTests(OrcamentoConsultasTests):
+    ATIVIDADES = 300
+
+
+class TransicoesTests(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.usuario = User.objects.create_user('tecnico')
+        self.client.force_login(self.usuario)
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+
+    def em_execucao_desde(self, inicio):
+        atividade = Atividade.objects.create(
+            maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1),
+            status='executando', ultima_interacao=inicio,
+        )
+        AtividadeLog.objects.create(atividade=atividade, usuario=self.usuario, status_novo='executando', data_registro=inicio)
+        AtividadeLog.objects.filter(atividade=atividade).update(data_registro=inicio)
+        return atividade
+
+    def pausar(self, atividade):
+        return self.client.post(
+            f'/status/{atividade.id}/pausada/', {'justificativa': 'peça'},
+            headers={'HX-Request': 'true', 'HX-Target': f'card-{atividade.id}'},
+        )
+
+    def test_consultas_nao_crescem_com_o_intervalo(self):
+        agora = timezone.now()
+        curta, longa = self.em_execucao_desde(agora - timedelta(hours=1)), self.em_execucao_desde(agora - timedelta(days=20))
+
+        # Sessão, travada+último log, fecha o log, atividade, indicadores (2), log novo e o card OOB
+        with self.assertNumQueries(15):
+            self.pausar(curta)
+        with self.assertNumQueries(15):
+            self.pausar(longa)
+
+        self.assertGreaterEqual(IndicadorMaquinaDia.objects.filter(maquina=self.maquina).count(), 20)
+        longa.refresh_from_db()
+        total = IndicadorMaquinaDia.objects.filter(maquina=self.maquina).aggregate(t=Sum('tempo_executando'))['t']
+        curta.refresh_from_db()
+        self.assertEqual(total, curta.tempo_total_gasto + longa.tempo_total_gasto)
+
+    def test_transicao_invalida_responde_409(self):
+        atividade = Atividade.objects.create(maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1))
+        resposta = self.client.post(f'/status/{atividade.id}/pausada/', headers={'HX-Request': 'true'})
+
+        self.assertEqual(resposta.status_code, 409)
+        self.assertIn('showToast', resposta['HX-Trigger'])
+        atividade.refresh_from_db()
+        self.assertEqual(atividade.status, 'aberta')
+        self.assertFalse(atividade.logs.exists())
+
+    def test_cancelamento_passa_pela_maquina_de_estados(self):
+        atividade = self.em_execucao_desde(timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.client.get(f'/atividade/cancelar/{atividade.id}/').status_code, 405)
+
+        self.client.post(f'/atividade/cancelar/{atividade.id}/', {'motivo': 'duplicada'})
+        atividade.refresh_from_db()
+        self.assertEqual((atividade.status, atividade.motivo_cancelamento), ('cancelada', 'duplicada'))
+        self.assertEqual(atividade.logs.order_by('-data_registro', '-id').first().status_novo, 'cancelada')
+        self.assertGreater(atividade.tempo_total_gasto, timedelta(0))
+
+        finalizada = Atividade.objects.create(
+            maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1), status='finalizada',
+        )
+        resposta = self.client.post(f'/atividade/cancelar/{finalizada.id}/', headers={'HX-Request': 'true'})
+        self.assertEqual(resposta.status_code, 409)
+        finalizada.refresh_from_db()
+        self.assertEqual(finalizada.status, 'finalizada')
+
+
+class IndicadoresAberturaTests(TestCase):
+    def setUp(self):
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        self.outra = Maquina.objects.create(codigo='M-02', nome='Fresa')
+        self.hoje = timezone.localdate()
+
+    def contagens(self):
+        return {
+            (linha.maquina_id, linha.data): (linha.corretivas, linha.preventivas)
+            for linha in IndicadorMaquinaDia.objects.all() if linha.corretivas or linha.preventivas
+        }
+
+    def test_edicao_e_exclusao_acompanham_a_contagem(self):
+        atividade = Atividade.objects.create(maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1))
+        self.assertEqual(self.contagens(), {(self.maquina.id, self.hoje): (1, 0)})
+
+        atividade = Atividade.objects.get(pk=atividade.pk)
+        atividade.data_planejada += timedelta(days=2)
+        atividade.eh_preventiva = True
+        atividade.maquina = self.outra
+        atividade.save()
+        self.assertEqual(self.contagens(), {(self.outra.id, self.hoje + timedelta(days=2)): (0, 1)})
+
+        atividade.descricao = 'Só a descrição'
+        atividade.save()
+        self.assertEqual(self.contagens(), {(self.outra.id, self.hoje + timedelta(days=2)): (0, 1)})
+
+        atividade.delete()
+        self.assertEqual(self.contagens(), {})
+
+    def test_exclusao_da_maquina_leva_os_indicadores(self):
+        Atividade.objects.create(maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1))
+        self.maquina.delete()
+        self.assertFalse(IndicadorMaquinaDia.objects.exists())
+
+
+class GeracaoPreventivasTests(TestCase):
+    def test_ocorrencia_criada_por_fora_nao_entra_na_contagem(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        procedimento = ProcedimentoPreventivo.objects.create(codigo='P1', nome='Lubrificação', duracao_estimada_padrao=timedelta(hours=1))
+        hoje = timezone.localdate()
+        plano = PlanoPreventivo.objects.create(
+            nome='Lubrificação', maquina=maquina, procedimento_padrao=procedimento,
+            frequencia_dias=7, proxima_data=hoje - timedelta(days=14),
+        )
+        bulk_create = Atividade.objects.bulk_create
+
+        def concorrente(novas, **kwargs):
+            # Outro processo grava a primeira ocorrência entre a leitura e a inserção
+            avulsa = Atividade.objects.create(
+                maquina=maquina, descricao='Manual', duracao_estimada=timedelta(hours=1), eh_preventiva=True,
+                plano_origem=plano, data_vencimento=novas[0].data_vencimento, data_planejada=novas[0].data_planejada,
+            )
+            Atividade.objects.filter(pk=avulsa.pk).update(atualizado_em=timezone.now() - timedelta(seconds=1))
+            return bulk_create(novas, **kwargs)
+
+        with mock.patch.object(Atividade.objects, 'bulk_create', side_effect=concorrente):
+            self.assertEqual(gerar_preventivas(hoje), 2)
+
+        self.assertEqual(Atividade.objects.filter(plano_origem=plano).count(), 3)
+        self.assertEqual(IndicadorMaquinaDia.objects.aggregate(n=Sum('preventivas'))['n'], 3)
+
+
+class CargaTecnicosTests(TestCase):
+    def test_execucao_estourada_nao_consome_as_outras_ordens(self):
+        tecnico = User.objects.create_user('tecnico')
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        agora = timezone.now()
+        em_curso = Atividade.objects.create(
+            maquina=maquina, descricao='Em curso', duracao_estimada=timedelta(hours=1),
+            status='executando', ultima_interacao=agora - timedelta(hours=5),
+        )
+        na_fila = Atividade.objects.create(maquina=maquina, descricao='Na fila', duracao_estimada=timedelta(hours=3))
+        tecnico.atividades.add(em_curso, na_fila)
+
+        linha, = [linha for linha in carga_tecnicos(agora) if linha['id'] == tecnico.id]
+        self.assertEqual(linha['horas_pendentes'], 3)
+
+
+class ConfiabilidadeTests(TestCase):
+    def test_mttr_pelo_tempo_em_execucao_e_resposta_a_parte(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        requisitante = User.objects.create_user('operador')
+        agora = timezone.now()
+        # Reaberta: ficou dias finalizada entre as duas execuções (2h no total)
+        Atividade.objects.create(
+            maquina=maquina, descricao='Reaberta', duracao_estimada=timedelta(hours=1), status='finalizada',
+            inicio_real=agora - timedelta(days=10), fim_real=agora, tempo_total_gasto=timedelta(hours=2),
+        )
+        # De chamado: 3h de espera até o início e 1h de execução
+        chamado = Chamado.objects.create(maquina=maquina, requisitante=requisitante, descricao_problema='Parou', status='aprovado')
+        Chamado.objects.filter(pk=chamado.pk).update(data_abertura=agora - timedelta(hours=4))
+        Atividade.objects.create(
+            maquina=maquina, chamado=chamado, descricao='Chamado', duracao_estimada=timedelta(hours=1), status='finalizada',
+            inicio_real=agora - timedelta(hours=1), fim_real=agora, tempo_total_gasto=timedelta(hours=1),
+        )
+
+        hoje = timezone.localdate()
+        resultado = confiabilidade(hoje - timedelta(days=1), hoje + timedelta(days=1))
+        self.assertEqual(resultado['planta']['reparos'], 2)
+        # Mesma definição para as duas OS: (2h + 1h) / 2; a espera do chamado fica no tempo de resposta
+        self.assertEqual(resultado['planta']['mttr_horas'], 1.5)
+        self.assertEqual(resultado['planta']['tempo_resposta_horas'], 3)
+        self.assertEqual(resultado['maquinas'][0]['tempo_resposta_horas'], 3)
+
+
+class ExportacaoTests(TestCase):
+    def test_texto_livre_nao_vira_formula(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        Atividade.objects.create(maquina=maquina, descricao='=HYPERLINK("http://x")', duracao_estimada=timedelta(hours=1))
+        Atividade.objects.create(maquina=maquina, descricao='@SUM(A1)', duracao_estimada=timedelta(hours=1))
+
+        self.client.force_login(User.objects.create_user('pcm'))
+        csv = b''.join(self.client.get('/exportar/atividades.csv').streaming_content).decode('utf-8-sig')
+        self.assertIn(';"\'=HYPERLINK(""http://x"")";', csv)
+        self.assertIn(";'@SUM(A1);", csv)
+
+
+class LapidesGanttTests(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.client.force_login(User.objects.create_user('pcm'))
+
+    def test_expurgo_e_cursor_expirado(self):
+        antiga = RegistroExclusao.objects.create(modelo='atividade', objeto_id=1)
+        recente = RegistroExclusao.objects.create(modelo='atividade', objeto_id=2)
+        RegistroExclusao.objects.filter(pk=antiga.pk).update(data_exclusao=timezone.now() - timedelta(days=30))
+
+        call_command('expurgar_exclusoes', stdout=StringIO())
+        self.assertEqual(list(RegistroExclusao.objects.values_list('pk', flat=True)), [recente.pk])
+
+        velho = (timezone.now() - timedelta(days=30)).isoformat()
+        self.assertTrue(self.client.get('/api/gantt/dados/', {'since': velho}).json()['full'])
+        novo = (timezone.now() - timedelta(minutes=1)).isoformat()
+        resposta = self.client.get('/api/gantt/dados/', {'since': novo}).json()
+        self.assertFalse(resposta['full'])
+        self.assertEqual(resposta['removidos'], ['2'])
+
+    def test_planta_parada_segue_no_304(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        atividade = Atividade.objects.create(maquina=maquina, descricao='OS', duracao_estimada=timedelta(hours=1))
+        Atividade.objects.filter(pk=atividade.pk).update(atualizado_em=timezone.now() - timedelta(days=20))
+        lapide = RegistroExclusao.objects.create(modelo='atividade', objeto_id=99)
+        RegistroExclusao.objects.filter(pk=lapide.pk).update(data_exclusao=timezone.now() - timedelta(days=30))
+        call_command('expurgar_exclusoes', stdout=StringIO())
+        self.assertFalse(RegistroExclusao.objects.exists())
+        limpar_caches()
+
+        cursor = self.client.get('/api/gantt/dados/', {'delta': 1}).json()['cursor']
+        self.assertLess(parse_cursor(cursor), timezone.now() - timedelta(days=7))
+        primeira = self.client.get('/api/gantt/dados/', {'since': cursor})
+        self.assertFalse(primeira.json()['full'])
+        resposta = self.client.get('/api/gantt/dados/', {'since': cursor}, headers={'If-None-Match': primeira['ETag']})
+        self.assertEqual(resposta.status_code, 304)
+
+
+class ImportacaoLogsTests(TestCase):
+    def test_status_invalido_e_recusado(self):
+        linhas = [
+            (2, {'referencia': 'OS-1', 'status': 'executando', 'data_registro': '2026-01-05 08:00'}),
+            (3, {'referencia': 'OS-1', 'status': 'concluida', 'data_registro': '2026-01-05 09:00'}),
+        ]
+        resumo = ImportadorLogs().importar(linhas)
+        self.assertIn({'linha': 3, 'erro': 'status inválido: concluida'}, resumo['erros'])
+
+
+class ImportacaoIndicadoresTests(TestCase):
+    def setUp(self):
+        self.m1 = Maquina.objects.create(codigo='M1', nome='Prensa')
+        self.m2 = Maquina.objects.create(codigo='M2', nome='Torno')
+        Atividade.objects.create(
+            maquina=self.m2, descricao='Antiga', data_planejada=timezone.now() - timedelta(days=30),
+            duracao_estimada=timedelta(hours=1),
+        )
+
+    def linhas_indicadores(self):
+        return set(IndicadorMaquinaDia.objects.values_list(
+            'maquina_id', 'data', 'corretivas', 'preventivas', 'tempo_executando', 'tempo_pausado', 'tempo_parada'
+        ))
+
+    def importar_os(self, maquina, data):
+        linha = {'referencia': 'OS-1', 'maquina': maquina, 'descricao': 'Troca de rolamento', 'data_planejada': data}
+        resumo = ImportadorAtividades().importar([(2, linha)])
+        self.assertEqual(resumo['erros'], [])
+
+    def test_so_recalcula_maquinas_e_dias_tocados(self):
+        # Linha de outra máquina fora do arquivo: não é refeita (marca propositalmente errada)
+        IndicadorMaquinaDia.objects.filter(maquina=self.m2).update(corretivas=99)
+        self.importar_os('M1', '2026-03-02 08:00')
+
+        self.assertEqual(IndicadorMaquinaDia.objects.get(maquina=self.m2).corretivas, 99)
+        self.assertEqual(IndicadorMaquinaDia.objects.get(maquina=self.m1).corretivas, 1)
+
+    def test_os_movida_sai_da_posicao_anterior(self):
+        self.importar_os('M1', '2026-03-02 08:00')
+        self.importar_os('M2', '2026-03-05 08:00')
+
+        esperado = self.linhas_indicadores()
+        reconstruir()
+        self.assertEqual(self.linhas_indicadores(), esperado)
+        self.assertFalse(IndicadorMaquinaDia.objects.filter(maquina=self.m1, corretivas__gt=0).exists())
+
+    def test_logs_preenchem_tempos_e_indicadores_das_os(self):
+        self.importar_os('M1', '2026-03-02 08:00')
+        resumo = ImportadorLogs().importar([
+            (2, {'referencia': 'OS-1', 'status': 'executando', 'data_registro': '2026-03-02 23:00', 'duracao_horas': '2'}),
+            (3, {'referencia': 'OS-1', 'status': 'finalizada', 'data_registro': '2026-03-03 01:00'}),
+        ])
+        self.assertEqual(resumo['criados'], 2)
+
+        atividade = Atividade.objects.get(codigo_legado='OS-1')
+        self.assertIsNotNone(atividade.inicio_real)
+        self.assertIsNotNone(atividade.fim_real)
+        tempos = dict(IndicadorMaquinaDia.objects.filter(maquina=self.m1).values_list('data', 'tempo_executando'))
+        self.assertEqual(sorted(tempos.values()), [timedelta(hours=1), timedelta(hours=1)])
+
+        esperado = self.linhas_indicadores()
+        reconstruir()
+        self.assertEqual(self.linhas_indicadores(), esperado)
+
+
+@override_settings(IMPORTACAO={'ASYNC': False})
+class ImportacaoUploadTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('pcm', password='x', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_upload_vira_importacao_acompanhada_por_polling(self):
+        arquivo = SimpleUploadedFile('maquinas.csv', 'codigo;nome\nM9;Fresa\n'.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('importar_dados'), {'tipo': 'maquinas', 'arquivo': arquivo})
+
+        importacao = Importacao.objects.get()
+        self.assertRedirects(response, f"{reverse('importar_dados')}?importacao={importacao.id}")
+        self.assertEqual(importacao.status, 'concluida')
+        self.assertEqual(importacao.resumo, {'criados': 1, 'atualizados': 0, 'erros': []})
+        self.assertEqual(importacao.conteudo, '')
+        self.assertTrue(Maquina.objects.filter(codigo='M9').exists())
+
+        fragmento = self.client.get(response['Location'], HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(fragmento, 'assets/partials/_importacao_status.html')
+        self.assertNotContains(fragmento, 'hx-trigger')
+
+    def test_em_andamento_continua_consultando(self):
+        importacao = Importacao.objects.create(tipo='maquinas', usuario=self.staff, conteudo='codigo;nome\n')
+        response = self.client.get(f"{reverse('importar_dados')}?importacao={importacao.id}", HTTP_HX_REQUEST='true')
+        self.assertContains(response, 'hx-trigger="every 2s"')
+
+
+class AccessLogTests(TestCase):
+    def registro(self, path='/kanban/'):
+        return AcessoLog(path=path, method='GET', status_code=200)
+
+    def test_grava_ao_encher_o_lote(self):
+        buffer = AccessLogBuffer(buffer_size=2, flush_interval=60, run_async=False)
+        buffer.add(self.registro())
+        self.assertEqual(AcessoLog.objects.count(), 0)
+        buffer.add(self.registro())
+        self.assertEqual(AcessoLog.objects.count(), 2)
+
+    def test_thread_grava_apos_o_intervalo(self):
+        buffer = AccessLogBuffer(buffer_size=100, flush_interval=0.05)
+        gravou = threading.Event()
+        # A thread usa outra conexão: basta ver que ela chama flush sem o lote encher
+        buffer.flush = mock.Mock(side_effect=gravou.set)
+        buffer.add(self.registro())
+        self.assertTrue(gravou.wait(2))
+
+    def test_falha_na_gravacao_e_registrada(self):
+        buffer = AccessLogBuffer(buffer_size=10, flush_interval=60, run_async=False)
+        buffer.add(self.registro())
+        buffer.add(self.registro())
+        with mock.patch.object(AcessoLog.objects, 'bulk_create', side_effect=DatabaseError('fora do ar')):
+            with self.assertLogs('assets.middleware', 'ERROR') as logs:
+                self.assertEqual(buffer.flush(), 0)
+        self.assertIn('2 records dropped', logs.output[0])
+
+    @override_settings(ACCESS_LOGGING={
+        'EXCLUDE_PATHS': ['/static/'], 'SAMPLE_RATES': {'/api/': 0.5, '/api/gantt/': 0.1}, 'ASYNC': False,
+    })
+    def test_exclusoes_e_amostragem(self):
+        middleware = AccessLoggingMiddleware(lambda request: HttpResponse())
+        fabrica = RequestFactory()
+
+        def registra(path, status=200, sorteio=0.99):
+            with mock.patch('assets.middleware.random.random', return_value=sorteio):
+                return middleware.should_log(fabrica.get(path), HttpResponse(status=status))
+
+        self.assertFalse(registra('/static/app.css', sorteio=0))
+        self.assertTrue(registra('/kanban/'))
+        # Prefixo mais longo vence: 0.3 passa em /api/ (0.5) mas não em /api/gantt/ (0.1)
+        self.assertTrue(registra('/api/eventos/', sorteio=0.3))
+        self.assertFalse(registra('/api/gantt/dados/', sorteio=0.3))
+        self.assertTrue(registra('/api/gantt/dados/', sorteio=0.05))
+        # Erros passam pela amostragem
+        self.assertTrue(registra('/api/gantt/dados/', status=500))
+
+
+class EventosReconexaoTests(TestCase):
+    def test_local_repete_do_mesmo_processo_e_recarrega_id_alheio(self):
+        backend = eventos.BackendLocal()
+        backend.publicar('atividade', {'id': 1})
+        backend.publicar('atividade', {'id': 2})
+
+        perdidos = async_to_sync(backend.desde)(f"{backend.inicio}-1")
+        self.assertEqual([e['dados'] for e in perdidos], [{'id': 2}])
+        self.assertEqual(async_to_sync(backend.desde)(f"{backend.inicio}-2"), [])
+        # Outro worker, processo reiniciado ou id da outbox: recarga completa
+        self.assertIsNone(async_to_sync(backend.desde)(f"{eventos.BackendLocal().inicio}-1"))
+        self.assertIsNone(async_to_sync(backend.desde)('17'))
+
+    def test_local_recarrega_quando_a_janela_nao_cobre(self):
+        backend = eventos.BackendLocal()
+        for i in range(eventos.REPLAY_MAXIMO + 2):
+            backend.publicar('atividade', {'id': i})
+        self.assertIsNone(async_to_sync(backend.desde)(f"{backend.inicio}-1"))
+
+    def test_outbox_so_le_linhas_depois_da_carencia_de_commit(self):
+        backend = eventos.BackendOutbox(intervalo=1, retencao=3600, graca=5)
+        antigo = EventoOutbox.objects.create(tipo='atividade', dados={})
+        EventoOutbox.objects.filter(pk=antigo.pk).update(criado_em=timezone.now() - timedelta(seconds=10))
+        # Recente: uma transação com id menor ainda pode confirmar depois dela
+        EventoOutbox.objects.create(tipo='atividade', dados={})
+
+        # close_old_connections fecharia a conexão da transação do teste
+        with mock.patch('assets.eventos.close_old_connections'):
+            self.assertEqual([e['id'] for e in backend._ler(0, 10)], [antigo.id])
+            self.assertEqual(backend._ultimo_id(), antigo.id)
+        self.assertIsNone(async_to_sync(backend.desde)('abc-1'))
+
+
+class TransicoesConcorrentesTests(TransactionTestCase):
+    """Threads disputando a mesma OS: a máquina de estados e os totais seguem consistentes."""
+
+    def setUp(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        self.atividade = Atividade.objects.create(maquina=maquina, descricao='Disputada', duracao_estimada=timedelta(hours=1))
+        self.usuarios = [User.objects.create_user(f'tecnico{i}') for i in range(4)]
+
+    def disputar(self, destinos):
+        """Cada thread tenta sua sequência de destinos; devolve (aplicadas, recusadas)."""
+        largada = threading.Barrier(len(destinos))
+        aplicadas, recusadas, erros = [], [], []
+
+        def trabalhar(usuario, sequencia):
+            try:
+                largada.wait()
+                for destino in sequencia:
+                    try:
+                        transicoes.alterar_status(self.atividade.id, destino, usuario)
+                        aplicadas.append(destino)
+                    except transicoes.TransicaoInvalida:
+                        recusadas.append(destino)
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=trabalhar, args=args) for args in zip(self.usuarios, destinos)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(erros, [])
+        return aplicadas, recusadas
+
+    def test_so_uma_de_duas_transicoes_conflitantes_vence(self):
+        aplicadas, recusadas = self.disputar([['executando'], ['executando']])
+
+        self.assertEqual((aplicadas, recusadas), (['executando'], ['executando']))
+        self.assertEqual(self.atividade.logs.count(), 1)
+
+    def test_totais_batem_com_os_logs(self):
+        sequencia = ['executando', 'pausada'] * 5
+        self.disputar([sequencia] * 4)
+
+        self.atividade.refresh_from_db()
+        logs = list(self.atividade.logs.order_by('data_registro', 'id'))
+        for log, proximo in zip(logs, logs[1:]):
+            self.assertNotEqual(log.status_novo, proximo.status_novo)
+            self.assertEqual(log.duracao, proximo.data_registro - log.data_registro)
+        self.assertEqual(logs[-1].status_novo, self.atividade.status)
+
+        gasto = sum((log.duracao for log in logs if log.status_novo == 'executando' and log.duracao), timedelta(0))
+        pausa = sum((log.duracao for log in logs if log.status_novo == 'pausada' and log.duracao), timedelta(0))
+        self.assertEqual(self.atividade.tempo_total_gasto, gasto)
+        self.assertEqual(self.atividade.tempo_total_pausa, pausa)
+        indicadores = IndicadorMaquinaDia.objects.aggregate(executando=Sum('tempo_executando'), pausado=Sum('tempo_pausado'))
+        self.assertEqual(indicadores['executando'] or timedelta(0), gasto)
+        self.assertEqual(indicadores['pausado'] or timedelta(0), pausa)
+
+
+class VinculoChamadosMigracaoTests(TestCase):
+    """Backfill de Atividade.chamado pela descrição (migração 0020)."""
+
+    def test_vincula_e_conta_o_que_ficou_de_fora(self):
+        migracao = importlib.import_module('assets.migrations.0020_vincular_chamados')
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        requisitante = User.objects.create_user('operador')
+        chamado = Chamado.objects.create(maquina=maquina, requisitante=requisitante, descricao_problema='Parou', status='aprovado')
+        orfao = Chamado.objects.create(maquina=maquina, requisitante=requisitante, descricao_problema='Vaza', status='aprovado')
+
+        def os_(descricao):
+            return Atividade.objects.create(maquina=maquina, descricao=descricao, duracao_estimada=timedelta(hours=1))
+
+        vinculada = os_(f'CHAMADO #{chamado.id}: Parou')
+        duplicada = os_(f'CHAMADO #{chamado.id}: Parou (de novo)')
+        fora = os_(f'CHAMADO #{orfao.id} - Vaza')
+        inexistente = os_('CHAMADO #99999: Sumiu')
+        avulsa = os_('Troca de óleo')
+
+        contagem = migracao.vincular(Atividade, Chamado)
+
+        self.assertEqual(contagem, {
+            'vinculadas': 1, 'fora_do_padrao': 1, 'chamado_inexistente': 1, 'duplicadas': 1, 'aprovados_sem_os': 1,
+        })
+        vinculos = dict(Atividade.objects.values_list('id', 'chamado_id'))
+        self.assertEqual(vinculos[vinculada.id], chamado.id)
+        for atividade in (duplicada, fora, inexistente, avulsa):
+            self.assertIsNone(vinculos[atividade.id])
+
+
+class FeedHistoricoTests(TestCase):
+    """Paginação por cursor do histórico unificado (UNION de OS e chamados)."""
+
+    def setUp(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        requisitante = User.objects.create_user('operador')
+        agora = timezone.now().replace(microsecond=0)
+        # Grupo de instantes idênticos com os dois tipos, entre itens mais novos e mais antigos
+        momentos = [agora] + [agora - timedelta(hours=1)] * 3 + [agora - timedelta(hours=2)]
+        self.esperado = []
+        for i, momento in enumerate(momentos):
+            atividade = Atividade.objects.create(
+                maquina=maquina, descricao=f'OS {i}', duracao_estimada=timedelta(hours=1), status='finalizada', fim_real=momento,
+            )
+            chamado = Chamado.objects.create(maquina=maquina, requisitante=requisitante, descricao_problema=f'C {i}', status='recusado')
+            Chamado.objects.filter(pk=chamado.pk).update(data_abertura=momento)
+            self.esperado += [(momento, 'atividade', atividade.id), (momento, 'chamado', chamado.id)]
+        # Mesma ordem do banco: (momento, tipo, id) decrescente
+        self.esperado = [(tipo, pk) for _, tipo, pk in sorted(self.esperado, reverse=True)]
+
+    def percorrer(self, limite):
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            itens, proximo = feed_historico(ler_cursor(cursor), limite)
+            vistos += [(item.tipo_historico, item.id) for item in itens]
+            paginas += 1
+            if proximo is None:
+                return vistos, paginas
+            cursor = proximo
+
+    def test_paginas_nao_repetem_nem_pulam_itens(self):
+        # Limites que cortam o grupo empatado em pontos diferentes (dentro de um tipo e na troca de tipo)
+        for limite in (1, 2, 3, 4, 5, 7):
+            with self.subTest(limite=limite):
+                vistos, paginas = self.percorrer(limite)
+                self.assertEqual(vistos, self.esperado)
+                self.assertEqual(paginas, -(-len(self.esperado) // limite))
+
+
+class TemposReaisTests(TestCase):
+    """inicio_real/fim_real mantidos pelas transições e preenchidos a partir dos logs."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('tecnico')
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+
+    def os_(self, **campos):
+        return Atividade.objects.create(maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1), **campos)
+
+    def test_transicoes_gravam_inicio_e_fim(self):
+        atividade = self.os_()
+        transicoes.alterar_status(atividade.id, 'executando', self.usuario)
+        atividade.refresh_from_db()
+        inicio = atividade.inicio_real
+        self.assertIsNotNone(inicio)
+
+        transicoes.alterar_status(atividade.id, 'pausada', self.usuario, 'peça')
+        transicoes.alterar_status(atividade.id, 'executando', self.usuario)
+        transicoes.alterar_status(atividade.id, 'finalizada', self.usuario)
+        atividade.refresh_from_db()
+        # Retomar não move o início; o fim é o da finalização
+        self.assertEqual(atividade.inicio_real, inicio)
+        self.assertEqual(atividade.fim_real, atividade.logs.latest('data_registro').data_registro)
+
+    def test_preenchimento_numa_agregacao_agrupada(self):
+        agora = timezone.now()
+
+        def com_logs(quantidade):
+            atividades = [self.os_(status='finalizada') for _ in range(quantidade)]
+            for atividade in atividades:
+                AtividadeLog.objects.create(atividade=atividade, status_novo='executando')
+                AtividadeLog.objects.create(atividade=atividade, status_novo='finalizada')
+            AtividadeLog.objects.filter(atividade__in=atividades, status_novo='executando').update(data_registro=agora - timedelta(hours=2))
+            AtividadeLog.objects.filter(atividade__in=atividades, status_novo='finalizada').update(data_registro=agora)
+            return atividades
+
+        # Agregação dos logs, leitura das OS e um UPDATE em lote, quantas forem as OS
+        poucas = com_logs(2)
+        with self.assertNumQueries(3):
+            self.assertEqual(preencher_tempos_reais(), 2)
+        muitas = com_logs(20)
+        with self.assertNumQueries(3):
+            self.assertEqual(preencher_tempos_reais(), 20)
+
+        for atividade in poucas + muitas:
+            atividade.refresh_from_db()
+            self.assertEqual((atividade.inicio_real, atividade.fim_real), (agora - timedelta(hours=2), agora))
+
+    def test_concluidas_filtradas_por_faixa_de_fim_real(self):
+        hoje = self.os_(status='finalizada', fim_real=timezone.now())
+        self.os_(status='finalizada', fim_real=timezone.now() - timedelta(days=2))
+
+        qs, rotulo = concluidas_queryset('hoje')
+        self.assertEqual(list(qs), [hoje])
+        self.assertEqual(rotulo, 'Concluídas (Hoje)')
+
+
+class AgendamentoTests(SimpleTestCase):
+    """Motor de sequenciamento: fila de prioridade, equipe inteira bloqueada."""
+
+    def setUp(self):
+        self.base = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def horarios(self, tarefas, agora=None):
+        return {
+            item.id: (item.inicio - self.base, item.fim - self.base)
+            for item in sequenciar(tarefas, agora or self.base - timedelta(days=1))
+        }
+
+    def test_equipe_bloqueada_junta(self):
+        h = timedelta(hours=1)
+        resultado = self.horarios([
+            Tarefa(1, self.base, 2 * h, tecnicos=(1, 2)),
+            Tarefa(2, self.base, h, tecnicos=(2,)),
+            Tarefa(3, self.base + h / 2, h, tecnicos=(1, 3)),
+            Tarefa(4, self.base + h, h, tecnicos=(3,)),
+        ])
+        self.assertEqual(resultado, {
+            1: (0 * h, 2 * h),
+            2: (2 * h, 3 * h),      # espera o técnico 2 sair da equipe da tarefa 1
+            3: (2 * h, 3 * h),      # espera o técnico 1, e então ocupa também o 3
+            4: (3 * h, 4 * h),      # técnico 3 livre só depois da tarefa 3
+        })
+
+    def test_emergencial_corta_a_fila(self):
+        h = timedelta(hours=1)
+        resultado = sequenciar([
+            Tarefa(1, self.base, 2 * h, tecnicos=(1,)),
+            Tarefa(2, self.base + h, h, tecnicos=(1,), emergencial=True),
+        ], self.base - timedelta(days=1))
+        self.assertEqual([item.id for item in resultado], [2, 1])
+        self.assertEqual((resultado[0].inicio, resultado[1].inicio), (self.base + h, self.base + 2 * h))
+
+    def test_em_execucao_vem_para_o_presente(self):
+        agora = self.base - timedelta(days=1)
+        item, = sequenciar([Tarefa(1, self.base, timedelta(0), tecnicos=(1,), executando=True)], agora)
+        self.assertEqual((item.inicio, item.duracao), (agora, timedelta(hours=1)))
+        self.assertGreaterEqual(item.fim, agora)
+
+
+class SequenciarAtividadesTests(TestCase):
+    def test_consultas_nao_crescem_com_as_atividades(self):
+        maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        tecnicos = [User.objects.create_user(f'tecnico{i}') for i in range(3)]
+
+        def criar(quantidade):
+            for i in range(quantidade):
+                atividade = Atividade.objects.create(maquina=maquina, descricao=f'OS {i}', duracao_estimada=timedelta(hours=1))
+                atividade.colaboradores.add(*tecnicos[:1 + i % 3])
+
+        criar(3)
+        with self.assertNumQueries(2):
+            sequenciar_atividades(Atividade.objects.all())
+        criar(30)
+        # Atividades + equipes (prefetch), nenhuma consulta por linha
+        with self.assertNumQueries(2):
+            self.assertEqual(len(sequenciar_atividades(Atividade.objects.all())), 33)
+
+
+class ConsolidarAcessosTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('pcm')
+        self.antes = timezone.now().replace(minute=10, second=0, microsecond=0) - timedelta(days=40)
+
+    def acessos(self, quantidade, usuario=None, minuto=0):
+        ids = [AcessoLog.objects.create(usuario=usuario, path='/login/', method='GET', status_code=200).id for _ in range(quantidade)]
+        AcessoLog.objects.filter(id__in=ids).update(data_acesso=self.antes + timedelta(minutes=minuto))
+
+    def consolidar(self, *args):
+        call_command('consolidar_acessos', *args, stdout=StringIO())
+
+    def totais(self):
+        return sorted(AcessoResumoHora.objects.values_list('usuario_id', 'total'), key=lambda t: (t[0] or 0, t[1]))
+
+    def test_reexecucao_soma_nos_resumos_anonimos(self):
+        self.acessos(3)
+        self.acessos(2, usuario=self.usuario)
+        AcessoLog.objects.create(path='/kanban/', method='GET', status_code=200)  # recente: fica bruto
+        self.consolidar()
+        self.assertEqual(self.totais(), [(None, 3), (self.usuario.id, 2)])
+        self.assertEqual(AcessoLog.objects.count(), 1)
+
+        # Linhas atrasadas na mesma hora, anônimas e do usuário: somam, sem resumo duplicado
+        self.acessos(4, minuto=20)
+        self.acessos(1, usuario=self.usuario, minuto=30)
+        self.consolidar()
+        self.consolidar()
+        self.assertEqual(self.totais(), [(None, 7), (self.usuario.id, 3)])
+        self.assertEqual(AcessoLog.objects.count(), 1)
+
+    def test_resumo_anonimo_e_unico(self):
+        hora = self.antes.replace(minute=0)
+        AcessoResumoHora.objects.create(hora=hora, path='/login/', status_code=200, total=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AcessoResumoHora.objects.create(hora=hora, path='/login/', status_code=200, total=1)
+
+    def test_usuario_excluido_soma_nos_anonimos(self):
+        self.acessos(3)
+        self.acessos(2, usuario=self.usuario)
+        self.acessos(1, usuario=self.usuario, minuto=-60)  # hora sem resumo anônimo
+        self.consolidar()
+
+        self.usuario.delete()
+        self.assertEqual(self.totais(), [(None, 1), (None, 5)])
+
+
+class ContadorChamadosTests(TestCase):
+    """Contador do sino: em cache, invalidado por criação, exclusão ou troca de status."""
+
+    def setUp(self):
+        limpar_caches()
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        self.requisitante = User.objects.create_user('operador')
+
+    def abrir(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Chamado.objects.create(maquina=self.maquina, requisitante=self.requisitante, descricao_problema='Parou')
+
+    def test_contagem_em_cache_ate_o_chamado_mudar(self):
+        chamado = self.abrir()
+        self.assertEqual(contar_chamados_pendentes(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(contar_chamados_pendentes(), 1)
+
+        self.abrir()
+        self.assertEqual(contar_chamados_pendentes(), 2)
+
+        # Campo que não altera a contagem: mantém o cache
+        versao = geracao('chamados')
+        chamado.descricao_problema = 'Parou de vez'
+        with self.captureOnCommitCallbacks(execute=True):
+            chamado.save(update_fields=['descricao_problema'])
+        self.assertEqual(geracao('chamados'), versao)
+
+        chamado.status = 'recusado'
+        with self.captureOnCommitCallbacks(execute=True):
+            chamado.save(update_fields=['status'])
+        self.assertEqual(contar_chamados_pendentes(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Chamado.objects.filter(status='pendente').get().delete()
+        self.assertEqual(contar_chamados_pendentes(), 0)
+
+    def test_context_processor_so_conta_quando_usado(self):
+        self.abrir()
+        request = RequestFactory().get('/')
+        request.user = self.requisitante
+        with self.assertNumQueries(0):
+            contexto = notifications(request)
+        self.assertEqual(contexto['chamados_pendentes_count'], 1)
+
+
+class PrevisaoCargaTests(TestCase):
+    """A expansão vetorizada dá o mesmo que percorrer as ocorrências plano a plano."""
+
+    def setUp(self):
+        rnd = random.Random(7)
+        self.inicio = timezone.localdate()
+        maquinas = [Maquina.objects.create(codigo=f'M-{i}', nome=f'Máquina {i}') for i in range(3)]
+        procedimentos = [None] + [
+            ProcedimentoPreventivo.objects.create(codigo=f'P{i}', nome=f'Proc {i}', duracao_estimada_padrao=timedelta(minutes=m))
+            for i, m in enumerate((45, 90, 180))
+        ]
+        tecnicos = [User.objects.create_user(f'tecnico{i}') for i in range(3)]
+        for i in range(40):
+            plano = PlanoPreventivo.objects.create(
+                nome=f'Plano {i}', maquina=rnd.choice(maquinas), procedimento_padrao=rnd.choice(procedimentos),
+                frequencia_dias=rnd.choice((0, 1, 3, 7, 15, 30, 45, 90, 365)),
+                proxima_data=self.inicio + timedelta(days=rnd.randint(-120, 200)),
+                ativo=i % 10 != 0,
+            )
+            if i % 3:
+                # Equipe da última ocorrência gerada (a anterior, com outra equipe, não conta)
+                for dias, equipe in ((30, tecnicos), (0, rnd.sample(tecnicos, rnd.randint(1, 2)))):
+                    ocorrencia = Atividade.objects.create(
+                        maquina=plano.maquina, descricao=plano.nome, duracao_estimada=timedelta(hours=1),
+                        eh_preventiva=True, plano_origem=plano, data_vencimento=self.inicio - timedelta(days=dias),
+                    )
+                    ocorrencia.colaboradores.add(*equipe)
+
+    def laco(self, meses):
+        """Referência: cada ocorrência de cada plano, uma a uma."""
+        fim = self.inicio + timedelta(days=round(30.44 * meses))
+        segunda = self.inicio - timedelta(days=self.inicio.weekday())
+        semanas = (fim - segunda).days // 7 + 1
+        total, por_maquina, por_tecnico, ocorrencias = [0.0] * semanas, {}, {}, 0
+        for plano in PlanoPreventivo.objects.filter(ativo=True).select_related('procedimento_padrao'):
+            duracao = plano.procedimento_padrao.duracao_estimada_padrao if plano.procedimento_padrao else None
+            horas = duracao.total_seconds() / 3600 if duracao else HORAS_PADRAO
+            ultima = Atividade.objects.filter(plano_origem=plano).order_by('-id').first()
+            equipe = [t.id for t in ultima.colaboradores.all()] if ultima else []
+            passo = timedelta(days=max(plano.frequencia_dias, 1))
+            data = plano.proxima_data
+            while data < self.inicio:
+                data += passo
+            while data <= fim:
+                semana = (data - segunda).days // 7
+                ocorrencias += 1
+                total[semana] += horas
+                por_maquina.setdefault(plano.maquina_id, [0.0] * semanas)[semana] += horas
+                for tecnico in equipe or [None]:
+                    por_tecnico.setdefault(tecnico, [0.0] * semanas)[semana] += horas
+                data += passo
+        arredondar = lambda valores: [round(v, 2) for v in valores]
+        return {
+            'total': arredondar(total),
+            'ocorrencias': ocorrencias,
+            'por_maquina': {m: arredondar(v) for m, v in por_maquina.items()},
+            'por_tecnico': {t: arredondar(v) for t, v in por_tecnico.items()},
+        }
+
+    def test_mesmo_resultado_do_laco(self):
+        for meses in (1, 6, 12):
+            with self.subTest(meses=meses):
+                previsao = previsao_carga(self.inicio, meses)
+                esperado = self.laco(meses)
+                self.assertEqual(previsao['ocorrencias'], esperado['ocorrencias'])
+                self.assertEqual(previsao['total'], esperado['total'])
+                self.assertEqual({m['id']: m['horas'] for m in previsao['por_maquina']}, esperado['por_maquina'])
+                self.assertEqual({t['id']: t['horas'] for t in previsao['por_tecnico']}, esperado['por_tecnico'])
+
+    def test_duas_consultas_quantos_forem_os_planos(self):
+        with self.assertNumQueries(2):
+            previsao_carga(self.inicio, 12)
+
+
+@override_settings(INSTRUMENTATION={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': 'staff', 'METRICS_TOKEN': 'segredo', 'SLOW_QUERY_MS': 300})
+class InstrumentacaoTests(TestCase):
+    def setUp(self):
+        limpar_caches()
+        metricas.registro.limpar()
+        self.staff = User.objects.create_user('pcm', is_staff=True)
+
+    def test_server_timing_so_para_staff(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/kanban/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ consultas", tpl;dur=[\d.]+$')
+
+        self.client.force_login(User.objects.create_user('tecnico'))
+        self.assertNotIn('Server-Timing', self.client.get('/kanban/'))
+
+    def test_metrics_exige_staff_ou_token(self):
+        self.client.force_login(self.staff)
+        self.client.get('/kanban/')
+        self.client.logout()
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+        self.client.force_login(User.objects.create_user('tecnico'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.logout()
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'pcm_request_duration_seconds_count{view="kanban_view",method="GET",status="2xx"} 1')
+        self.assertContains(response, 'pcm_request_sql_queries_bucket{view="kanban_view",le="+Inf"} 1')
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(INSTRUMENTATION={'SLOW_QUERY_MS': 0, 'SERVER_TIMING': False})
+    def test_consulta_lenta_vai_para_o_log(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('assets.metricas', 'WARNING') as logs:
+            response = self.client.get('/kanban/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('Consulta lenta', logs.output[0])
+        self.assertIn('pcm_slow_queries_total{view="kanban_view"}', metricas.registro.exportar())
+
+    @override_settings(INSTRUMENTATION={'SAMPLE_RATE': 0, 'SERVER_TIMING': True})
+    def test_sem_amostragem_nada_e_medido(self):
+        self.client.force_login(self.staff)
+        self.assertNotIn('Server-Timing', self.client.get('/kanban/'))
+        self.assertNotIn('view="kanban_view"', metricas.registro.exportar())
+
+
+class PrefetchLogsRecentesTests(TestCase):
+    """Só os N logs mais recentes de cada atividade, numa consulta só, qualquer que seja o histórico."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('tecnico')
+        self.maquina = Maquina.objects.create(codigo='M-01', nome='Torno')
+        self.base = timezone.now() - timedelta(days=30)
+
+    def os_com_logs(self, quantidade):
+        atividade = Atividade.objects.create(maquina=self.maquina, descricao='OS', duracao_estimada=timedelta(hours=1))
+        AtividadeLog.objects.bulk_create([
+            # Pares com o mesmo instante: o desempate é pelo id
+            AtividadeLog(atividade=atividade, usuario=self.usuario, status_novo='pausada', data_registro=self.base + timedelta(minutes=i // 2))
+            for i in range(quantidade)
+        ])
+        return atividade
+
+    def test_limite_por_atividade_em_uma_consulta(self):
+        carregadas = [self.os_com_logs(n) for n in (0, 2, 3, 40)]
+        with CaptureQueriesContext(connection) as consultas:
+            prefetch_related_objects(carregadas, prefetch_logs_recentes(3))
+            # usuario vem no select_related
+            usuarios = {log.usuario.username for act in carregadas for log in act.logs_recentes}
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('ROW_NUMBER()', consultas[0]['sql'])
+        self.assertEqual(usuarios, {'tecnico'})
+
+        for act in carregadas:
+            esperados = list(act.logs.order_by('-data_registro', '-id').values_list('id', flat=True)[:3])
+            self.assertEqual([log.id for log in act.logs_recentes], esperados)
+        self.assertEqual(sorted(len(act.logs_recentes) for act in carregadas), [0, 2, 3, 3])
+
+    def test_consultas_nao_crescem_com_o_historico(self):
+        for quantidade in (5, 200):
+            with self.subTest(logs=quantidade):
+                carregadas = [self.os_com_logs(quantidade) for _ in range(3)]
+                with self.assertNumQueries(1):
+                    prefetch_related_objects(carregadas, prefetch_logs_recentes(10))
+                self.assertTrue(all(len(act.logs_recentes) == min(quantidade, 10) for act in carregadas))
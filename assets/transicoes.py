@@ -0,0 +1,110 @@
+"""
+Máquina de estados das OS: transições permitidas e a troca de status atômica.
+
+Uma transição fecha o log do status anterior, acumula os tempos com F() e abre
+o log novo na mesma transação, com a linha da atividade travada
+(select_for_update). A gravação da atividade ainda é condicionada ao status lido,
+então bancos sem lock de linha (SQLite) também não aplicam duas transições
+a partir do mesmo estado.
+"""
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import invalidar
+from .eventos import publicar
+from .indicadores import acumular, finalizacao, intervalo
+from .models import Atividade, AtividadeLog
+
+# status atual -> destinos permitidos (OS finalizada não é cancelada; cancelada é final)
+TRANSICOES = {
+    'aberta': {'executando', 'cancelada'},
+    'executando': {'pausada', 'finalizada', 'cancelada'},
+    'pausada': {'executando', 'finalizada', 'cancelada'},
+    'finalizada': {'executando'},  # reabertura; a refinalização corrige a parada da máquina
+}
+
+
+class TransicaoInvalida(Exception):
+    """Destino não permitido a partir do status atual (ou outra transição venceu)."""
+
+    def __init__(self, anterior, novo):
+        self.anterior, self.novo = anterior, novo
+        super().__init__(f"Transição inválida: {anterior} → {novo}.")
+
+
+def pode_transicionar(anterior, novo):
+    return novo in TRANSICOES.get(anterior, ())
+
+
+def alterar_status(atividade_id, novo_status, usuario, justificativa=''):
+    """
+    Aplica a transição e devolve (atividade, status anterior). Levanta
+    Atividade.DoesNotExist ou TransicaoInvalida; nesse caso nada é gravado.
+
+    Consultas: leitura travada (com o último log), fechamento do log, atividade,
+    log novo e duas para os indicadores da máquina (todos os dias do intervalo de
+    uma vez), independentemente do histórico da OS.
+    """
+    ultimo_log = AtividadeLog.objects.filter(atividade=OuterRef('pk')).order_by('-data_registro', '-id')
+
+    with transaction.atomic():
+        atividade = Atividade.objects.select_for_update().annotate(
+            ultimo_log_id=Subquery(ultimo_log.values('id')[:1]),
+            ultimo_log_status=Subquery(ultimo_log.values('status_novo')[:1]),
+            ultimo_log_data=Subquery(ultimo_log.values('data_registro')[:1]),
+        ).get(pk=atividade_id)
+        anterior = atividade.status
+        if not pode_transicionar(anterior, novo_status):
+            raise TransicaoInvalida(anterior, novo_status)
+
+        agora = timezone.now()
+        campos = {'status': novo_status, 'atualizado_em': agora}
+        indicadores = []
+
+        # Fecha o intervalo do status anterior
+        if atividade.ultimo_log_id:
+            decorrido = agora - atividade.ultimo_log_data
+            AtividadeLog.objects.filter(pk=atividade.ultimo_log_id).update(duracao=decorrido)
+            indicadores.append(intervalo(atividade.maquina_id, atividade.ultimo_log_status, atividade.ultimo_log_data, agora))
+            if anterior == 'pausada':
+                campos['tempo_total_pausa'] = F('tempo_total_pausa') + decorrido
+        if anterior == 'executando' and atividade.ultima_interacao:
+            campos['tempo_total_gasto'] = F('tempo_total_gasto') + (agora - atividade.ultima_interacao)
+
+        if novo_status == 'pausada':
+            campos['motivo_pausa'] = justificativa
+        elif novo_status == 'executando':
+            campos.update(motivo_pausa=None, ultima_interacao=agora, inicio_real=Coalesce('inicio_real', Value(agora)))
+        elif novo_status == 'finalizada':
+            campos['fim_real'] = agora
+        elif novo_status == 'cancelada':
+            campos['motivo_cancelamento'] = justificativa
+
+        # Condicionado ao status lido: sem lock de linha, a transição concorrente perde aqui
+        if not Atividade.objects.filter(pk=atividade.pk, status=anterior).update(**campos):
+            raise TransicaoInvalida(anterior, novo_status)
+
+        # Espelha na instância o que não é expressão (os totais acumulados ficam no banco)
+        fim_anterior = atividade.fim_real
+        for campo, valor in campos.items():
+            if not hasattr(valor, 'resolve_expression'):
+                setattr(atividade, campo, valor)
+        if novo_status == 'executando' and atividade.inicio_real is None:
+            atividade.inicio_real = agora
+        if novo_status == 'finalizada':
+            indicadores.append(finalizacao(atividade, fim_anterior))
+        acumular(*indicadores)
+        # bulk_create: o atualizado_em já foi gravado acima (o signal do log o regravaria)
+        AtividadeLog.objects.bulk_create([AtividadeLog(
+            atividade=atividade, usuario=usuario, status_novo=novo_status,
+            descricao=f"Status: {novo_status} | {justificativa}", data_registro=agora,
+        )])
+
+        # update()/bulk_create não passam pelo post_save: cache do Gantt e evento do quadro saem daqui
+        dados = {'id': atividade.pk, 'maquina': atividade.maquina_id, 'status': novo_status, 'anterior': anterior}
+        transaction.on_commit(lambda: invalidar('gantt'))
+        transaction.on_commit(lambda: publicar('atividade', **dados))
+
+    return atividade, anterior
@@ -7,12 +7,24 @@ urlpatterns = [
     
     # --- KANBAN / LISTA (Antiga Lista Atividades) ---
     path('kanban/', views.kanban_view, name='kanban_view'),
+    path('kanban/concluidas/', views.kanban_concluidas, name='kanban_concluidas'), # Rolagem da coluna de concluídas (cursor)
+    path('kanban/atividade/<int:atividade_id>/', views.kanban_card, name='kanban_card'), # Card alterado (eventos SSE)
+    path('kanban/chamado/<int:chamado_id>/', views.kanban_chamado, name='kanban_chamado'), # Triagem alterada (eventos SSE)
     # Mantendo rota antiga redirecionando ou como alias se necessário, mas removendo do menu
     # path('lista/', views.lista_atividades, name='lista_atividades'), 
 
     # --- DASHBOARD E ANÁLISE (Novas Funcionalidades) ---
     path('dashboard/', views.dashboard_analitico, name='dashboard_analitico'), # O novo painel com gráficos
     path('api/gantt/dados/', views.dados_gantt, name='dados_gantt'), # A API que alimenta o gráfico Gantt
+    path('api/preventivas/previsao/', views.previsao_preventivas, name='previsao_preventivas'), # Carga prevista das preventivas
+    path('importar/', views.importar_dados, name='importar_dados'), # Upload CSV (staff)
+    path('exportar/<str:tipo>.csv', views.exportar_csv, name='exportar_csv'), # atividades, logs, chamados
+    path('api/indicadores/confiabilidade/', views.indicadores_confiabilidade, name='indicadores_confiabilidade'), # MTTR/MTBF
+    path('api/tecnicos/carga/', views.carga_tecnicos, name='carga_tecnicos'), # Disponibilidade da equipe
+    path('api/historico/', views.historico_feed, name='api_historico'), # OS finalizadas + chamados processados (cursor)
+    path('api/eventos/', views.eventos_stream, name='eventos_stream'), # SSE (ASGI) para Kanban, Gantt e notificações
+    path('metrics', views.metricas_prometheus, name='metricas_prometheus'), # Prometheus (staff ou METRICS_TOKEN)
+    path('api/cache/estatisticas/', views.estatisticas_cache, name='estatisticas_cache'), # Hit/miss do cache do Gantt
 
     # --- GESTÃO DE CHAMADOS ---
     path('chamado/novo/', views.abrir_chamado, name='abrir_chamado'),
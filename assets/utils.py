@@ -1,6 +1,74 @@
-from datetime import timedelta
+from django.db.models import Max, Min, Prefetch, Q, QuerySet
 from django.utils import timezone
 
+from .agendamento import Tarefa, sequenciar
+from .models import Atividade, AtividadeLog
+
+# Logs exibidos na timeline de cards e linhas da lista
+LOGS_TIMELINE = 5
+
+
+def prefetch_logs_recentes(limite=LOGS_TIMELINE, to_attr='logs_recentes'):
+    """
+    Prefetch só dos `limite` logs mais recentes de cada atividade, numa consulta
+    (ROW_NUMBER() OVER (PARTITION BY atividade_id ...) que o Django gera para o
+    queryset fatiado). OS com centenas de pausas não carregam o histórico inteiro.
+    """
+    logs = AtividadeLog.objects.select_related('usuario').order_by('-data_registro', '-id')[:limite]
+    return Prefetch('logs', queryset=logs, to_attr=to_attr)
+
+
+def preencher_tempos_reais(atividade_ids=None, todas=False, batch_size=1000):
+    """
+    Preenche inicio_real/fim_real a partir do histórico (AtividadeLog): primeiro
+    'executando' e último 'finalizada'. Com `atividade_ids`, só essas OS (em lotes
+    de `batch_size`); sem, a base inteira. Retorna quantas atividades mudaram.
+    """
+    if atividade_ids is None:
+        return _preencher_tempos(AtividadeLog.objects.all(), Atividade.objects.all(), todas, batch_size)
+    atividade_ids = sorted(atividade_ids)
+    total = 0
+    for i in range(0, len(atividade_ids), batch_size):
+        lote = atividade_ids[i:i + batch_size]
+        total += _preencher_tempos(
+            AtividadeLog.objects.filter(atividade_id__in=lote), Atividade.objects.filter(id__in=lote), todas, batch_size
+        )
+    return total
+
+
+def _preencher_tempos(logs, atividades, todas, batch_size):
+    # Uma única agregação sobre os logs: primeiro 'executando' e último 'finalizada'
+    tempos = logs.values('atividade_id').annotate(
+        inicio=Min('data_registro', filter=Q(status_novo='executando')),
+        fim=Max('data_registro', filter=Q(status_novo='finalizada')),
+    ).order_by()
+    tempos = {t['atividade_id']: (t['inicio'], t['fim']) for t in tempos}
+
+    atividades = atividades.only('id', 'status', 'ultima_interacao', 'inicio_real', 'fim_real')
+    if not todas:
+        atividades = atividades.filter(Q(inicio_real__isnull=True) | Q(fim_real__isnull=True, status='finalizada'))
+
+    lote = []
+    total = 0
+    for act in atividades.iterator(chunk_size=batch_size):
+        inicio, fim = tempos.get(act.id, (None, None))
+        if act.status == 'finalizada' and not fim:
+            # Finalizada sem log (ex.: editada pelo admin): melhor aproximação disponível
+            fim = act.ultima_interacao
+        if (inicio, fim) == (act.inicio_real, act.fim_real):
+            continue
+        act.inicio_real, act.fim_real = inicio, fim
+        lote.append(act)
+        if len(lote) >= batch_size:
+            Atividade.objects.bulk_update(lote, ['inicio_real', 'fim_real'])
+            total += len(lote)
+            lote = []
+    if lote:
+        Atividade.objects.bulk_update(lote, ['inicio_real', 'fim_real'])
+        total += len(lote)
+    return total
+
+
 def formatar_duracao(td):
     """Converte timedelta para uma string amigável (ex: 2d 4h 5m ou 5h 30m)"""
     if not td or td.total_seconds() == 0:
@@ -27,77 +95,43 @@ def sequenciar_atividades(atividades_queryset):
     """
     Lógica central que empilha as atividades por colaborador.
     Adaptado para Multiple colaboradores e Tempo Decimal (H.H).
+
+    Usa o motor de agendamento.sequenciar: toda a equipe fica bloqueada durante
+    a atividade. Os técnicos vêm do prefetch (sem query por atividade).
     """
-    colaboradores_progresso = {}
-    atividades_sequenciadas = []
+    if isinstance(atividades_queryset, QuerySet):
+        atividades_queryset = atividades_queryset.prefetch_related('colaboradores')
+    atividades = {act.id: act for act in atividades_queryset}
 
-    # Ordenar: Emergencial primeiro (prioridade máxima), depois por data planejada
-    atividades_ordenadas = atividades_queryset.order_by('-eh_emergencial', 'data_planejada')
+    agora = timezone.now()
+    tarefas = [
+        Tarefa(
+            id=act.id,
+            inicio_base=act.data_planejada or agora,
+            duracao=act.duracao_estimada,
+            tecnicos=tuple(t.id for t in act.colaboradores.all()),
+            emergencial=act.eh_emergencial,
+            executando=act.status == 'executando',
+        )
+        for act in atividades.values()
+    ]
+
+    atividades_sequenciadas = []
+    for item in sequenciar(tarefas, agora):
+        act = atividades[item.id]
 
-    for act in atividades_ordenadas:
         # --- CÁLCULO DO TEMPO REAL DECIMAL (PADRÃO DE MERCADO) ---
         if act.tempo_total_gasto:
-            total_segundos = act.tempo_total_gasto.total_seconds()
-            # Converte segundos para horas com 2 casas decimais
-            act.tempo_decimal = round(total_segundos / 3600, 2)
+            act.tempo_decimal = round(act.tempo_total_gasto.total_seconds() / 3600, 2)
         else:
             act.tempo_decimal = 0.00
-        
         act.tempo_gasto_formatado = formatar_duracao(act.tempo_total_gasto)
 
-        # --- SEGURANÇA DE DADOS ---
-        data_base = act.data_planejada if act.data_planejada else timezone.now()
-        duracao = act.duracao_estimada if act.duracao_estimada and act.duracao_estimada.total_seconds() > 0 else timedelta(hours=1)
-        
-        # --- LÓGICA DE SEQUENCIAMENTO POR TÉCNICO ---
-        tecnicos = act.colaboradores.all()
-        
-        if tecnicos.exists():
-            # Para fins de sequenciamento no gráfico, usamos o "primeiro" técnico como âncora
-            tecnico_principal = tecnicos.first()
-            tecnico_id = tecnico_principal.id
-            
-            if tecnico_id not in colaboradores_progresso:
-                colaboradores_progresso[tecnico_id] = data_base
-
-            inicio_efetivo = max(data_base, colaboradores_progresso[tecnico_id])
-            
-            if act.eh_emergencial:
-                inicio_efetivo = data_base
-
-            fim_efetivo = inicio_efetivo + duracao
-            
-            # --- NOVO: Acompanhamento em tempo real para atividades em execução ---
-            if act.status == 'executando':
-                agora = timezone.now()
-                # Puxar para o presente se estava no futuro
-                if inicio_efetivo > agora:
-                    inicio_efetivo = agora
-                
-                # Garantir que o fim também seja no mínimo "agora"
-                fim_efetivo = max(inicio_efetivo + duracao, agora)
-                    
-            colaboradores_progresso[tecnico_id] = fim_efetivo
-        
-        else:
-            inicio_efetivo = data_base
-            fim_efetivo = inicio_efetivo + duracao
-            
-            # --- NOVO: Acompanhamento em tempo real (mesmo sem técnico atribuído) ---
-            if act.status == 'executando':
-                agora = timezone.now()
-                # Puxar para o presente se estava no futuro
-                if inicio_efetivo > agora:
-                    inicio_efetivo = agora
-                    
-                # Garantir que o fim também seja no mínimo "agora"
-                fim_efetivo = max(inicio_efetivo + duracao, agora)
-
         # --- ANEXA OS DADOS CALCULADOS AO OBJETO ---
-        act.inicio_calculado = inicio_efetivo
-        act.fim_calculado = fim_efetivo
-        act.duracao_formatada = formatar_duracao(duracao)
-        
+        act.inicio_calculado = item.inicio
+        act.fim_calculado = item.fim
+        act.duracao_formatada = formatar_duracao(item.duracao)
+
         atividades_sequenciadas.append(act)
 
-    return atividades_sequenciadas
\ No newline at end of file
+    return atividades_sequenciadas
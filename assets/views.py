@@ -1,180 +1,185 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, HttpResponseNotModified, StreamingHttpResponse, Http404, HttpResponseForbidden
 from django.utils import timezone
 from datetime import timedelta, datetime, time
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth.decorators import login_required
-from zoneinfo import ZoneInfo # Para fuso horário fixo (Brasília)
 from django.contrib.auth import logout
 from django.contrib import messages
-from itertools import chain 
-from operator import attrgetter
-from django.db.models import Count, Q
+from django.db.models import Count, Q, prefetch_related_objects
 from django.db import transaction
 import json
+import hashlib
+import hmac
+import logging
 
-from .models import Atividade, AtividadeLog, Maquina, Chamado, PlanoPreventivo
+from .models import Atividade, Maquina, Chamado, PlanoPreventivo, Importacao
 
-from .utils import sequenciar_atividades, formatar_duracao
+from .utils import sequenciar_atividades, formatar_duracao, prefetch_logs_recentes
 from .forms import AtividadeForm, PlanoPreventivoForm 
-# --- ROBÔ (Mantido igual) ---
-def verificar_e_gerar_preventivas():
-    hoje = timezone.now().date()
-    planos_vencidos = PlanoPreventivo.objects.filter(ativo=True, proxima_data__lte=hoje)
-    geradas = 0
-    for plano in planos_vencidos:
-        Atividade.objects.create(
-            maquina=plano.maquina,
-            descricao=f"[AUTO] {plano.nome}",
-            data_planejada=plano.proxima_data,
-            eh_preventiva=True,
-            procedimento_base=plano.procedimento_padrao,
-            duracao_estimada=timedelta(hours=2),
-            status='aberta'
-        )
-        plano.proxima_data = plano.proxima_data + timedelta(days=plano.frequencia_dias)
-        plano.save()
-        geradas += 1
-    return geradas
+from .gantt import parse_data, filtros_gantt, dados_gantt_json, montar_delta_gantt, cursor_atual, cursor_expirado, parse_cursor
+from .caching import estatisticas, geracao, obter_ou_calcular
+from .previsao import previsao_carga, MESES_PADRAO, MESES_MAXIMO
+from .services import carga_tecnicos_cache
+from .indicadores import totais_por_maquina
+from .confiabilidade import confiabilidade
+from .exportacao import EXPORTACOES, filtros_exportacao, linhas_csv, linhas_csv_async
+from .importacao import IMPORTADORES, abrir_upload, agendar_importacao
+from . import eventos, historico, metricas, transicoes
+from .kanban import get_kanban_context, oob_mudanca_status, oob_chamado, card_atividade, contadores_quadro, html_oob, atividades_concluidas, anexar_cards
+from core.context_processors import contar_chamados_pendentes
+
+logger = logging.getLogger(__name__)
 
 @login_required
 def dados_gantt(request):
     """
     API do Gantt Sincronizada: Precisão Absoluta com Fuso Horário de Brasília.
-    Garante que barras e detalhes batam 100% com a realidade da fábrica.
+    Filtros (janela de datas, técnico, status) aplicados no banco; ver gantt.filtros_gantt.
+
+    Modo delta (polling): ?delta=1 devolve {cursor, full, upserts, removidos} com o
+    cronograma completo; ?since=<cursor> devolve só o que mudou desde então (cursor
+    mais antigo que a retenção das lápides volta ao cronograma completo).
+    Com If-None-Match igual ao ETag anterior, responde 304 quando nada mudou.
     """
     try:
-        # 1. Definir Fuso e Momento Atual (Brasília)
-        tz_br = ZoneInfo("America/Sao_Paulo")
-        agora_local = timezone.now().astimezone(tz_br)
-        
-        # Prefetch para performance
-        qs = Atividade.objects.select_related('maquina').prefetch_related('colaboradores', 'logs__usuario')
-        atividades_db = qs.all().order_by('-eh_emergencial', 'data_planejada')
-        
-        dados = []
-        for act in atividades_db:
-            # 2. Determinar o Início (Real ou Planejado)
-            log_inicio_real = act.logs.filter(status_novo='executando').order_by('data_registro').first()
-            
-            if log_inicio_real:
-                inicio_v = log_inicio_real.data_registro.astimezone(tz_br)
-            elif act.status in ['executando', 'pausada']:
-                inicio_v = act.ultima_interacao.astimezone(tz_br) if act.ultima_interacao else agora_local
-            else:
-                inicio_v = act.data_planejada.astimezone(tz_br) if act.data_planejada else agora_local
-
-            # 3. Determinar o Fim (Dinamismo de Acompanhamento)
-            if act.status == 'executando':
-                # Fim é AGORA TOTAL para a barra crescer com o tempo
-                fim_v = agora_local
-                end_label = None 
-                progresso = 100 # Barra sólida (100% dinâmica)
-            elif act.status == 'finalizada':
-                log_fim = act.logs.filter(status_novo='finalizada').order_by('-data_registro').first()
-                if log_fim:
-                    fim_v = log_fim.data_registro.astimezone(tz_br)
-                else:
-                    fim_v = inicio_v + (act.duracao_estimada or timedelta(hours=1))
-                end_label = fim_v.strftime('%d/%m %H:%M')
-                progresso = 100
-            else:
-                # Aberta/Pausada: Fim visual baseado no estimado
-                dur_est = act.duracao_estimada if (act.duracao_estimada and act.duracao_estimada.total_seconds() > 0) else timedelta(hours=2)
-                fim_v = inicio_v + dur_est
-                end_label = None
-                progresso = 25 if act.status == 'pausada' else 0
-
-            # Cálculo de Duração Efetiva (Puro delta matemático)
-            duracao_efetiva = fim_v - inicio_v
-
-            tecnicos_obj = act.colaboradores.all()
-            tecnicos_nomes = [t.first_name or t.username for t in tecnicos_obj]
-            tecnicos_ids = [str(t.id) for t in tecnicos_obj]
-            
-            label_barra = f"[{act.maquina.codigo}] {act.maquina.nome}: {act.descricao[:30]}.."
-
-            # CSS Classes
-            if act.status not in ['finalizada', 'cancelada'] and (fim_v < agora_local and act.status != 'executando'):
-                custom_class = 'gantt-atrasado'
-            elif act.status == 'executando': custom_class = 'gantt-status-executando'
-            elif act.status == 'pausada': custom_class = 'gantt-status-pausada'
-            elif act.status == 'finalizada': custom_class = 'gantt-status-finalizada'
-            else: custom_class = 'gantt-status-aberta'
-
-            logs_list = [{
-                'data': l.data_registro.astimezone(tz_br).strftime('%d/%m %H:%M'),
-                'usuario': l.usuario.username,
-                'descricao': l.descricao
-            } for l in act.logs.all().order_by('-data_registro')[:10]]
-
-            dados.append({
-                'id': str(act.id),
-                'name': label_barra,
-                'full_name': act.descricao,
-                'description': act.instrucoes_tecnicas or act.descricao or "Sem descrição.",
-                'start': inicio_v.strftime('%Y-%m-%d %H:%M'), 
-                'end': fim_v.strftime('%Y-%m-%d %H:%M'),
-                'start_formatted': inicio_v.strftime('%d/%m %H:%M'),
-                'end_formatted': end_label,
-                'duration': formatar_duracao(duracao_efetiva),
-                'progress': progresso,
-                'custom_class': custom_class,
-                'dependencies': '',
-                'maquina': act.maquina.nome,
-                'status': act.status,
-                'status_display': act.get_status_display(),
-                'tech_names': ", ".join(tecnicos_nomes) if tecnicos_nomes else "Sem técnicos",
-                'tecnicos': ", ".join(tecnicos_nomes) if tecnicos_nomes else "Pendente",
-                'tech_ids': tecnicos_ids,
-                'tempo_pausa': act.tempo_total_pausa.total_seconds(),
-                'logs': logs_list
-            })
+        filtros = filtros_gantt(request.GET)
+        desde = parse_cursor(request.GET.get('since'))
 
-        # 4. Preventivas Futuras
-        planos_futuros = PlanoPreventivo.objects.filter(ativo=True).select_related('maquina', 'procedimento_padrao')
-        for plano in planos_futuros:
-            inicio_p = timezone.make_aware(datetime.combine(plano.proxima_data, time(8, 0)))
-            inicio_p_local = timezone.localtime(inicio_p)
-            dur_p = plano.procedimento_padrao.duracao_estimada_padrao if (plano.procedimento_padrao and plano.procedimento_padrao.duracao_estimada_padrao) else timedelta(hours=2)
-            fim_p_local = inicio_p_local + dur_p
-            
-            dados.append({
-                'id': f"plano-{plano.id}",
-                'name': f"[AGRND] {plano.maquina.nome}: {plano.nome}",
-                'full_name': f"Preventiva: {plano.nome}",
-                'description': f"Procedimento: {plano.procedimento_padrao.nome if plano.procedimento_padrao else 'Padrão'}",
-                'start': inicio_p_local.strftime('%Y-%m-%d %H:%M'),
-                'end': fim_p_local.strftime('%Y-%m-%d %H:%M'),
-                'start_formatted': inicio_p_local.strftime('%d/%m %H:%M'),
-                'end_formatted': fim_p_local.strftime('%d/%m %H:%M'),
-                'duration': formatar_duracao(dur_p),
-                'progress': 0,
-                'custom_class': 'gantt-status-aberta',
-                'dependencies': '',
-                'maquina': plano.maquina.nome,
-                'status': 'Agendada',
-                'status_display': 'Agendada',
-                'tech_names': "Industrial",
-                'tecnicos': "Sincronização Automática",
-                'tech_ids': [],
-                'tempo_pausa': 0,
-                'logs': []
-            })
+        if desde is None and not request.GET.get('delta'):
+            # Formato legado: lista completa
+            return HttpResponse(dados_gantt_json(filtros), content_type='application/json')
+
+        cursor = cursor_atual()
+
+        if desde is None or cursor_expirado(desde):
+            corpo = '{"cursor": %s, "full": true, "upserts": %s, "removidos": []}' % (json.dumps(cursor), dados_gantt_json(filtros))
+            return HttpResponse(corpo, content_type='application/json')
 
-        return JsonResponse(dados, safe=False)
-    except Exception as e:
-        import traceback
-        print(traceback.format_exc())
+        etag = '"%s"' % hashlib.md5(f"{request.GET.urlencode()}|{cursor}".encode()).hexdigest()
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        upserts, removidos = montar_delta_gantt(filtros, desde)
+        response = JsonResponse({'cursor': cursor, 'full': False, 'upserts': upserts, 'removidos': removidos})
+        response['ETag'] = etag
+        return response
+    except Exception:
+        logger.exception("Falha ao montar os dados do Gantt")
         return JsonResponse([], safe=False)
             
+@login_required
+def previsao_preventivas(request):
+    """
+    Carga prevista das preventivas por semana, máquina e técnico (?meses=1..12, ?inicio=AAAA-MM-DD).
+    Em cache até a próxima alteração de planos/atividades (mesma geração do Gantt).
+    """
+    try:
+        meses = min(max(int(request.GET.get('meses', MESES_PADRAO)), 1), MESES_MAXIMO)
+    except ValueError:
+        meses = MESES_PADRAO
+    inicio = parse_data(request.GET.get('inicio')) or timezone.localdate()
+    chave = f"previsao:{geracao('gantt')}:{inicio.isoformat()}:{meses}"
+    dados = obter_ou_calcular('previsao', chave, lambda: previsao_carga(inicio, meses), 600)
+    return JsonResponse(dados)
+
+@login_required
+async def eventos_stream(request):
+    """SSE: mudanças de status, chamados e equipes para Kanban, Gantt e sino."""
+    if not isinstance(request, ASGIRequest):
+        # Sob WSGI a conexão prenderia um worker inteiro; 204 faz o EventSource
+        # desistir e as telas seguem no polling
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(
+        eventos.fluxo(request.headers.get('Last-Event-ID') or None), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não segurar os eventos no buffer
+    return response
+
+def metricas_prometheus(request):
+    """Histogramas por view em texto Prometheus: staff logado ou 'Authorization: Bearer <METRICS_TOKEN>'."""
+    token = metricas.get_config()['METRICS_TOKEN']
+    enviado = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (token and hmac.compare_digest(enviado, token)) and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(metricas.registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@login_required
+def exportar_csv(request, tipo):
+    """CSV em streaming de atividades, logs ou chamados (?inicio=&fim=&maquina=)."""
+    if tipo not in EXPORTACOES:
+        raise Http404("Exportação desconhecida.")
+    # ASGI só transmite aos poucos um iterador assíncrono (o síncrono seria lido inteiro antes)
+    gerar = linhas_csv_async if isinstance(request, ASGIRequest) else linhas_csv
+    response = StreamingHttpResponse(gerar(tipo, filtros_exportacao(request.GET)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{tipo}_{timezone.localdate():%Y%m%d}.csv"'
+    return response
+
+@login_required
+def importar_dados(request):
+    """
+    Upload de CSV para os importadores em lote (somente equipe do PCM / staff).
+    O arquivo vira uma Importacao processada fora do request; a página acompanha
+    o status por polling (?importacao=<id>, fragmento via HTMX).
+    """
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Apenas a equipe do PCM pode importar dados.")
+
+    tipo = request.POST.get('tipo', 'maquinas')
+    if request.method == 'POST':
+        arquivo = request.FILES.get('arquivo')
+        if tipo not in IMPORTADORES or not arquivo:
+            messages.error(request, "Selecione o tipo e o arquivo CSV.")
+        else:
+            importacao = Importacao.objects.create(tipo=tipo, usuario=request.user, conteudo=abrir_upload(arquivo).getvalue())
+            agendar_importacao(importacao)
+            messages.info(request, "Arquivo recebido; a importação segue em segundo plano.")
+            return redirect(f"{reverse('importar_dados')}?importacao={importacao.id}")
+
+    importacao = None
+    if request.GET.get('importacao', '').isdigit():
+        importacao = Importacao.objects.filter(pk=request.GET['importacao']).first()
+        if importacao:
+            tipo = importacao.tipo
+    if request.headers.get('HX-Request') and importacao:
+        return render(request, 'assets/partials/_importacao_status.html', {'importacao': importacao})
+
+    return render(request, 'assets/importar.html', {
+        'tipos': [(nome, importador.colunas) for nome, importador in IMPORTADORES.items()],
+        'tipo': tipo,
+        'importacao': importacao,
+    })
+
+@login_required
+def indicadores_confiabilidade(request):
+    """MTTR/MTBF por máquina e da planta (?inicio=&fim=, AAAA-MM-DD; padrão: últimos 90 dias)."""
+    fim = parse_data(request.GET.get('fim')) or timezone.localdate()
+    inicio = parse_data(request.GET.get('inicio')) or fim - timedelta(days=90)
+    if inicio > fim:
+        inicio, fim = fim, inicio
+    chave = f"confiabilidade:{geracao('gantt')}:{inicio.isoformat()}:{fim.isoformat()}"
+    dados = obter_ou_calcular('confiabilidade', chave, lambda: confiabilidade(inicio, fim), 300)
+    return JsonResponse(dados)
+
+@login_required
+def carga_tecnicos(request):
+    """Horas pendentes, ordem em execução e próximo horário livre de cada técnico."""
+    return JsonResponse({'tecnicos': carga_tecnicos_cache()})
+
+@login_required
+def estatisticas_cache(request):
+    """Contadores de hit/miss dos caches compartilhados (Gantt e cards do Kanban)."""
+    return JsonResponse({'gantt': estatisticas('gantt'), 'kanban_cards': estatisticas('kanban_cards')})
+
 @login_required
 def dashboard_analitico(request):
-    # 1. Robô de Preventivas
-    novas_ops = verificar_e_gerar_preventivas()
-    if novas_ops > 0:
-        messages.info(request, f"{novas_ops} preventivas geradas automaticamente.")
+    # Preventivas vencidas são geradas fora do request (preventivas.py / comando gerar_preventivas)
 
     # Inicializa os forms vazios (prefix evita conflito de nomes)
     form_atividade = AtividadeForm(prefix='atividade')
@@ -222,9 +227,10 @@ def dashboard_analitico(request):
                 messages.error(request, "Erro ao cadastrar plano. Verifique os dados.")
 
     # 3. Dados para os Gráficos e Listas
-    quebras_por_maquina = Atividade.objects.filter(eh_preventiva=False).values('maquina__codigo').annotate(total=Count('id')).order_by('-total')[:5]
+    # Lido dos indicadores diários pré-agregados (assets/indicadores.py)
+    quebras_por_maquina = [item for item in totais_por_maquina()[:5] if item['corretivas']]
     labels_quebra = [item['maquina__codigo'] for item in quebras_por_maquina]
-    data_quebra = [item['total'] for item in quebras_por_maquina]
+    data_quebra = [item['corretivas'] for item in quebras_por_maquina]
     
     planos_futuros = PlanoPreventivo.objects.filter(ativo=True).select_related('maquina', 'procedimento_padrao').order_by('proxima_data')
     
@@ -268,16 +274,12 @@ def lista_atividades(request):
     atividades_sequenciadas = sequenciar_atividades(atividades_queryset)
 
     atividades_pendentes = [a for a in atividades_sequenciadas if a.status not in ['finalizada', 'cancelada']]
-    concluidas = [a for a in atividades_sequenciadas if a.status == 'finalizada']
+    prefetch_related_objects(atividades_pendentes, prefetch_logs_recentes())
     
     chamados_pendentes = Chamado.objects.select_related('maquina', 'requisitante').filter(status='pendente').order_by('-prioridade_indicada')
-    recusados = Chamado.objects.select_related('maquina').filter(status='recusado').order_by('-data_abertura')
 
-    historico_geral = sorted(
-        chain(concluidas, recusados),
-        key=lambda x: getattr(x, 'fim_calculado', getattr(x, 'data_abertura', None)),
-        reverse=True
-    )
+    # Primeira página do histórico unificado, já ordenada no banco
+    historico_geral, _ = historico.feed_historico()
 
     tecnicos = User.objects.all()
     
@@ -304,52 +306,52 @@ def recusar_chamado(request, chamado_id):
     return redirect('kanban_view')
 
 @login_required
+@require_POST
 def cancelar_atividade(request, atividade_id):
-    if request.method == 'POST':
-        atividade = get_object_or_404(Atividade, id=atividade_id)
-        atividade.motivo_cancelamento = request.POST.get('motivo')
-        atividade.status = 'cancelada'
-        atividade.save()
+    # Mesma máquina de estados da troca de status: lock, log e indicadores
+    try:
+        transicoes.alterar_status(atividade_id, 'cancelada', request.user, request.POST.get('motivo', ''))
+    except Atividade.DoesNotExist:
+        raise Http404
+    except transicoes.TransicaoInvalida as erro:
+        error_msg = f"OS #{atividade_id}: {erro}"
+        if request.headers.get('HX-Request'):
+            response = HttpResponse(status=409)  # Conflict
+            response['HX-Trigger'] = json.dumps({
+                "showToast": {"message": error_msg, "type": "warning"}
+            })
+            return response
+        messages.warning(request, error_msg)
     return redirect(request.META.get('HTTP_REFERER', 'kanban_view'))
 
-@csrf_exempt
 @login_required
+@require_POST
 def alterar_status(request, atividade_id, novo_status):
-    atividade = get_object_or_404(Atividade, id=atividade_id)
     justificativa = request.POST.get('justificativa', '')
-    usuario = request.user
-    
-    agora = timezone.now()
-    
-    # --- NOVO: Cálculo de duração do status anterior ---
-    ultimo_log = atividade.logs.order_by('-data_registro').first()
-    if ultimo_log:
-        segundos_decorridos = (agora - ultimo_log.data_registro).total_seconds()
-        duracao_decorrida = timedelta(seconds=segundos_decorridos)
-        ultimo_log.duracao = duracao_decorrida
-        ultimo_log.save()
-        
-        # Se o status sendo encerrado era 'pausada', somamos ao contador
-        if atividade.status == 'pausada':
-            atividade.tempo_total_pausa += duracao_decorrida
-
-    if atividade.status == 'executando' and novo_status in ['pausada', 'finalizada']:
-        if atividade.ultima_interacao:
-            decorrido = agora - atividade.ultima_interacao
-            atividade.tempo_total_gasto += decorrido
-
-    atividade.status = novo_status
-    if novo_status == 'pausada':
-        atividade.motivo_pausa = justificativa
-    elif novo_status == 'executando':
-        atividade.motivo_pausa = None
-        atividade.ultima_interacao = timezone.now()
-    atividade.save()
-    ativ_log = AtividadeLog.objects.create(atividade=atividade, usuario=usuario, status_novo=novo_status, descricao=f"Status: {novo_status} | {justificativa}")
+
+    try:
+        # Transição atômica e validada (ver assets/transicoes.py)
+        atividade, status_anterior = transicoes.alterar_status(atividade_id, novo_status, request.user, justificativa)
+    except Atividade.DoesNotExist:
+        raise Http404
+    except transicoes.TransicaoInvalida as erro:
+        error_msg = f"OS #{atividade_id}: {erro} Atualize o quadro."
+        if request.headers.get('HX-Request'):
+            response = HttpResponse(status=409)  # Conflict
+            response['HX-Trigger'] = json.dumps({
+                "showToast": {"message": error_msg, "type": "warning"}
+            })
+            return response
+        messages.warning(request, error_msg)
+        return redirect('kanban_view')
     
     # Lógica de Retorno Dinâmico baseada no Target do HTMX
-    hx_target = request.headers.get('HX-Target')
+    hx_target = request.headers.get('HX-Target') or ''
     
+    if hx_target.startswith('card-'):
+        # Quadro: move só o card alterado e atualiza os contadores (out-of-band)
+        return HttpResponse(oob_mudanca_status(request, atividade.id, status_anterior))
+
     if hx_target == 'kanban-container':
         # Detecta parâmetros vindos do HTMX (via hx-include ou hx-vals)
         ctx = get_kanban_context(request)
@@ -371,32 +373,14 @@ def atribuir_tecnicos(request, atividade_id):
     if request.method == 'POST':
         atividade = get_object_or_404(Atividade, id=atividade_id)
         tecnicos_ids = request.POST.getlist('tecnicos') 
-        atividade.colaboradores.clear()
+        atividade.colaboradores.set(tecnicos_ids)
         if tecnicos_ids:
-            for t_id in tecnicos_ids: atividade.colaboradores.add(t_id)
             messages.success(request, "Equipe atualizada!")
         else: messages.warning(request, "OS sem técnicos.")
         if request.headers.get('HX-Request'):
-            # Recalcular dados para o Kanban (Board)
-            atividades_queryset = Atividade.objects.select_related('maquina', 'procedimento_base').prefetch_related('colaboradores').all()
-            atividades_sequenciadas = sequenciar_atividades(atividades_queryset)
-            
-            abertas = [a for a in atividades_sequenciadas if a.status == 'aberta']
-            executando = [a for a in atividades_sequenciadas if a.status == 'executando']
-            pausadas = [a for a in atividades_sequenciadas if a.status == 'pausada']
-            concluidas = [a for a in atividades_sequenciadas if a.status == 'finalizada'][:10]
-            chamados_pendentes = Chamado.objects.select_related('maquina', 'requisitante').filter(status='pendente').order_by('-data_abertura')
-            
-            ctx = {
-                'abertas': abertas,
-                'executando': executando,
-                'pausadas': pausadas,
-                'concluidas': concluidas,
-                'chamados_pendentes': chamados_pendentes,
-                'tecnicos': User.objects.all()
-            }
-            
-            response = render(request, 'assets/partials/_kanban_board.html', ctx)
+            # Re-renderiza só o card da atividade (contadores não mudam)
+            act = card_atividade(atividade.id, list(User.objects.all()))
+            response = HttpResponse(act.card_html)
             response['HX-Trigger'] = json.dumps({
                 "showToast": {"message": "Equipe atualizada com sucesso!", "type": "success"}
             })
@@ -420,14 +404,15 @@ def abrir_chamado(request):
 def notificacoes_dropdown(request):
     """
     HTMX endpoint: Returns pending chamados as HTML partial for notification dropdown.
+    With ?cursor= returns only the next page of items (infinite scroll).
     """
-    chamados_pendentes = Chamado.objects.select_related('maquina', 'requisitante').filter(
-        status='pendente'
-    ).order_by('-data_abertura')[:10]
-    
-    return render(request, 'assets/partials/_notificacoes_dropdown.html', {
-        'chamados_pendentes': chamados_pendentes
-    })
+    cursor = historico.ler_cursor(request.GET.get('cursor'))
+    chamados_pendentes, proximo = historico.chamados_pendentes(cursor)
+    ctx = {'chamados_pendentes': chamados_pendentes, 'cursor_notificacoes': proximo}
+    if cursor:
+        return render(request, 'assets/partials/_notificacoes_itens.html', ctx)
+    ctx['total_pendentes'] = contar_chamados_pendentes()
+    return render(request, 'assets/partials/_notificacoes_dropdown.html', ctx)
 
 @login_required
 def aprovar_chamado(request, chamado_id):
@@ -448,13 +433,11 @@ def aprovar_chamado(request, chamado_id):
                 messages.warning(request, error_msg)
                 return redirect('kanban_view')
             
-            # Verificação 2: Já existe OS para este chamado?
-            os_existente = Atividade.objects.filter(
-                descricao__contains=f"CHAMADO #{chamado.id}:"
-            ).first()
+            # Verificação 2: Já existe OS para este chamado? (índice único de Atividade.chamado)
+            os_existente = Atividade.objects.filter(chamado=chamado).values_list('id', flat=True).first()
             
             if os_existente:
-                error_msg = f"Já existe uma OS (#{os_existente.id}) para este chamado."
+                error_msg = f"Já existe uma OS (#{os_existente}) para este chamado."
                 if request.headers.get('HX-Request'):
                     response = HttpResponse(status=409)
                     response['HX-Trigger'] = json.dumps({
@@ -483,6 +466,7 @@ def aprovar_chamado(request, chamado_id):
 
             nova_os = Atividade.objects.create(
                 maquina=chamado.maquina,
+                chamado=chamado,
                 descricao=f"CHAMADO #{chamado.id}: {chamado.descricao_problema[:50]}",
                 data_planejada=data_planejada,
                 duracao_estimada=timedelta(hours=2),
@@ -494,30 +478,13 @@ def aprovar_chamado(request, chamado_id):
             chamado.status = 'aprovado'
             chamado.save()
             
-            # Resposta HTMX: Retornar Kanban atualizado
+            # Resposta HTMX: chamado sai da triagem e a nova OS entra em "Abertas" (out-of-band)
             if request.headers.get('HX-Request'):
-                # Recalcular dados do Kanban
-                atividades_queryset = Atividade.objects.select_related('maquina', 'procedimento_base').prefetch_related('colaboradores').all()
-                atividades_sequenciadas = sequenciar_atividades(atividades_queryset)
-                
-                abertas = [a for a in atividades_sequenciadas if a.status == 'aberta']
-                executando = [a for a in atividades_sequenciadas if a.status == 'executando']
-                pausadas = [a for a in atividades_sequenciadas if a.status == 'pausada']
-                concluidas = [a for a in atividades_sequenciadas if a.status == 'finalizada'][:10]
-                chamados_pendentes = Chamado.objects.select_related('maquina', 'requisitante').filter(status='pendente').order_by('-data_abertura')
-                
-                tecnicos = User.objects.all()
-                
-                ctx = {
-                    'abertas': abertas,
-                    'executando': executando,
-                    'pausadas': pausadas,
-                    'concluidas': concluidas,
-                    'chamados_pendentes': chamados_pendentes,
-                    'tecnicos': tecnicos
-                }
-                
-                response = render(request, 'assets/partials/_kanban_board.html', ctx)
+                act = card_atividade(nova_os.id, list(User.objects.all()))
+                response = HttpResponse(html_oob(
+                    [('aberta', 'beforeend', act.card_html)],
+                    contadores_quadro({'aberta', 'triagem'}),
+                ))
                 response['HX-Trigger'] = json.dumps({
                     "showToast": {"message": "Chamado aprovado com sucesso!", "type": "success"}
                 })
@@ -533,87 +500,6 @@ def home(request):
     """
     return render(request, 'assets/home.html')
 
-def get_kanban_context(request):
-    """
-    Helper para centralizar a lógica de busca e filtragem do Kanban/Lista.
-    """
-    view_mode = request.GET.get('mode') or request.POST.get('mode') or 'board'
-    filtro_data = request.GET.get('filtro_data') or request.POST.get('filtro_data') or 'recente'
-    data_especifica = request.GET.get('data_especifica') or request.POST.get('data_especifica')
-    
-    # Busca dados
-    atividades_queryset = Atividade.objects.select_related('maquina', 'procedimento_base').prefetch_related('colaboradores', 'logs__usuario').all()
-    atividades_sequenciadas = sequenciar_atividades(atividades_queryset)
-
-    # Separar atividades operacionais
-    abertas = [a for a in atividades_sequenciadas if a.status == 'aberta']
-    executando = [a for a in atividades_sequenciadas if a.status == 'executando']
-    pausadas = [a for a in atividades_sequenciadas if a.status == 'pausada']
-    todas_concluidas = [a for a in atividades_sequenciadas if a.status == 'finalizada']
-    
-    # Lógica de Filtragem (Melhorada para lidar com datas nulas e Ordenação)
-    agora = timezone.now()
-    
-    # Helper para pegar a data de "vencimento" ou conclusão real
-    def get_ref_date(act):
-        if act.ultima_interacao: return act.ultima_interacao.date()
-        # Fallback para o último log se existir
-        last_log = act.logs.all().order_by('-data_registro').first()
-        if last_log: return last_log.data_registro.date()
-        return None
-
-    # Ordenamos todas as concluídas pela data de término (DESC) antes de filtrar/fatiar
-    # Para o Python sorted, precisamos lidar com None
-    todas_concluidas = sorted(
-        todas_concluidas, 
-        key=lambda x: x.ultima_interacao or timezone.make_aware(datetime.min), 
-        reverse=True
-    )
-
-    if filtro_data == 'hoje':
-        concluidas = [a for a in todas_concluidas if get_ref_date(a) == agora.date()]
-        label_concluidas = "Concluídas (Hoje)"
-    elif filtro_data == 'mes':
-        concluidas = [a for a in todas_concluidas if get_ref_date(a) and get_ref_date(a).month == agora.month and get_ref_date(a).year == agora.year]
-        label_concluidas = "Concluídas (Este Mês)"
-    elif filtro_data == 'ano':
-        concluidas = [a for a in todas_concluidas if get_ref_date(a) and get_ref_date(a).year == agora.year]
-        label_concluidas = "Concluídas (Este Ano)"
-    elif filtro_data == 'custom' and data_especifica:
-        try:
-            dt_obj = datetime.strptime(data_especifica, '%Y-%m-%d').date()
-            concluidas = [a for a in todas_concluidas if get_ref_date(a) == dt_obj]
-            label_concluidas = f"Concluídas ({dt_obj.strftime('%d/%m/%Y')})"
-        except (ValueError, TypeError):
-            concluidas = todas_concluidas[:50]
-            label_concluidas = "Concluídas (Recentes)"
-    else:
-        concluidas = todas_concluidas[:50]
-        label_concluidas = "Concluídas (Recentes)"
-    
-    chamados_pendentes = Chamado.objects.select_related('maquina', 'requisitante').filter(status='pendente').order_by('-data_abertura')
-    atividades_pendentes = [a for a in atividades_sequenciadas if a.status != 'finalizada'] + concluidas
-
-    return {
-        'view_mode': view_mode,
-        'filtro_data': filtro_data,
-        'data_especifica': data_especifica,
-        'label_concluidas': label_concluidas,
-        'chamados_pendentes': chamados_pendentes,
-        'chamados_pendentes_count': chamados_pendentes.count(),
-        'abertas': abertas,
-        'executando': executando,
-        'pausadas': pausadas,
-        'concluidas': concluidas,
-        'atividades': atividades_pendentes,
-        'tecnicos': User.objects.all(),
-        'is_recente': filtro_data == 'recente',
-        'is_hoje': filtro_data == 'hoje',
-        'is_mes': filtro_data == 'mes',
-        'is_ano': filtro_data == 'ano',
-        'is_custom': filtro_data == 'custom',
-    }
-
 @login_required
 def kanban_view(request):
     ctx = get_kanban_context(request)
@@ -623,6 +509,67 @@ def kanban_view(request):
         return render(request, 'assets/partials/_kanban_board.html', ctx)
     return render(request, 'assets/kanban.html', ctx)
 
+@login_required
+def kanban_card(request, atividade_id):
+    """
+    Card de uma atividade para os eventos SSE do quadro. Com ?anterior= (troca de
+    status) devolve só fragmentos OOB: o card sai de onde estiver e entra na coluna
+    atual. Sem ele, o card re-renderizado para troca no lugar (equipe alterada).
+    """
+    if 'anterior' in request.GET:
+        return HttpResponse(oob_mudanca_status(request, atividade_id, request.GET['anterior'], remover_card=True))
+    try:
+        act = card_atividade(atividade_id, list(User.objects.all()))
+    except Atividade.DoesNotExist:
+        raise Http404
+    return HttpResponse(act.card_html)
+
+@login_required
+def kanban_chamado(request, chamado_id):
+    """Card de triagem de um chamado alterado (eventos SSE do quadro), por OOB."""
+    return HttpResponse(oob_chamado(request, chamado_id))
+
+@login_required
+def kanban_concluidas(request):
+    """Próxima página da coluna de concluídas do quadro (rolagem infinita, ?cursor=)."""
+    filtro_data = request.GET.get('filtro_data', 'recente')
+    data_especifica = request.GET.get('data_especifica')
+    concluidas, _, proximo = atividades_concluidas(filtro_data, data_especifica, historico.ler_cursor(request.GET.get('cursor')))
+    anexar_cards(concluidas, list(User.objects.all()))
+    return render(request, 'assets/partials/_kanban_concluidas.html', {
+        'concluidas': concluidas,
+        'cursor_concluidas': proximo,
+        'filtro_data': filtro_data,
+        'data_especifica': data_especifica,
+    })
+
+@login_required
+def historico_feed(request):
+    """
+    Histórico unificado (OS finalizadas e chamados processados), paginado por cursor.
+    HTMX recebe as linhas da tabela da lista; os demais, JSON {itens, proximo}.
+    """
+    itens, proximo = historico.feed_historico(historico.ler_cursor(request.GET.get('cursor')))
+    if request.headers.get('HX-Request'):
+        prefetch_related_objects([item for item in itens if item.tipo_historico == 'atividade'], prefetch_logs_recentes())
+        return render(request, 'assets/partials/_historico_linhas.html', {
+            'historico': itens, 'cursor_historico': proximo,
+        })
+    return JsonResponse({
+        'itens': [
+            {
+                'tipo': item.tipo_historico,
+                'id': item.id,
+                'momento': item.momento,
+                'status': item.status,
+                'maquina': item.maquina.nome,
+                'descricao': item.descricao if item.tipo_historico == 'atividade' else item.descricao_problema,
+            }
+            for item in itens
+        ],
+        'proximo': proximo,
+    })
+
 @login_required
 def logout_view(request):
     logout(request)
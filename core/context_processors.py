@@ -1,7 +1,24 @@
+from django.utils.functional import SimpleLazyObject
+
+from assets.caching import geracao, obter_ou_calcular
 from assets.models import Chamado
 
+# Rede de segurança para alterações que não passam por save() (ex.: queryset.update)
+PENDENTES_TIMEOUT = 300
+
+
+def contar_chamados_pendentes():
+    """COUNT de chamados pendentes, em cache até um chamado ser criado ou mudar de status."""
+    chave = f"chamados:pendentes:{geracao('chamados')}"
+    return obter_ou_calcular(
+        'chamados', chave,
+        lambda: Chamado.objects.filter(status='pendente').count(),
+        PENDENTES_TIMEOUT,
+    )
+
+
 def notifications(request):
     if request.user.is_authenticated:
-        count = Chamado.objects.filter(status='pendente').count()
-        return {'chamados_pendentes_count': count}
+        # Preguiçoso: parciais HTMX que não mostram o sino não tocam nem no cache
+        return {'chamados_pendentes_count': SimpleLazyObject(contar_chamados_pendentes)}
     return {}
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,6 +20,8 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 DEBUG = os.getenv('DEBUG') == 'True'
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+# manage.py test: threads de segundo plano desligadas (ver ACCESS_LOGGING e IMPORTACAO)
+TESTANDO = sys.argv[1:2] == ['test']
 
 
 
@@ -59,9 +62,50 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'assets.middleware.InstrumentationMiddleware',
     'assets.middleware.AccessLoggingMiddleware',
 ]
 
+# Instrumentação por view (Server-Timing e /metrics); SAMPLE_RATE 0 desliga.
+INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.getenv('INSTRUMENTATION_SAMPLE_RATE', '1.0')),
+    'SLOW_QUERY_MS': int(os.getenv('SLOW_QUERY_MS', '300')),
+    'METRICS_TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
+
+# Access log: records are buffered and written in batches by a background thread
+# (inline under tests: no writer thread, no flush at exit against the real DB).
+# Polling endpoints are sampled; errors (4xx/5xx) are always logged.
+ACCESS_LOGGING = {
+    'ASYNC': not TESTANDO,
+    'BUFFER_SIZE': 200,
+    'FLUSH_INTERVAL': 5.0,
+    'EXCLUDE_PATHS': ['/static/', '/favicon.ico'],
+    'SAMPLE_RATES': {
+        '/api/gantt/dados/': 0.1,
+        '/notificacoes/': 0.1,
+    },
+}
+
+# Geração automática de preventivas: o comando gerar_preventivas faz o mesmo sob demanda/cron.
+# INTERVALO em segundos; 0 desliga o agendador em processo.
+PREVENTIVAS_AUTOMATICAS = {
+    'INTERVALO': int(os.getenv('PREVENTIVAS_INTERVALO', '3600')),
+}
+
+# Uploads da tela de importação: processados numa thread após o request.
+# ASYNC False executa no próprio request (testes, depuração).
+IMPORTACAO = {
+    'ASYNC': not TESTANDO,
+}
+
+# Eventos em tempo real (SSE em /api/eventos/, exige servidor ASGI).
+# 'local' entrega em memória (um processo); 'outbox' passa pelo banco (vários workers).
+EVENTOS = {
+    'BACKEND': os.getenv('EVENTOS_BACKEND', 'local'),
+    'INTERVALO_OUTBOX': float(os.getenv('EVENTOS_INTERVALO_OUTBOX', '1')),
+}
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -104,10 +148,55 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # BEGIN IMMEDIATE: transações de escrita concorrentes esperam a vez em vez de
+            # falharem com "database is locked" (SQLite não tem select_for_update)
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+            # Banco de teste em arquivo: o em memória não aceita escrita de várias
+            # threads (TransicoesConcorrentesTests); o runner apaga o arquivo no fim
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
 
+# Cache
+# Local-memory por padrão (sem serviços externos). Com vários workers do Gunicorn,
+# defina CACHE_DIR para usar cache em arquivo compartilhado entre os processos.
+
+# O padrão do Django (300 entradas) não comporta os fragmentos de card de um quadro
+# grande: os cards se expulsariam a cada renderização. Dimensione pelo nº de OS ativas.
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '20000'))
+
+# O alias 'contadores' guarda só as gerações e estatísticas de assets/caching.py:
+# poucas chaves, num espaço próprio que os dados nunca enchem (não há expulsão).
+
+if os.getenv('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR'),
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        },
+        'contadores': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(os.getenv('CACHE_DIR'), 'contadores'),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pcm',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        },
+        'contadores': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pcm-contadores',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 